@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+1D barcodes (Code 128 and EAN-13) for Brother QL Web.
+
+Barcodes are encoded into a sequence of modules (the narrowest bar or space)
+and drawn with a whole number of printer dots per module, so every bar edge
+falls on a dot boundary and the bar widths keep their exact ratios on the
+label. The image is built from a single row of modules that is scaled as a
+whole, instead of drawing the bars one by one.
+"""
+
+from typing import List
+
+from PIL import Image
+
+# Barcode types accepted by create_label_im
+BARCODE_TYPES = ('code128', 'ean13')
+
+# Barcode sizes: (dots per module, bar height in dots)
+BARCODE_SIZES = {'small': (2, 80), 'medium': (3, 120), 'large': (4, 160)}
+
+# Quiet zones in modules to the left and right of the bars
+QUIET_ZONES = {'code128': (10, 10), 'ean13': (11, 7)}
+
+# Code 128 symbols as widths of bar, space, bar, space, bar, space (stop: 7 elements)
+CODE128_PATTERNS = [
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213', '122312', '132212', '221213',
+    '221312', '231212', '112232', '122132', '122231', '113222', '123122', '123221', '223211', '221132',
+    '221231', '213212', '223112', '312131', '311222', '321122', '321221', '312212', '322112', '322211',
+    '212123', '212321', '232121', '111323', '131123', '131321', '112313', '132113', '132311', '211313',
+    '231113', '231311', '112133', '112331', '132131', '113123', '113321', '133121', '313121', '211331',
+    '231131', '213113', '213311', '213131', '311123', '311321', '331121', '312113', '312311', '332111',
+    '314111', '221411', '431111', '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114', '413111', '241112', '134111',
+    '111242', '121142', '121241', '114212', '124112', '124211', '411212', '421112', '421211', '212141',
+    '214121', '412121', '111143', '111341', '131141', '114113', '114311', '411113', '411311', '113141',
+    '114131', '311141', '411131', '211412', '211214', '211232', '2331112',
+]
+CODE128_CODE_C, CODE128_CODE_B = 99, 100
+CODE128_START_B, CODE128_START_C, CODE128_STOP = 104, 105, 106
+
+# EAN-13 digit patterns of the left half with odd parity (L); even parity
+# (G) is the mirrored right half pattern (R), which is L inverted
+EAN_L = ['0001101', '0011001', '0010011', '0111101', '0100011',
+         '0110001', '0101111', '0111011', '0110111', '0001011']
+EAN_R = [''.join('1' if module == '0' else '0' for module in pattern) for pattern in EAN_L]
+EAN_G = [pattern[::-1] for pattern in EAN_R]
+
+# Parities of the left half digits, selected by the first digit
+EAN_PARITIES = ['LLLLLL', 'LLGLGG', 'LLGGLG', 'LLGGGL', 'LGLLGG',
+                'LGGLLG', 'LGGGLG', 'LGGGGL', 'LGLGLG', 'LGLGGL']
+
+
+def _widths_to_modules(widths: str) -> str:
+    """Convert alternating bar/space widths to modules, '1' for bar and '0' for space."""
+    return ''.join(('1' if i % 2 == 0 else '0') * int(width) for i, width in enumerate(widths))
+
+
+def _digit_run(data: str, start: int) -> int:
+    """Length of the run of digits in data starting at start."""
+    end = start
+    while end < len(data) and data[end].isdigit():
+        end += 1
+    return end - start
+
+
+def code128_values(data: str) -> List[int]:
+    """
+    Encode data as Code 128 symbol values, including start, checksum and stop.
+
+    Printable ASCII is encoded in code set B. Runs of digits switch to code
+    set C, which packs two digits into one symbol: at the start or end of
+    the data from 4 digits, in the middle from 6.
+    """
+    if not data:
+        raise ValueError('Barcode data is empty')
+    for char in data:
+        if not 32 <= ord(char) <= 126:
+            raise ValueError(f'Code 128 barcodes only support printable ASCII characters, not {char!r}')
+
+    values: List[int] = []
+    code_set = None
+    i = 0
+    while i < len(data):
+        run = _digit_run(data, i)
+        at_edge = i == 0 or i + run == len(data)
+        if run >= (4 if at_edge else 6) or (code_set == 'C' and run >= 2):
+            if code_set != 'C':
+                if code_set is None:
+                    values.append(CODE128_START_C)
+                else:
+                    # An odd digit left over stays in code set B
+                    if run % 2:
+                        values.append(ord(data[i]) - 32)
+                        i += 1
+                        run -= 1
+                    values.append(CODE128_CODE_C)
+                code_set = 'C'
+            for j in range(i, i + run - run % 2, 2):
+                values.append(int(data[j:j + 2]))
+            i += run - run % 2
+        else:
+            if code_set != 'B':
+                values.append(CODE128_START_B if code_set is None else CODE128_CODE_B)
+                code_set = 'B'
+            values.append(ord(data[i]) - 32)
+            i += 1
+
+    checksum = (values[0] + sum(position * value for position, value in enumerate(values[1:], 1))) % 103
+    return values + [checksum, CODE128_STOP]
+
+
+def encode_code128(data: str) -> str:
+    """Encode data as Code 128 modules, '1' for bar and '0' for space."""
+    return ''.join(_widths_to_modules(CODE128_PATTERNS[value]) for value in code128_values(data))
+
+
+def ean13_check_digit(digits: str) -> str:
+    """Check digit of the first 12 digits of an EAN-13 code."""
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(digits[:12]))
+    return str((10 - total % 10) % 10)
+
+
+def encode_ean13(data: str) -> str:
+    """
+    Encode 12 digits (the check digit is added) or 13 digits (the check digit
+    is verified) as EAN-13 modules, '1' for bar and '0' for space.
+    """
+    if not data.isdigit() or len(data) not in (12, 13):
+        raise ValueError('EAN-13 barcodes need 12 or 13 digits')
+    check_digit = ean13_check_digit(data)
+    if len(data) == 13 and data[12] != check_digit:
+        raise ValueError(f'Invalid EAN-13 check digit, expected {check_digit}')
+    digits = data[:12] + check_digit
+
+    parities = EAN_PARITIES[int(digits[0])]
+    left = ''.join((EAN_L if parity == 'L' else EAN_G)[int(digit)] for parity, digit in zip(parities, digits[1:7]))
+    right = ''.join(EAN_R[int(digit)] for digit in digits[7:])
+    return '101' + left + '01010' + right + '101'
+
+
+def encode_barcode(data: str, barcode_type: str) -> str:
+    """Encode data as modules of barcode_type, one of BARCODE_TYPES."""
+    if barcode_type == 'code128':
+        return encode_code128(data)
+    if barcode_type == 'ean13':
+        return encode_ean13(data)
+    raise ValueError(f'Unknown barcode type: {barcode_type}')
+
+
+def barcode_width(modules: str, barcode_type: str, module_dots: int) -> int:
+    """Width in dots of a barcode including its quiet zones."""
+    left, right = QUIET_ZONES[barcode_type]
+    return (left + len(modules) + right) * module_dots
+
+
+def render_barcode_image(modules: str, barcode_type: str, module_dots: int, height: int,
+                         mode: str = 'L') -> Image.Image:
+    """
+    Draw barcode modules with module_dots dots per module.
+
+    Args:
+        modules: Modules as returned by encode_barcode()
+        barcode_type: One of BARCODE_TYPES, selects the quiet zones
+        module_dots: Width of a module in printer dots
+        height: Height of the bars in dots
+        mode: Image mode of the result, e.g. 'L' or 'RGB'
+
+    Returns:
+        Black on white image including the quiet zones
+    """
+    left, right = QUIET_ZONES[barcode_type]
+    row = bytes(0 if module == '1' else 255 for module in '0' * left + modules + '0' * right)
+    im = Image.frombytes('L', (len(row), 1), row)
+    # Scaling by a whole number, so every module becomes module_dots dots wide
+    im = im.resize((len(row) * module_dots, max(1, height)), Image.NEAREST)
+    return im if mode == 'L' else im.convert(mode)
+
+
+def make_barcode_image(data: str, barcode_type: str, size: str = 'medium', max_width: int = 0,
+                       max_height: int = 0, mode: str = 'L') -> Image.Image:
+    """
+    Render data as a barcode with a whole number of dots per module.
+
+    Args:
+        data: Data to encode
+        barcode_type: One of BARCODE_TYPES
+        size: Key of BARCODE_SIZES
+        max_width: Available width in dots; the module width is reduced until
+            the barcode fits. 0 for no limit.
+        max_height: Available height in dots, 0 for no limit
+        mode: Image mode of the result
+
+    Raises:
+        ValueError: If the data cannot be encoded, the barcode does not fit
+            max_width even with one dot per module, or its bars are higher
+            than max_height
+    """
+    module_dots, height = BARCODE_SIZES.get(size, BARCODE_SIZES['medium'])
+    if max_height and height > max_height:
+        raise ValueError(f'The barcode is {height} dots high, but the label only has {max_height} dots; '
+                         f'choose a smaller barcode size')
+    modules = encode_barcode(data, barcode_type)
+    if max_width:
+        while module_dots > 1 and barcode_width(modules, barcode_type, module_dots) > max_width:
+            module_dots -= 1
+        if barcode_width(modules, barcode_type, module_dots) > max_width:
+            raise ValueError(f'Barcode is {barcode_width(modules, barcode_type, 1)} dots wide, '
+                             f'but the label only has {max_width} dots')
+    return render_barcode_image(modules, barcode_type, module_dots, height, mode)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measure the cost of fitting the font size to the label.
+
+For every scenario the largest fitting font size is searched with an empty
+text size cache (cold) and again with the measurements cached (warm). Both
+are compared with rendering the label once at the fitted size.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import brother_ql_web  # noqa: E402
+
+SCENARIOS = [
+    ('62x29 die-cut', {'label_size': '62x29', 'text': 'Brother QL\nWeb'}),
+    ('62 endless', {'label_size': '62', 'text': 'A long line that has to shrink to the label width'}),
+    ('62 endless, rotated', {'label_size': '62', 'text': 'Rotated\nlabel', 'orientation': 'rotated'}),
+    ('d24 round die-cut', {'label_size': 'd24', 'text': 'Round'}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--font-folder', default=None, help='Additional font folder')
+    parser.add_argument('--font', default='DejaVu Sans (Regular)', help='Font family and style')
+    parser.add_argument('--iterations', type=int, default=20, help='Iterations per scenario')
+    args = parser.parse_args()
+
+    brother_ql_web.setup_fonts(args.font_folder)
+
+    print(f'{"scenario":24} {"size":>5} {"fit cold":>10} {"fit warm":>10} {"render":>10}')
+    for name, params in SCENARIOS:
+        context = brother_ql_web.build_label_context(dict(params, font_family=args.font, fit_to_label='true'))
+        text = context['text']
+
+        cold_time = 0.0
+        for _ in range(args.iterations):
+            brother_ql_web.TEXT_SIZE_CACHE.clear()
+            start = time.perf_counter()
+            font_size = brother_ql_web.fit_font_size(text, (0, 0), context)
+            cold_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            brother_ql_web.fit_font_size(text, (0, 0), context)
+        warm_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            brother_ql_web.create_label_im(**context)
+        render_time = time.perf_counter() - start
+
+        print(f'{name:24} {font_size:5} {cold_time / args.iterations * 1000:8.2f}ms '
+              f'{warm_time / args.iterations * 1000:8.3f}ms {render_time / args.iterations * 1000:8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
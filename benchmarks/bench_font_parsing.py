@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare the in-process name table parser with the fc-scan subprocess
+when reading family and style names of font files.
+"""
+
+import argparse
+import shutil
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from font_helpers import (get_system_font_paths, parse_font_fontconfig, parse_font_nametable,  # noqa: E402
+                          split_font_face_path)
+
+FONT_EXTENSIONS = {'.ttf', '.otf', '.ttc'}
+
+
+def collect_font_files(directories, limit=None):
+    """Collect font files below the given directories."""
+    files = []
+    for directory in directories:
+        for font_file in sorted(Path(directory).rglob('*')):
+            if font_file.is_file() and font_file.suffix.lower() in FONT_EXTENSIONS:
+                files.append(font_file)
+                if limit and len(files) >= limit:
+                    return files
+    return files
+
+
+def time_parser(parser, files):
+    """Run parser on all files and return (elapsed seconds, results)."""
+    results = {}
+    start = time.perf_counter()
+    for font_file in files:
+        results[font_file] = parser(font_file)
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directories', nargs='*',
+                        help='Font directories to scan (default: system font directories)')
+    parser.add_argument('--limit', type=int, default=None, help='Maximum number of font files')
+    args = parser.parse_args()
+
+    directories = args.directories or get_system_font_paths()
+    files = collect_font_files(directories, args.limit)
+    if not files:
+        sys.exit('No font files found.')
+
+    print(f'Font files: {len(files)}')
+
+    elapsed, nametable_results = time_parser(parse_font_nametable, files)
+    faces = sum(len(result) for result in nametable_results.values())
+    print(f'name table: {elapsed * 1000:9.1f} ms total, {elapsed / len(files) * 1e6:9.1f} us/file, {faces} faces')
+
+    if not shutil.which('fc-scan'):
+        print('fc-scan: not installed, skipping comparison')
+        return
+
+    elapsed_fc, fc_results = time_parser(parse_font_fontconfig, files)
+    print(f'fc-scan:    {elapsed_fc * 1000:9.1f} ms total, {elapsed_fc / len(files) * 1e6:9.1f} us/file')
+    if elapsed:
+        print(f'speedup:    {elapsed_fc / elapsed:9.1f}x')
+
+    # fc-scan only reports the first face, so compare against that one
+    mismatches = 0
+    for font_file in files:
+        fc_info = fc_results[font_file]
+        nametable_info = nametable_results[font_file][0] if nametable_results[font_file] else None
+        if fc_info is None or nametable_info is None:
+            continue
+        if (fc_info['family'], fc_info['style']) != (nametable_info['family'], nametable_info['style']):
+            mismatches += 1
+            print(f'  differs: {split_font_face_path(nametable_info["path"])[0]}: '
+                  f'fc-scan {fc_info["family"]} ({fc_info["style"]}), '
+                  f'name table {nametable_info["family"]} ({nametable_info["style"]})')
+    print(f'mismatching names: {mismatches}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measure listing the print history as it grows.
+
+A temporary history database is filled with increasing numbers of entries.
+For each size, the script reports the time to load the first page, a page
+at 90% of the history with the keyset cursor of HistoryStore.list(), the
+same page with LIMIT/OFFSET, which has to step over all newer entries, and
+the time to search the texts.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from history_store import HistoryStore, COLUMNS, encode_cursor  # noqa: E402
+
+WORDS = ('shelf', 'box', 'cable', 'drawer', 'office', 'kitchen', 'garage', 'spare', 'parts', 'tools')
+
+
+def fill(history, start, count, now):
+    """Insert entries start to start + count, one per second, all before now."""
+    rows = []
+    for i in range(start, start + count):
+        text = f'{WORDS[i % len(WORDS)]} {i}\n{WORDS[i * 7 % len(WORDS)]}'
+        rows.append((now - 10 ** 6 + i, f'job{i}', 'failed' if i % 50 == 0 else 'done',
+                     '62' if i % 3 else '29', text, json.dumps({'text': text, 'label_size': '62'})))
+    with history._lock:
+        history._conn.execute('BEGIN')
+        history._conn.executemany('INSERT INTO history (created_at, job_id, status, label_size, text, params) '
+                                  'VALUES (?, ?, ?, ?, ?, ?)', rows)
+        history._conn.execute('COMMIT')
+
+
+def timed(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = function()
+    return (time.perf_counter() - start) / iterations * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page-size', type=int, default=50, help='Entries per page')
+    parser.add_argument('--iterations', type=int, default=20, help='Iterations per measurement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        history = HistoryStore(os.path.join(folder, 'history.sqlite3'), max_entries=0, max_age_days=0)
+        now = time.time()
+
+        print(f'{"entries":>8} {"first":>9} {"deep":>9} {"offset":>9} {"search":>9}')
+        size = 0
+        for target in (10000, 100000, 500000):
+            fill(history, size, target - size, now)
+            size = target
+
+            first_time, _ = timed(lambda: history.list(args.page_size), args.iterations)
+
+            # The cursor of the deep page, as a client paging through the history would have it
+            offset = size * 9 // 10
+            with history._lock:
+                created_at, entry_id = history._conn.execute(
+                    'SELECT created_at, id FROM history ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?',
+                    (offset - 1,)).fetchone()
+            cursor = encode_cursor(created_at, entry_id)
+            deep_time, _ = timed(lambda: history.list(args.page_size, cursor), args.iterations)
+
+            def offset_page():
+                with history._lock:
+                    return history._conn.execute(
+                        f'SELECT {", ".join(COLUMNS)} FROM history ORDER BY created_at DESC, id DESC '
+                        f'LIMIT ? OFFSET ?', (args.page_size, offset)).fetchall()
+            offset_time, _ = timed(offset_page, args.iterations)
+
+            search_time, _ = timed(lambda: history.list(args.page_size, search='garage 99'), args.iterations)
+
+            print(f'{size:8} {first_time:7.2f}ms {deep_time:7.2f}ms {offset_time:7.2f}ms {search_time:7.2f}ms')
+
+        history.close()
+
+
+if __name__ == '__main__':
+    main()
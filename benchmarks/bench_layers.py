@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measure rendering a batch of labels from one template with and without layer caching.
+
+Every label of the batch has the same QR code or barcode and a different
+serial number, like a mail merge. The batch is rendered once with the layer
+cache disabled, so every label renders its code and canvas again, and once
+with it enabled, so only the text is drawn per label. The script reports
+the fastest time per label and checks that both renders are identical.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import brother_ql_web  # noqa: E402
+
+TEMPLATES = {
+    'qr': {'enable_qr': 'true', 'qr_data': 'https://example.com/inventory/location/warehouse-7',
+           'qr_size': 'large', 'qr_error_correction': 'M'},
+    'barcode': {'enable_barcode': 'true', 'barcode_data': 'WAREHOUSE-7-SHELF-12', 'barcode_size': 'small'},
+}
+
+
+def render_batch(contexts):
+    start = time.perf_counter()
+    images = [brother_ql_web.create_label_im(**context) for context in contexts]
+    return (time.perf_counter() - start) / len(contexts) * 1000, [im.tobytes() for im in images]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--font-folder', default=None, help='Additional font folder')
+    parser.add_argument('--font', default='DejaVu Sans (Regular)', help='Font family and style')
+    parser.add_argument('--labels', type=int, default=200, help='Labels per batch')
+    parser.add_argument('--repeat', type=int, default=3, help='Renders per batch, the fastest counts')
+    args = parser.parse_args()
+
+    brother_ql_web.setup_fonts(args.font_folder)
+    cache = brother_ql_web.LAYER_CACHE
+    max_entries = cache.max_entries
+
+    print(f'{"template":>9} {"label":>6} {"uncached":>10} {"layers":>10} {"speedup":>8} {"identical":>10}')
+    failed = False
+    for name, template in TEMPLATES.items():
+        for label_size in ('62x29', '62', '62red'):
+            contexts = [brother_ql_web.build_label_context(dict(
+                template, text=f'Shelf 12\nItem {i:05d}', font_family=args.font, font_size=40,
+                label_size=label_size)) for i in range(args.labels)]
+
+            # Text measurements are cached independently of the layers, so warm them up first
+            cache.resize(0)
+            render_batch(contexts)
+            uncached_time, reference = min(render_batch(contexts) for _ in range(args.repeat))
+            cache.resize(max_entries, cache.max_bytes)
+            cached_time, images = min(render_batch(contexts) for _ in range(args.repeat))
+
+            identical = images == reference
+            failed = failed or not identical
+            print(f'{name:>9} {label_size:>6} {uncached_time:8.3f}ms {cached_time:8.3f}ms '
+                  f'{uncached_time / cached_time:7.2f}x {str(identical):>10}')
+
+    if failed:
+        sys.exit('Rendering with layers differs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare the size and encoding time of preview images with different
+preview options (colors, compress_level, max_width).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import brother_ql_web  # noqa: E402
+
+LABELS = [
+    ('62 endless', {'label_size': '62', 'text': 'Brother QL\nWeb', 'font_size': 100}),
+    ('62 endless, long', {'label_size': '62', 'text': 'A long endless label ' * 6,
+                          'font_size': 100, 'orientation': 'rotated'}),
+    ('62red endless', {'label_size': '62red', 'text': 'Black/red\nlabel', 'font_size': 100}),
+]
+
+OPTIONS = [
+    ('full, level 6', {'colors': 'full', 'compress_level': 6}),
+    ('full, level 1', {'colors': 'full', 'compress_level': 1}),
+    ('palette, level 1', {'colors': 'palette', 'compress_level': 1}),
+    ('mono, level 1', {'colors': 'mono', 'compress_level': 1}),
+    ('palette, 800px', {'colors': 'palette', 'compress_level': 1, 'max_width': 800}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--font-folder', default=None, help='Additional font folder')
+    parser.add_argument('--font', default='DejaVu Sans (Regular)', help='Font family and style')
+    parser.add_argument('--iterations', type=int, default=10, help='Iterations per combination')
+    args = parser.parse_args()
+
+    brother_ql_web.setup_fonts(args.font_folder)
+
+    print(f'{"label":18} {"options":18} {"size":>9} {"encode":>9} {"base64":>9}')
+    for label_name, params in LABELS:
+        context = brother_ql_web.build_label_context(dict(params, font_family=args.font))
+        im = brother_ql_web.create_label_im(**context)
+        for options_name, options in OPTIONS:
+            options = dict({'scale': 1.0, 'max_width': None}, **options)
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                png_bytes = brother_ql_web.encode_preview(im, context, options)
+            elapsed = (time.perf_counter() - start) / args.iterations
+            base64_size = (len(png_bytes) + 2) // 3 * 4
+            print(f'{label_name:18} {options_name:18} {len(png_bytes) / 1024:7.1f}kB '
+                  f'{elapsed * 1000:7.2f}ms {base64_size / 1024:7.1f}kB')
+
+
+if __name__ == '__main__':
+    main()
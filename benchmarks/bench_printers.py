@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measure how the print throughput grows with the number of printers in the pool.
+
+The printers are simulated: a write takes as long as sending the raster data
+at a fixed rate would. For each pool size, a burst of jobs of varying sizes
+is submitted and the time until all of them are printed is reported, along
+with the share of the jobs each printer printed. A last run takes one
+printer offline during the burst, so its jobs are handed over.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from printer_pool import PrinterPool  # noqa: E402
+
+OFFLINE = set()
+
+
+class SimulatedBackend:
+    """Printer backend sending the data at BYTES_PER_SECOND."""
+
+    BYTES_PER_SECOND = 2_000_000
+
+    def __init__(self, device):
+        if device in OFFLINE:
+            raise OSError(f'{device} is offline')
+        self.device = device
+
+    def write(self, data):
+        if self.device in OFFLINE:
+            raise OSError(f'{self.device} is offline')
+        time.sleep(len(data) / self.BYTES_PER_SECOND)
+
+    def dispose(self):
+        pass
+
+
+def run(printers, jobs, offline=None):
+    pool = PrinterPool()
+    for i in range(printers):
+        pool.add(f'ql{i + 1}', 'QL-820NWB', f'tcp://ql{i + 1}', SimulatedBackend, label_sizes=['62'],
+                 status_interval=60)
+    pool.start()
+
+    OFFLINE.clear()
+    if offline:
+        OFFLINE.add(f'tcp://{offline}')
+
+    start = time.perf_counter()
+    submitted = [pool.submit(data, '62', 'QL-820NWB') for data in jobs]
+    for job in submitted:
+        job.finished.wait()
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for job in submitted if job.error)
+    shares = {printer.name: printer.queue.jobs_done for printer in pool.printers}
+    handed_over = sum(printer.queue.jobs_handed_over for printer in pool.printers)
+    pool.stop()
+    return elapsed, failed, handed_over, shares
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--jobs', type=int, default=120, help='Jobs per burst')
+    parser.add_argument('--max-printers', type=int, default=4, help='Largest pool size')
+    args = parser.parse_args()
+
+    # Labels of 10-40 kB of raster data, like 62 mm labels of different lengths
+    rng = random.Random(0)
+    jobs = [bytes(rng.randint(10_000, 40_000)) for _ in range(args.jobs)]
+    total = sum(len(data) for data in jobs)
+
+    print(f'{"printers":>8} {"time":>8} {"jobs/s":>8} {"speedup":>8} {"failed":>7} {"handed":>7}  jobs per printer')
+    baseline = None
+    sizes = [n for n in (1, 2, 3, 4, 6, 8) if n <= args.max_printers]
+    for printers in sizes:
+        elapsed, failed, handed_over, shares = run(printers, jobs)
+        baseline = baseline or elapsed
+        print(f'{printers:8} {elapsed:7.2f}s {len(jobs) / elapsed:8.1f} {baseline / elapsed:7.2f}x '
+              f'{failed:7} {handed_over:7}  {" ".join(str(n) for n in shares.values())}')
+
+    printers = sizes[-1]
+    if printers > 1:
+        elapsed, failed, handed_over, shares = run(printers, jobs, offline='ql1')
+        print(f'{printers:8} {elapsed:7.2f}s {len(jobs) / elapsed:8.1f} {baseline / elapsed:7.2f}x '
+              f'{failed:7} {handed_over:7}  {" ".join(str(n) for n in shares.values())}  (ql1 offline)')
+
+    print(f'{total / 1e6:.1f} MB of raster data at {SimulatedBackend.BYTES_PER_SECOND / 1e6:.0f} MB/s per printer')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare QR code rendering through qrcode's image factory with the cached matrix.
+
+Every scenario is rendered as qrcode's PIL image (converted to the label's
+image mode) and with qr_helpers.make_qr_image(), once with an empty matrix
+cache (cold) and once with the matrix cached (warm). The images must be
+identical (the script exits with status 1 otherwise).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from qr_helpers import QR_AVAILABLE, QR_MATRIX_CACHE, make_qr_image  # noqa: E402
+
+# (name, data, box size, border, error correction, image mode)
+SCENARIOS = [
+    ('short URL, medium', 'https://example.com/asset/0042', 6, 2, 'L', 'L'),
+    ('short URL, large, H', 'https://example.com/asset/0042', 8, 2, 'H', 'L'),
+    ('serial number, small', 'SN-2024-000123', 4, 2, 'M', 'L'),
+    ('vCard, medium', 'BEGIN:VCARD\nVERSION:3.0\nN:Doe;Jane\nTEL:+1 555 0100\nEND:VCARD', 6, 2, 'Q', 'L'),
+    ('short URL, red label', 'https://example.com/asset/0042', 6, 2, 'L', 'RGB'),
+    ('QR preview endpoint', 'https://example.com/asset/0042', 10, 4, 'L', 'L'),
+]
+
+
+def qrcode_image(data, box_size, border, error_correction, mode):
+    """Render a QR code like create_label_im did before the matrix cache."""
+    import qrcode
+    import qrcode.constants
+
+    qr = qrcode.QRCode(version=1, error_correction=getattr(qrcode.constants, f'ERROR_CORRECT_{error_correction}'),
+                       box_size=box_size, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.make_image(fill_color='black', back_color='white').convert(mode)
+
+
+def time_call(function, iterations, before=None):
+    """Return (seconds per call, last result) of function()."""
+    total = 0.0
+    for _ in range(iterations):
+        if before:
+            before()
+        start = time.perf_counter()
+        result = function()
+        total += time.perf_counter() - start
+    return total / iterations, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=50, help='Iterations per scenario')
+    args = parser.parse_args()
+
+    if not QR_AVAILABLE:
+        sys.exit('qrcode is not installed.')
+
+    mismatches = 0
+    print(f'{"scenario":24} {"qrcode":>9} {"cold":>9} {"warm":>9}  identical')
+    for name, data, box_size, border, error_correction, mode in SCENARIOS:
+        reference_time, reference = time_call(
+            lambda: qrcode_image(data, box_size, border, error_correction, mode), args.iterations)
+        render = lambda: make_qr_image(data, box_size, border, error_correction, None, mode)  # noqa: E731
+        cold_time, _ = time_call(render, args.iterations, before=QR_MATRIX_CACHE.clear)
+        warm_time, image = time_call(render, args.iterations)
+        identical = image.mode == reference.mode and image.tobytes() == reference.tobytes()
+        mismatches += not identical
+        print(f'{name:24} {reference_time * 1000:7.2f}ms {cold_time * 1000:7.2f}ms {warm_time * 1000:7.3f}ms  '
+              f'{"yes" if identical else "NO"}')
+
+    if mismatches:
+        sys.exit(f'{mismatches} scenarios produced different images.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare the speed of the NumPy rasterizer and brother_ql.create_label.
+
+Every scenario is rasterized with both engines and the time per label is
+reported for both. tests/test_rasterizer.py checks that both create the
+same raster data.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import brother_ql_web  # noqa: E402
+from brother_ql.raster import BrotherQLRaster  # noqa: E402
+from rasterizer import NUMPY_AVAILABLE, rasterize_label_image  # noqa: E402
+
+# (name, label parameters, create_label options)
+SCENARIOS = [
+    ('62 endless', {'label_size': '62', 'text': 'Brother QL\nWeb'}, {}),
+    ('62 endless, rotated', {'label_size': '62', 'text': 'A long endless label ' * 6,
+                             'orientation': 'rotated'}, {}),
+    ('62 endless, QR code', {'label_size': '62', 'text': 'Asset 0042', 'font_size': 80,
+                             'enable_qr': 'true', 'qr_data': 'https://example.com/asset/0042'}, {}),
+    ('62 endless, threshold 30', {'label_size': '62', 'text': 'Light', 'threshold': 30}, {}),
+    ('29 endless, compressed', {'label_size': '29', 'text': 'Compressed', 'font_size': 60},
+     {'compress': True}),
+    ('62x29 die-cut', {'label_size': '62x29', 'text': 'Brother QL', 'font_size': 70}, {}),
+    ('62x29 die-cut, rotated', {'label_size': '62x29', 'text': 'Rotated', 'font_size': 70,
+                                'orientation': 'rotated'}, {}),
+    ('d24 round die-cut', {'label_size': 'd24', 'text': 'Round', 'font_size': 40}, {}),
+    ('62red endless', {'label_size': '62red', 'text': 'Black/red\nlabel'}, {}),
+    ('62red endless, QR code', {'label_size': '62red', 'text': 'Red', 'enable_qr': 'true',
+                                'qr_data': 'red and black'}, {}),
+    ('62 endless, no cut', {'label_size': '62', 'text': 'No cut'}, {'cut': False}),
+]
+
+
+def rasterize(context, im, model, engine, options):
+    """Rasterize a label image with engine, returning the raster data."""
+    qlr = BrotherQLRaster(model)
+    kwargs = {
+        'red': brother_ql_web.is_red_label(context['label_size']),
+        'threshold': context['threshold'],
+        'rotate': brother_ql_web.get_label_rotation(context),
+        'cut': True,
+    }
+    kwargs.update(options)
+    return rasterize_label_image(qlr, im, context['label_size'], engine, **kwargs)
+
+
+def time_engine(context, im, model, engine, options, iterations):
+    """Return the seconds per label for engine."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        rasterize(context, im, model, engine, options)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--font-folder', default=None, help='Additional font folder')
+    parser.add_argument('--font', default='DejaVu Sans (Regular)', help='Font family and style')
+    parser.add_argument('--model', default='QL-820NWB', help='Printer model (needs black/red support)')
+    parser.add_argument('--iterations', type=int, default=10, help='Iterations per scenario')
+    args = parser.parse_args()
+
+    if not NUMPY_AVAILABLE:
+        sys.exit('numpy is not installed.')
+
+    brother_ql_web.setup_fonts(args.font_folder)
+
+    print(f'{"scenario":28} {"brother_ql":>11} {"numpy":>9} {"speedup":>8}')
+    for name, params, options in SCENARIOS:
+        context = brother_ql_web.build_label_context(dict(params, font_family=args.font))
+        im = brother_ql_web.create_label_im(**context)
+        reference_time = time_engine(context, im, args.model, 'brother_ql', options, args.iterations)
+        numpy_time = time_engine(context, im, args.model, 'numpy', options, args.iterations)
+        print(f'{name:28} {reference_time * 1000:9.2f}ms {numpy_time * 1000:7.2f}ms '
+              f'{reference_time / numpy_time:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare rendering black-only labels in RGB with rendering them in grayscale.
+
+For every scenario the label is rendered and rasterized with both image
+modes. The script reports the size of the rendered image, the render and
+render-to-raster times, and checks that both modes produce the same raster
+data.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import brother_ql_web  # noqa: E402
+from brother_ql.raster import BrotherQLRaster  # noqa: E402
+
+SCENARIOS = [
+    ('62x29 die-cut', {'label_size': '62x29', 'text': 'Brother QL', 'font_size': 70}),
+    ('62 endless', {'label_size': '62', 'text': 'Brother QL\nWeb', 'font_size': 100}),
+    ('62 endless, long', {'label_size': '62', 'text': 'A long endless label ' * 6,
+                          'font_size': 100, 'orientation': 'rotated'}),
+    ('62 endless, many lines', {'label_size': '62', 'text': '\n'.join(f'Line {i}' for i in range(40)),
+                                'font_size': 60}),
+    ('62 endless, QR code', {'label_size': '62', 'text': 'Asset 0042', 'font_size': 80,
+                             'enable_qr': 'true', 'qr_data': 'https://example.com/asset/0042'}),
+]
+
+
+def time_mode(context, image_mode, model, iterations):
+    """Render and rasterize a label, returning (image bytes, render s, total s, raster data)."""
+    render_time = 0.0
+    total_time = 0.0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        im = brother_ql_web.create_label_im(**context, image_mode=image_mode)
+        rendered = time.perf_counter()
+        qlr = BrotherQLRaster(model)
+        brother_ql_web.rasterize_label(qlr, im, context)
+        finished = time.perf_counter()
+        render_time += rendered - start
+        total_time += finished - start
+    image_bytes = im.size[0] * im.size[1] * len(im.getbands())
+    return image_bytes, render_time / iterations, total_time / iterations, qlr.data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--font-folder', default=None, help='Additional font folder')
+    parser.add_argument('--font', default='DejaVu Sans (Regular)', help='Font family and style')
+    parser.add_argument('--model', default='QL-720NW', help='Printer model')
+    parser.add_argument('--iterations', type=int, default=20, help='Iterations per scenario')
+    args = parser.parse_args()
+
+    brother_ql_web.setup_fonts(args.font_folder)
+
+    print(f'{"scenario":24} {"mode":4} {"image":>10} {"render":>10} {"to raster":>10}  same raster')
+    for name, params in SCENARIOS:
+        context = brother_ql_web.build_label_context(dict(params, font_family=args.font))
+        results = {mode: time_mode(context, mode, args.model, args.iterations) for mode in ('RGB', 'L')}
+        same = results['RGB'][3] == results['L'][3]
+        for mode, (image_bytes, render_time, total_time, _) in results.items():
+            print(f'{name:24} {mode:4} {image_bytes / 1024:8.0f}kB {render_time * 1000:8.2f}ms '
+                  f'{total_time * 1000:8.2f}ms  {"yes" if same else "NO"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare the throughput of the WSGI servers selectable with --server.
+
+For every server, the web service is started in a subprocess and loaded
+with concurrent preview requests (each with a different text, so the
+preview cache does not answer them). Meanwhile, the latency of small
+requests like the job list polled by the browser is measured, while one
+slow client (like an upload over a poor connection) holds a request open.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port():
+    """Get a free TCP port on localhost."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(base_url, timeout=60):
+    """Wait until the server answers requests."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'{base_url}/api/jobs', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {base_url} did not start')
+
+
+def fetch(url):
+    """Fetch url and return the request duration in seconds."""
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=60) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def slow_client(port, duration):
+    """Send a request in pieces over duration seconds, like a client on a poor connection."""
+    request = b'GET /api/jobs HTTP/1.0\r\nHost: localhost\r\nUser-Agent: slow\r\n\r\n'
+    pieces = 10
+    with socket.create_connection(('127.0.0.1', port)) as sock:
+        for piece in range(pieces):
+            time.sleep(duration / pieces)
+            start, end = len(request) * piece // pieces, len(request) * (piece + 1) // pieces
+            sock.sendall(request[start:end])
+        sock.recv(1024)
+
+
+def run_load(base_url, port, requests, clients, font, font_size, slow_client_seconds):
+    """Send preview requests from several clients while polling a small endpoint."""
+    urls = [
+        f'{base_url}/api/preview/text?' + urllib.parse.urlencode({
+            'text': f'Benchmark label {i}', 'font_family': font, 'font_size': font_size, 'return_format': 'png',
+        })
+        for i in range(requests)
+    ]
+
+    poll_latencies = []
+    stop = threading.Event()
+
+    def poll():
+        while not stop.is_set():
+            try:
+                poll_latencies.append(fetch(f'{base_url}/api/jobs'))
+            except OSError:
+                return
+            time.sleep(0.05)
+
+    poller = threading.Thread(target=poll, daemon=True)
+    poller.start()
+    if slow_client_seconds:
+        threading.Thread(target=slow_client, args=(port, slow_client_seconds), daemon=True).start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = list(executor.map(fetch, urls))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    poller.join()
+
+    return {
+        'requests_per_second': requests / elapsed,
+        'preview_p50': statistics.median(latencies),
+        'poll_p50': statistics.median(poll_latencies) if poll_latencies else None,
+        'poll_max': max(poll_latencies) if poll_latencies else None,
+    }
+
+
+def benchmark_server(server, args):
+    """Start the web service with server and measure it."""
+    port = free_port()
+    command = [sys.executable, str(ROOT / 'brother_ql_web.py'), '--host', '127.0.0.1',
+               '--port', str(port), '--server', server, '--threads', str(args.threads),
+               '--loglevel', 'WARNING', 'file:///dev/null']
+    if args.font_folder:
+        command[2:2] = ['--font-folder', args.font_folder]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, env=dict(os.environ, PYTHONUNBUFFERED='1'))
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        wait_for_server(base_url)
+        return run_load(base_url, port, args.requests, args.clients, args.font, args.font_size,
+                        args.slow_client)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('servers', nargs='*', default=['wsgiref', 'threaded'],
+                        help='Servers to compare (default: wsgiref threaded)')
+    parser.add_argument('--requests', type=int, default=200, help='Number of preview requests')
+    parser.add_argument('--clients', type=int, default=8, help='Number of concurrent clients')
+    parser.add_argument('--threads', type=int, default=8, help='Server threads')
+    parser.add_argument('--font', default='DejaVu Sans (Regular)', help='Font family and style of the previews')
+    parser.add_argument('--font-size', type=int, default=70, help='Font size of the previews')
+    parser.add_argument('--slow-client', type=float, default=1.0,
+                        help='Seconds one slow client takes to send its request (0 to disable)')
+    parser.add_argument('--font-folder', default=None, help='Additional font folder')
+    args = parser.parse_args()
+
+    print(f'{args.requests} previews, {args.clients} clients, {args.threads} server threads')
+    print(f'{"server":10} {"req/s":>8} {"preview p50":>12} {"poll p50":>10} {"poll max":>10}')
+    for server in args.servers:
+        try:
+            result = benchmark_server(server, args)
+        except Exception as e:
+            print(f'{server:10} failed: {e}')
+            continue
+        print(f'{server:10} {result["requests_per_second"]:8.1f} '
+              f'{result["preview_p50"] * 1000:10.1f}ms '
+              f'{result["poll_p50"] * 1000:8.1f}ms {result["poll_max"] * 1000:8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
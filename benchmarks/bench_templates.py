@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare listing templates from the template index with reading every file.
+
+A temporary folder is filled with increasing numbers of templates. For each
+size, the script reports the time to read and parse all template files (what
+every /api/templates request did before the index), the time of a listing
+right after a template was saved (the index rescans the folder but only
+parses the changed file) and the time of a page from an unchanged index.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from template_store import TemplateStore, MTIME_RESOLUTION  # noqa: E402
+
+
+def read_all(folder):
+    templates = []
+    for path in Path(folder).glob('*.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            templates.append(json.load(f))
+    return templates
+
+
+def timed(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page-size', type=int, default=48, help='Templates per page')
+    parser.add_argument('--iterations', type=int, default=10, help='Iterations per measurement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        store = TemplateStore(folder)
+
+        print(f'{"templates":>9} {"read all":>10} {"rescan":>10} {"indexed":>10}')
+        size = 0
+        for target in (100, 1000, 5000):
+            for i in range(size, target):
+                store.save({'name': f'Template {i}', 'text': [f'Line {i}', 'Second line'], 'label_size': '62',
+                            'font_size': 40, 'category': 'custom', 'created': f'2026-01-01T00:{i % 60:02d}:00'})
+            size = target
+
+            read_time = timed(lambda: read_all(folder), args.iterations)
+
+            def save_and_list():
+                store.save({'name': 'Template 0', 'text': ['changed'], 'label_size': '62'})
+                store.list(0, args.page_size)
+            rescan_time = timed(save_and_list, args.iterations)
+
+            # Let the folder time age, so the index trusts it again
+            time.sleep(MTIME_RESOLUTION)
+            store.list(0, args.page_size)
+            indexed_time = timed(lambda: store.list(0, args.page_size), args.iterations * 10)
+
+            print(f'{size:9} {read_time:8.2f}ms {rescan_time:8.2f}ms {indexed_time:8.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
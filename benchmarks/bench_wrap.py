@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare word wrapping with cached glyph advances and with textbbox.
+
+The same text is wrapped greedily to the printable width of a label, once
+by measuring every candidate line with textbbox and once by summing cached
+character advances. The script reports the time per layout for increasing
+text lengths and how many lines differ between both layouts (kerning is
+not included in the advances, so a line may occasionally break one word
+earlier or later).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import brother_ql_web  # noqa: E402
+from font_helpers import get_font_object  # noqa: E402
+from text_layout import get_glyph_advances, wrap_text  # noqa: E402
+
+WORDS = ('Brother QL labels print text in any installed font, with an optional QR code, '
+         'on endless and die-cut tapes of many widths').split()
+
+
+def wrap_textbbox(text, font, max_width):
+    """Greedy wrapping that measures every candidate line with textbbox."""
+    draw = ImageDraw.Draw(Image.new('L', (20, 20), 'white'))
+    lines = []
+    line = ''
+    for word in text.split():
+        candidate = f'{line} {word}' if line else word
+        bbox = draw.textbbox((0, 0), candidate, font=font)
+        if line and bbox[2] - bbox[0] > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    lines.append(line)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--font-folder', default=None, help='Additional font folder')
+    parser.add_argument('--font', default='DejaVu Sans (Regular)', help='Font family and style')
+    parser.add_argument('--font-size', type=int, default=40, help='Font size')
+    parser.add_argument('--label-size', default='62', help='Label size')
+    parser.add_argument('--iterations', type=int, default=10, help='Iterations per text length')
+    args = parser.parse_args()
+
+    brother_ql_web.setup_fonts(args.font_folder)
+    context = brother_ql_web.build_label_context({'text': '', 'font_family': args.font,
+                                                  'font_size': args.font_size, 'label_size': args.label_size})
+    max_width = brother_ql_web.get_text_width_limit((0, 0), context)
+    font = get_font_object(context['font_path'], context['font_size'], context['font_index'])
+
+    print(f'{"words":>6} {"lines":>6} {"textbbox":>10} {"advances":>10} {"speedup":>8} {"differ":>7}')
+    for words in (20, 100, 500, 2000):
+        text = ' '.join(WORDS[i % len(WORDS)] for i in range(words))
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            reference = wrap_textbbox(text, font, max_width)
+        bbox_time = (time.perf_counter() - start) / args.iterations
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            advances = get_glyph_advances(context['font_path'], context['font_size'], context['font_index'])
+            wrapped = wrap_text(text, advances, max_width, 'greedy')
+        advance_time = (time.perf_counter() - start) / args.iterations
+
+        reference_lines, lines = reference.split('\n'), wrapped.split('\n')
+        differ = sum(a != b for a, b in zip(reference_lines, lines)) + abs(len(reference_lines) - len(lines))
+        print(f'{words:6} {len(lines):6} {bbox_time * 1000:8.2f}ms {advance_time * 1000:8.2f}ms '
+              f'{bbox_time / advance_time:7.1f}x {differ:7}')
+
+
+if __name__ == '__main__':
+    main()
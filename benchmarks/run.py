@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark suite for the render, rasterize and preview paths.
+
+Every label size is rendered in both orientations, with and without a QR
+code, with a short and a long multi-line text, using the DejaVu Sans font in
+benchmarks/fonts, so the results do not depend on the installed fonts. For
+every case, three paths are measured: rendering the label image
+(create_label_im), creating the raster instructions from it and encoding it
+as a preview PNG. The script reports operations per second, median and 99th
+percentile time and the peak memory of one operation per case and path.
+The iterations of a case are spread over several rounds through all cases,
+so a phase in which the machine is busy does not slow down single cases.
+
+Results can be saved as JSON (--output) and compared with results saved
+earlier (--baseline). Cases whose median time or peak memory grew by more
+than --threshold are reported as regressions and make the script exit with
+status 1.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import datetime
+import gc
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import PIL  # noqa: E402
+from brother_ql import BrotherQLRaster  # noqa: E402
+from brother_ql.devicedependent import label_sizes, label_type_specs  # noqa: E402
+
+import brother_ql_web  # noqa: E402
+from qr_helpers import QR_MATRIX_CACHE  # noqa: E402
+from rasterizer import RASTERIZERS, NUMPY_AVAILABLE  # noqa: E402
+from text_layout import clear_layout_cache  # noqa: E402
+
+FONT_PATH = ROOT / 'benchmarks' / 'fonts' / 'DejaVuSans.ttf'
+FONT_FAMILY = 'DejaVu Sans (Book)'
+
+PATHS = ('render', 'rasterize', 'preview')
+
+TEXTS = {
+    'short': 'Shelf 12',
+    'long': '\n'.join([
+        'Warehouse 7 - Aisle 3 - Shelf 12',
+        'Item 00042: M4x20 hex bolts',
+        'Stainless steel A2, DIN 933',
+        'Qty 250 - Reorder at 50',
+        'Supplier: Example Fasteners Ltd.',
+        'Checked 2026-01-15',
+    ]),
+}
+
+QR_PARAMS = {'enable_qr': 'true', 'qr_data': 'https://example.com/inventory/item/00042', 'qr_size': 'medium'}
+
+# Label sizes of a --quick run: endless, two-color, die-cut, round and wide labels
+QUICK_LABEL_SIZES = ('62', '62red', '62x29', 'd24', '102')
+
+# Preview options of /api/preview/text without parameters
+PREVIEW_OPTIONS = {'colors': 'full', 'compress_level': brother_ql_web.DEFAULT_PREVIEW_COMPRESS_LEVEL,
+                   'scale': 1.0, 'max_width': None}
+
+# Slowdowns smaller than this are measurement noise, whatever the relative change
+MIN_TIME_CHANGE_MS = 0.1
+MIN_MEMORY_CHANGE_KB = 1024
+
+
+def model_for(label_size):
+    """Get a printer model that prints label_size: the 102 mm sizes need a wide printer."""
+    if label_type_specs[label_size]['dots_total'][0] > 732:
+        return 'QL-1060N'
+    return 'QL-820NWB'
+
+
+def clear_caches():
+    """Forget cached text measurements, code layers and QR codes, so every render starts cold."""
+    brother_ql_web.LAYER_CACHE.clear()
+    brother_ql_web.TEXT_SIZE_CACHE.clear()
+    QR_MATRIX_CACHE.clear()
+    clear_layout_cache()
+
+
+class PeakMemory:
+    """
+    Peak memory allocated while running a function.
+
+    On Linux, free heap memory is returned to the system and the peak
+    resident set size is reset before the call, so the peak includes the
+    pixel buffers Pillow allocates outside of Python's allocator. Elsewhere,
+    tracemalloc measures the Python allocations.
+    """
+
+    def __init__(self):
+        self.method = 'rss'
+        try:
+            self._reset_peak()
+            self._read_status()
+            self._malloc_trim = ctypes.CDLL(ctypes.util.find_library('c')).malloc_trim
+        except (OSError, KeyError, ValueError, AttributeError):
+            self.method = 'tracemalloc'
+
+    @staticmethod
+    def _reset_peak():
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+
+    @staticmethod
+    def _read_status():
+        values = {}
+        with open('/proc/self/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'VmHWM'):
+                    values[key] = int(value.split()[0])
+        return values['VmRSS'], values['VmHWM']
+
+    def measure(self, function):
+        """Run function and get its peak memory in kB."""
+        gc.collect()
+        if self.method == 'rss':
+            # Otherwise the call reuses freed memory without raising the peak
+            self._malloc_trim(0)
+            self._reset_peak()
+            rss_before, _ = self._read_status()
+            function()
+            _, peak = self._read_status()
+            return max(0, peak - rss_before)
+
+        tracemalloc.start()
+        try:
+            function()
+            return tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+
+def iter_cases(sizes):
+    """Yield (case name, label parameters) for all combinations."""
+    for label_size in sizes:
+        for orientation in ('standard', 'rotated'):
+            for qr in (False, True):
+                for text_name, text in TEXTS.items():
+                    name = f"{label_size}/{orientation}/{'qr' if qr else 'text'}/{text_name}"
+                    params = {'text': text, 'font_family': FONT_FAMILY, 'font_size': 40,
+                              'label_size': label_size, 'orientation': orientation}
+                    if qr:
+                        params.update(QR_PARAMS)
+                    yield name, params
+
+
+def percentile(sorted_values, fraction):
+    """Get a percentile of sorted values by the nearest-rank method."""
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def time_function(function, prepare, iterations, warmup):
+    """Get the durations of iterations calls in seconds, running prepare before each call untimed."""
+    for _ in range(warmup):
+        prepare()
+        function()
+
+    durations = []
+    gc_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            prepare()
+            start = time.perf_counter()
+            function()
+            durations.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return durations
+
+
+def make_functions(params):
+    """Get the function of every path for a case, each running the path once."""
+    context = brother_ql_web.build_label_context(params)
+    model = model_for(params['label_size'])
+    image = brother_ql_web.create_label_im(**context)
+
+    def render():
+        brother_ql_web.create_label_im(**context)
+
+    def rasterize():
+        brother_ql_web.rasterize_label(BrotherQLRaster(model), image, context)
+
+    def preview():
+        brother_ql_web.encode_preview(image, context, PREVIEW_OPTIONS)
+
+    return {'render': render, 'rasterize': rasterize, 'preview': preview}
+
+
+def summarize(durations, peak_kb):
+    """Get the result of a case and path from its durations in seconds."""
+    durations = sorted(durations)
+    mean = statistics.fmean(durations)
+    return {
+        'ops': 1 / mean if mean else 0.0,
+        'mean_ms': mean * 1000,
+        'min_ms': durations[0] * 1000,
+        'p50_ms': statistics.median(durations) * 1000,
+        'p99_ms': percentile(durations, 0.99) * 1000,
+        'peak_kb': round(peak_kb, 1),
+    }
+
+
+def get_commit():
+    """Get the current git commit of the repository, None outside of a checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline.
+
+    Returns:
+        Tuple of (regressions, improvements, time ratio per path), regressions
+        and improvements as lists of (case, what, baseline value, new value)
+    """
+    regressions, improvements = [], []
+    ratios = {}
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base is None:
+            continue
+        path = case.split('/', 1)[0]
+        ratios.setdefault(path, []).append(result['p50_ms'] / base['p50_ms'] if base['p50_ms'] else 1.0)
+
+        change = result['p50_ms'] - base['p50_ms']
+        if abs(change) >= MIN_TIME_CHANGE_MS and abs(change) > threshold * base['p50_ms']:
+            entry = (case, 'p50_ms', base['p50_ms'], result['p50_ms'])
+            (regressions if change > 0 else improvements).append(entry)
+
+        change = result['peak_kb'] - base['peak_kb']
+        if change >= MIN_MEMORY_CHANGE_KB and change > threshold * base['peak_kb']:
+            regressions.append((case, 'peak_kb', base['peak_kb'], result['peak_kb']))
+
+    geomeans = {path: math.exp(statistics.fmean(math.log(ratio) for ratio in values if ratio > 0))
+                for path, values in ratios.items()}
+    return regressions, improvements, geomeans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=10, help='Timed operations per case, path and round')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='Rounds through all cases, so a slow phase of the machine does not skew single cases')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed operations before timing')
+    parser.add_argument('--paths', default=','.join(PATHS), help=f'Comma-separated paths, of {", ".join(PATHS)}')
+    parser.add_argument('--quick', action='store_true', help=f'Only label sizes {", ".join(QUICK_LABEL_SIZES)}')
+    parser.add_argument('--filter', default='', help='Only cases whose name contains this text, e.g. 62x29/rotated')
+    parser.add_argument('--warm-caches', action='store_true',
+                        help='Keep text measurements and code layers cached between renders')
+    parser.add_argument('--rasterizer', default='auto', choices=RASTERIZERS, help='Rasterizer to use')
+    parser.add_argument('--output', help='Save the results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare with results saved with --output')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative slowdown or memory growth reported as regression (default: 0.10)')
+    parser.add_argument('--verbose', action='store_true', help='Print the results of every case')
+    args = parser.parse_args()
+
+    paths = [path.strip() for path in args.paths.split(',') if path.strip()]
+    for path in paths:
+        if path not in PATHS:
+            parser.error(f'Unknown path: {path}')
+
+    # Only the bundled font, so the results do not depend on the installed fonts
+    brother_ql_web.FONTS = {'DejaVu Sans': {'Book': str(FONT_PATH)}}
+    brother_ql_web.CONFIG['PRINTER'] = dict(brother_ql_web.CONFIG['PRINTER'], RASTERIZER=args.rasterizer)
+    memory = PeakMemory()
+
+    sizes = QUICK_LABEL_SIZES if args.quick else label_sizes
+    cases = [(name, params) for name, params in iter_cases(sizes) if args.filter in name]
+    if not cases:
+        parser.error('No case matches the filter')
+
+    prepare = (lambda: None) if args.warm_caches else clear_caches
+    functions = {name: make_functions(params) for name, params in cases}
+    durations = {}
+    peaks = {}
+    start = time.perf_counter()
+    for round_number in range(args.rounds):
+        for index, (name, params) in enumerate(cases):
+            for path in paths:
+                function = functions[name][path]
+                warmup = args.warmup if round_number == 0 else 0
+                durations.setdefault((name, path), []).extend(
+                    time_function(function, prepare, args.iterations, warmup))
+                if round_number == 0:
+                    prepare()
+                    peaks[name, path] = memory.measure(function)
+            print(f'\rround {round_number + 1}/{args.rounds}: {index + 1}/{len(cases)} cases',
+                  end='', file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    results = {}
+    for name, params in cases:
+        for path in paths:
+            results[f'{path}/{name}'] = dict(summarize(durations[name, path], peaks[name, path]),
+                                             path=path, label_size=params['label_size'],
+                                             orientation=params['orientation'], qr='enable_qr' in params,
+                                             text=name.rsplit('/', 1)[1])
+
+    if args.verbose:
+        print(f'{"case":<40} {"ops/s":>9} {"p50":>9} {"p99":>9} {"peak":>9}')
+        for case, result in results.items():
+            print(f'{case:<40} {result["ops"]:9.1f} {result["p50_ms"]:7.2f}ms {result["p99_ms"]:7.2f}ms '
+                  f'{result["peak_kb"]:7.0f}kB')
+        print()
+
+    print(f'{"path":<10} {"cases":>6} {"ops/s (geomean)":>16} {"p50 (median)":>13} {"p99 (max)":>10} {"peak (max)":>11}')
+    for path in paths:
+        path_results = [result for result in results.values() if result['path'] == path]
+        geomean_ops = math.exp(statistics.fmean(math.log(result['ops']) for result in path_results))
+        median_p50 = statistics.median(result['p50_ms'] for result in path_results)
+        max_p99 = max(result['p99_ms'] for result in path_results)
+        max_peak = max(result['peak_kb'] for result in path_results)
+        print(f'{path:<10} {len(path_results):6} {geomean_ops:16.1f} {median_p50:11.2f}ms {max_p99:8.2f}ms '
+              f'{max_peak:9.0f}kB')
+    print(f'{len(results)} measurements in {elapsed:.0f}s, peak memory by {memory.method}')
+
+    if args.output:
+        data = {
+            'meta': {
+                'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'commit': get_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'pillow': PIL.__version__,
+                'rasterizer': 'numpy' if args.rasterizer == 'auto' and NUMPY_AVAILABLE else args.rasterizer,
+                'iterations': args.iterations,
+                'rounds': args.rounds,
+                'warmup': args.warmup,
+                'caches': 'warm' if args.warm_caches else 'cold',
+                'memory': memory.method,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        print(f'Results saved to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions, improvements, geomeans = compare(results, baseline['results'], args.threshold)
+        meta = baseline.get('meta', {})
+        print(f"\nCompared with {args.baseline} (commit {meta.get('commit')}, {meta.get('created')}):")
+        for path, ratio in geomeans.items():
+            print(f'{path:<10} {ratio:6.3f}x median time (geomean)')
+        for case, what, before, after in improvements:
+            print(f'  faster  {case:<40} {what} {before:.2f} -> {after:.2f}')
+        for case, what, before, after in regressions:
+            print(f'  SLOWER  {case:<40} {what} {before:.2f} -> {after:.2f}')
+        if regressions:
+            sys.exit(f'{len(regressions)} regressions beyond {args.threshold:.0%}')
+        print(f'No regressions beyond {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
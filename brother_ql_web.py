@@ -10,37 +10,124 @@ import logging
 import random
 import json
 import argparse
+import base64
+import hashlib
 import os
-from pathlib import Path
+import tempfile
+import threading
+from concurrent.futures import Future
 from io import BytesIO
 from typing import Dict, List, Tuple, Optional, Any, Union
-try:
-    import qrcode
-    import qrcode.constants
-    QR_AVAILABLE = True
-except ImportError:
-    qrcode = None  # type: ignore
-    QR_AVAILABLE = False
 
-from bottle import run, route, get, post, response, request, jinja2_view as view, static_file, redirect
-from PIL import Image, ImageDraw, ImageFont
+from bottle import run, route, get, post, delete, response, request, jinja2_view as view, static_file, redirect
+from PIL import Image, ImageDraw
 
 from brother_ql.devicedependent import models, label_type_specs, label_sizes
 from brother_ql.devicedependent import ENDLESS_LABEL, DIE_CUT_LABEL, ROUND_DIE_CUT_LABEL
-from brother_ql import BrotherQLRaster, create_label
+from brother_ql import BrotherQLRaster, BrotherQLUnsupportedCmd
 from brother_ql.backends import backend_factory, guess_backend
 
-from font_helpers import get_fonts
+from cache_helpers import LRUCache
+from mail_merge import MergeJob, guess_format, DEFAULT_CHUNK_SIZE
+from print_queue import PrintJob, DEFAULT_IDLE_TIMEOUT
+from printer_monitor import DEFAULT_STATUS_INTERVAL, DEFAULT_MAX_STATUS_INTERVAL, DEFAULT_MAX_WAITERS
+from printer_pool import PrinterPool
+from metrics import MetricsRegistry, MetricFamily, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from history_store import HistoryStore, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_AGE_DAYS
+from template_store import TemplateStore, TEMPLATE_SORT_ORDERS
+from barcodes import make_barcode_image, BARCODE_TYPES
+from qr_helpers import make_qr_image, parse_qr_version, QR_AVAILABLE, QR_ERROR_CORRECTIONS, QR_MATRIX_CACHE
+from rasterizer import rasterize_label_image, raster_to_image, threshold_value, RASTERIZERS
+from render_pool import RenderPool
+from text_layout import wrap_text, get_glyph_advances, clear_layout_cache, WRAP_MODES, ADVANCE_CACHE
+from server_helpers import get_server_adapter, describe_server, DEFAULT_SERVER, DEFAULT_THREADS, SERVER_CHOICES
+from font_helpers import (get_fonts, get_font_object, configure_font_cache, split_font_face_path,
+                          warm_font_cache, get_font_cache_stats, FontIndex, DEFAULT_FONT_CACHE_SIZE)
 
 logger = logging.getLogger(__name__)
 
 LABEL_SIZES = [(name, label_type_specs[name]['name']) for name in label_sizes]
 
-# Global variables
+# Default memory limit of the preview cache in megabytes
+DEFAULT_PREVIEW_CACHE_MB = 32
+
+# Default memory limit of the raster cache in megabytes
+DEFAULT_RASTER_CACHE_MB = 16
+
+# Default memory limit of the label layer cache in megabytes
+DEFAULT_LAYER_CACHE_MB = 16
+
+# Color modes of preview images: as rendered, reduced to 16 colors, or only the printed dots
+PREVIEW_COLORS = ('full', 'palette', 'mono')
+
+# Default PNG compression of previews, favouring speed over size
+DEFAULT_PREVIEW_COMPRESS_LEVEL = 1
+
+# Smallest font size tried when fitting text to the label
+MIN_FIT_FONT_SIZE = 8
+
+# Space between the text and the QR code or barcode in dots
+CODE_SPACING = 10
+
+# Global variables, set up by main() before the server starts. Request handlers
+# only read them; setup code replaces them as a whole instead of changing them
+# in place, so concurrent requests never see a half-built value.
 DEBUG = False
 FONTS: Dict[str, Dict[str, str]] = {}
-BACKEND_CLASS = None
+# brother_ql backend class of each printer by name
+BACKEND_CLASSES: Dict[str, Any] = {}
 CONFIG: Dict[str, Any] = {}
+SETUP_LOCK = threading.Lock()
+
+# Encoded preview images and the size of the rendered label, keyed by the hash
+# of the label context and the preview options
+PREVIEW_CACHE = LRUCache(max_entries=4096, max_bytes=DEFAULT_PREVIEW_CACHE_MB * 1024 * 1024,
+                         sizeof=lambda entry: len(entry[0]))
+
+# Raster instructions of recently previewed or printed labels, keyed by the hash
+# of the label context, the printer model and the cut setting
+RASTER_CACHE = LRUCache(max_entries=1024, max_bytes=DEFAULT_RASTER_CACHE_MB * 1024 * 1024)
+
+# Measured text boxes, keyed by font file, face index, font size and text
+TEXT_SIZE_CACHE = LRUCache(max_entries=4096)
+
+# Label layers that do not depend on the text: rendered QR codes and barcodes,
+# and blank label canvases with the code already pasted in place
+LAYER_CACHE = LRUCache(max_entries=256, max_bytes=DEFAULT_LAYER_CACHE_MB * 1024 * 1024,
+                       sizeof=lambda im: im.width * im.height * len(im.getbands()))
+
+# Timings exposed at /metrics, recorded from the first scrape on
+METRICS = MetricsRegistry()
+STAGE_SECONDS = METRICS.histogram('brother_ql_stage_seconds',
+                                  'Time spent in each stage of creating and printing labels', ('stage',))
+PREVIEW_SECONDS = METRICS.histogram('brother_ql_preview_seconds',
+                                    'Time to answer label preview requests', ('label_size',))
+
+# Renders labels inline, or in worker processes once set up by setup_render_pool()
+RENDER_POOL = RenderPool()
+
+# The printers with their print queues and status monitors, created by get_printer_pool()
+PRINTER_POOL: Optional[PrinterPool] = None
+PRINTER_POOL_LOCK = threading.Lock()
+
+# Name of the printer configured in the PRINTER section when PRINTERS is not set
+DEFAULT_PRINTER_NAME = 'default'
+
+# Longest time a status request may wait for a change, in seconds
+MAX_STATUS_WAIT = 60
+
+# Print history, opened by get_history() on first use
+DEFAULT_HISTORY_DB = 'history.sqlite3'
+HISTORY: Optional[HistoryStore] = None
+HISTORY_LOCK = threading.Lock()
+
+# Saved label templates
+TEMPLATES = TemplateStore('templates')
+
+# Mail-merge runs by id, the oldest finished ones are forgotten first
+MERGE_JOBS: Dict[str, MergeJob] = {}
+MERGE_JOBS_LOCK = threading.Lock()
+MAX_MERGE_JOBS = 100
 
 
 def load_config() -> Dict[str, Any]:
@@ -59,12 +146,14 @@ def load_config() -> Dict[str, Any]:
     return config
 
 
-def get_whitelisted_fonts(font_folder: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+def get_whitelisted_fonts(font_folder: Optional[str] = None,
+                          font_index: Optional[FontIndex] = None,
+                          workers: Optional[int] = None) -> Dict[str, Dict[str, str]]:
     """
     Get fonts filtered by whitelist configuration.
     If whitelist is empty, loads all fonts (backward compatibility).
     """
-    all_fonts = get_fonts(font_folder)
+    all_fonts = get_fonts(font_folder, font_index, workers)
 
     if not CONFIG.get('FONT_WHITELIST'):
         # No whitelist configured, return all fonts for backward compatibility
@@ -131,12 +220,35 @@ def labeldesigner():
     }
 
 
-def get_label_context(request) -> Dict[str, Any]:
-    """Extract and validate label context from request parameters."""
+def get_label_params(request) -> Any:
+    """Get the label parameters of a request."""
     try:
-        d = request.params.decode()  # UTF-8 decoded form data
+        return request.params.decode()  # UTF-8 decoded form data
     except Exception:
-        d = request.forms
+        return request.forms
+
+
+def get_label_context(request) -> Dict[str, Any]:
+    """Extract and validate label context from request parameters."""
+    return build_label_context(get_label_params(request))
+
+
+@METRICS.timed(STAGE_SECONDS, 'parse')
+def build_label_context(d: Any) -> Dict[str, Any]:
+    """
+    Build and validate the label context from label parameters.
+
+    Args:
+        d: Mapping of parameter names to values, e.g. request form data
+           or a label from a JSON request body or template
+
+    Returns:
+        Label context suitable for create_label_im()
+    """
+    # Templates store the text as a list of lines
+    text = d.get('text', None)
+    if isinstance(text, list):
+        text = '\n'.join(str(line) for line in text)
 
     # Parse font family and style
     font_family_full = d.get('font_family', 'Arial (Regular)')
@@ -148,7 +260,7 @@ def get_label_context(request) -> Dict[str, Any]:
         font_style = 'Regular'
 
     context = {
-        'text': d.get('text', None),
+        'text': text,
         'font_size': int(d.get('font_size', 100)),
         'font_family': font_family,
         'font_style': font_style,
@@ -162,20 +274,37 @@ def get_label_context(request) -> Dict[str, Any]:
         'margin_bottom': float(d.get('margin_bottom', 45)) / 100.0,
         'margin_left': float(d.get('margin_left', 35)) / 100.0,
         'margin_right': float(d.get('margin_right', 35)) / 100.0,
-        'enable_qr': d.get('enable_qr', 'false').lower() == 'true',
+        'fit_to_label': str(d.get('fit_to_label', 'false')).lower() == 'true',
+        'wrap': d.get('wrap', 'none'),
+        'enable_qr': str(d.get('enable_qr', 'false')).lower() == 'true',
         'qr_data': d.get('qr_data', ''),
         'qr_size': d.get('qr_size', 'medium'),
         'qr_position': d.get('qr_position', 'right'),
+        'qr_error_correction': d.get('qr_error_correction', 'L'),
+        'qr_version': parse_qr_version(d.get('qr_version')),
+        'enable_barcode': str(d.get('enable_barcode', 'false')).lower() == 'true',
+        'barcode_data': str(d.get('barcode_data', '')),
+        'barcode_type': d.get('barcode_type', 'code128'),
+        'barcode_size': d.get('barcode_size', 'medium'),
+        'barcode_position': d.get('barcode_position', 'right'),
     }
 
-    # Convert relative margins to absolute pixels
-    context['margin_top'] = int(context['font_size'] * context['margin_top'])
-    context['margin_bottom'] = int(context['font_size'] * context['margin_bottom'])
-    context['margin_left'] = int(context['font_size'] * context['margin_left'])
-    context['margin_right'] = int(context['font_size'] * context['margin_right'])
+    if context['wrap'] not in WRAP_MODES:
+        raise ValueError(f"Unknown wrap mode: {context['wrap']}")
+    if context['qr_error_correction'] not in QR_ERROR_CORRECTIONS:
+        raise ValueError(f"Unknown QR error correction: {context['qr_error_correction']}")
+    if context['barcode_type'] not in BARCODE_TYPES:
+        raise ValueError(f"Unknown barcode type: {context['barcode_type']}")
+    if context['enable_qr'] and context['enable_barcode']:
+        raise ValueError("A label can have a QR code or a barcode, not both")
+
+    # Convert relative margins to absolute pixels, keeping the ratios for fit_to_label
+    context['margin_ratios'] = [context['margin_top'], context['margin_bottom'],
+                                context['margin_left'], context['margin_right']]
+    context.update(get_margins(context['font_size'], context['margin_ratios']))
 
     # Set fill color based on label type
-    context['fill_color'] = (255, 0, 0) if 'red' in context['label_size'] else (0, 0, 0)
+    context['fill_color'] = (255, 0, 0) if is_red_label(context['label_size']) else (0, 0, 0)
 
     def get_font_path(font_family_name: Optional[str], font_style_name: Optional[str]) -> str:
         """Get font path, falling back to default if not found."""
@@ -190,7 +319,10 @@ def get_label_context(request) -> Dict[str, Any]:
             raise LookupError("Couldn't find the font & style")
         return font_path
 
-    context['font_path'] = get_font_path(context['font_family'], context['font_style'])
+    # Fonts inside a collection carry their face index in the path
+    context['font_path'], context['font_index'] = split_font_face_path(
+        get_font_path(context['font_family'], context['font_style'])
+    )
 
     def get_label_dimensions(label_size: str) -> Tuple[int, int]:
         """Get label dimensions from label size."""
@@ -210,74 +342,250 @@ def get_label_context(request) -> Dict[str, Any]:
     return context
 
 
+def get_margins(font_size: int, margin_ratios: List[float]) -> Dict[str, int]:
+    """Get the margins in pixels from the (top, bottom, left, right) ratios of the font size."""
+    top, bottom, left, right = margin_ratios
+    return {
+        'margin_top': int(font_size * top),
+        'margin_bottom': int(font_size * bottom),
+        'margin_left': int(font_size * left),
+        'margin_right': int(font_size * right),
+    }
+
+
+def is_red_label(label_size: str) -> bool:
+    """Whether a label size is a black/red tape."""
+    return 'red' in label_size
+
+
+def get_label_image_mode(label_size: str) -> str:
+    """
+    Get the image mode labels of a size are drawn in.
+
+    Black-only tapes are drawn in grayscale, which brother_ql thresholds as is.
+    Only black/red tapes need an RGB image, which brother_ql splits into a
+    black and a red plane.
+    """
+    return 'RGB' if is_red_label(label_size) else 'L'
+
+
+@METRICS.timed(STAGE_SECONDS, 'render')
 def create_label_im(text: str, **kwargs) -> Image.Image:
-    """Create label image from text and parameters."""
-    label_type = kwargs['kind']
-    im_font = ImageFont.truetype(kwargs['font_path'], kwargs['font_size'])
-    im = Image.new('L', (20, 20), 'white')
-    draw = ImageDraw.Draw(im)
+    """
+    Create label image from text and parameters.
 
-    # Generate QR code if enabled
-    qr_img: Any = None
-    qr_size_px = 0
-    if kwargs.get('enable_qr', False) and kwargs.get('qr_data', '').strip() and QR_AVAILABLE and qrcode:
-        qr_size_map = {'small': 4, 'medium': 6, 'large': 8}
-        box_size = qr_size_map.get(kwargs.get('qr_size', 'medium'), 6)
+    The image is grayscale, or RGB for black/red label sizes. Passing
+    image_mode overrides this, e.g. to compare both render paths. With
+    fit_to_label, font_size is replaced by the largest size that fits; with
+    a wrap mode, lines are broken to fit the printable width.
+    """
+    label_type = kwargs['kind']
+    image_mode = kwargs.get('image_mode') or get_label_image_mode(kwargs['label_size'])
+    fill_color = kwargs['fill_color']
+    if image_mode == 'L':
+        fill_color = fill_color[0]
 
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=box_size,
-            border=2,
-        )
-        qr.add_data(kwargs['qr_data'])
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        qr_size_px = getattr(qr_img, 'size', [0])[0]
-    elif kwargs.get('enable_qr', False) and not QR_AVAILABLE:
-        logger.warning("QR code generation requested but qrcode package not available")
+    # The QR code or barcode drawn next to the text
+    code_key, code_img, code_position = get_code_layer(kwargs, image_mode)
+    code_size = code_img.size if code_img else (0, 0)
 
-    # Workaround for multiline_textsize() bug with empty lines
-    lines = [line if line else ' ' for line in text.split('\n')]
-    text = '\n'.join(lines)
+    if kwargs.get('fit_to_label'):
+        font_size = fit_font_size(text, code_size, kwargs)
+        kwargs = dict(kwargs, font_size=font_size, **get_margins(font_size, kwargs['margin_ratios']))
+    text = layout_text(text, code_size, kwargs)
 
-    # Handle PIL version compatibility for text size calculation
-    textsize = get_text_size(draw, text, im_font)
+    im_font = get_font_object(kwargs['font_path'], kwargs['font_size'], kwargs.get('font_index', 0))
+    textsize = measure_text(text, kwargs['font_path'], kwargs['font_size'], kwargs.get('font_index', 0))
 
-    # Adjust dimensions for QR code
-    qr_spacing = 10 if qr_img else 0
+    # Adjust dimensions for the QR code or barcode
+    code_spacing = CODE_SPACING if code_img else 0
     effective_text_width = textsize[0]
-    if qr_img:
-        effective_text_width = textsize[0] + qr_size_px + qr_spacing
+    if code_img:
+        effective_text_width = textsize[0] + code_size[0] + code_spacing
 
     width, height = kwargs['width'], kwargs['height']
 
     # Adjust height for endless labels
     if kwargs['orientation'] == 'standard' and label_type == ENDLESS_LABEL:
-        height = max(textsize[1], qr_size_px if qr_img else 0) + kwargs['margin_top'] + kwargs['margin_bottom']
+        height = max(textsize[1], code_size[1]) + kwargs['margin_top'] + kwargs['margin_bottom']
     elif kwargs['orientation'] == 'rotated' and label_type == ENDLESS_LABEL:
         width = effective_text_width + kwargs['margin_left'] + kwargs['margin_right']
 
-    im = Image.new('RGB', (width, height), 'white')
-    draw = ImageDraw.Draw(im)
-
-    # Calculate text and QR code positions
-    text_pos, qr_pos = calculate_positions(
-        width, height, textsize, qr_size_px, kwargs, label_type
+    # Calculate text and code positions
+    text_pos, code_pos = calculate_positions(
+        width, height, textsize, code_size, kwargs, label_type, code_position
     )
 
+    # Labels of a template or batch share the canvas with the code in place,
+    # so only the text is drawn per label
+    if code_img and code_pos:
+        def create_canvas() -> Image.Image:
+            canvas = Image.new(image_mode, (width, height), 'white')
+            canvas.paste(code_img, code_pos)
+            return canvas
+        im = LAYER_CACHE.get_or_create(('canvas', code_key, width, height, code_pos), create_canvas).copy()
+    else:
+        im = Image.new(image_mode, (width, height), 'white')
+
     # Draw text
-    draw.multiline_text(text_pos, text, kwargs['fill_color'], font=im_font, align=kwargs['align'])
+    draw = ImageDraw.Draw(im)
+    draw.multiline_text(text_pos, text, fill_color, font=im_font, align=kwargs['align'])
 
-    # Draw QR code if available
-    if qr_img and qr_pos:
-        if hasattr(qr_img, 'mode') and qr_img.mode != 'RGB':
-            qr_img = qr_img.convert('RGB')
-        im.paste(qr_img, qr_pos)  # type: ignore
+    # The code covers any text drawn into it, as if it was pasted after the text
+    if code_img and code_pos and text_may_overlap(text_pos, textsize, kwargs['font_size'], code_pos, code_size):
+        im.paste(code_img, code_pos)
 
     return im
 
 
+def get_code_layer(kwargs: Dict[str, Any], image_mode: str) -> Tuple[Any, Optional[Image.Image], str]:
+    """
+    Get the QR code or barcode of a label, rendering it only on a cache miss.
+
+    The returned image is shared with other labels and must not be modified.
+
+    Returns:
+        Tuple of (cache key, image, position relative to the text), or
+        (None, None, 'right') for a label without a code
+    """
+    if kwargs.get('enable_qr', False) and kwargs.get('qr_data', '').strip() and QR_AVAILABLE:
+        qr_size_map = {'small': 4, 'medium': 6, 'large': 8}
+        box_size = qr_size_map.get(kwargs.get('qr_size', 'medium'), 6)
+        error_correction = kwargs.get('qr_error_correction', 'L')
+        version = kwargs.get('qr_version')
+
+        key = ('qr', kwargs['qr_data'], box_size, error_correction, version, image_mode)
+        code_img = LAYER_CACHE.get_or_create(key, lambda: make_qr_image(
+            kwargs['qr_data'], box_size, border=2, error_correction=error_correction,
+            version=version, mode=image_mode))
+        return key, code_img, kwargs.get('qr_position', 'right')
+
+    if kwargs.get('enable_qr', False) and not QR_AVAILABLE:
+        logger.warning("QR code generation requested but qrcode package not available")
+    elif kwargs.get('enable_barcode', False) and kwargs.get('barcode_data', '').strip():
+        # Bars only scan reliably when they are whole dots wide, so the module
+        # width shrinks by whole dots until the barcode fits the label
+        margins = kwargs
+        if kwargs.get('fit_to_label'):
+            # The margins scale with the font size, which is only fitted once the
+            # barcode size is known, so the barcode may use the smallest margins
+            margins = get_margins(MIN_FIT_FONT_SIZE, kwargs['margin_ratios'])
+        max_width = max_height = 0
+        if not (kwargs['kind'] == ENDLESS_LABEL and kwargs['orientation'] == 'rotated'):
+            max_width = max(1, kwargs['width'] - margins['margin_left'] - margins['margin_right'])
+        if not (kwargs['kind'] == ENDLESS_LABEL and kwargs['orientation'] == 'standard'):
+            # The barcode is centered vertically, ignoring the margins
+            max_height = kwargs['height']
+        data = kwargs['barcode_data'].strip()
+        barcode_type = kwargs.get('barcode_type', 'code128')
+        size = kwargs.get('barcode_size', 'medium')
+
+        key = ('barcode', data, barcode_type, size, max_width, max_height, image_mode)
+        code_img = LAYER_CACHE.get_or_create(key, lambda: make_barcode_image(
+            data, barcode_type, size, max_width, max_height, mode=image_mode))
+        return key, code_img, kwargs.get('barcode_position', 'right')
+
+    return None, None, 'right'
+
+
+def text_may_overlap(text_pos: Tuple[int, int], textsize: Tuple[int, int], font_size: int,
+                     code_pos: Tuple[int, int], code_size: Tuple[int, int]) -> bool:
+    """
+    Whether drawn text may reach into the code.
+
+    Glyphs can extend beyond the measured text box by their bearings and the
+    line's offset from the drawing position, so the box is padded by the
+    font size on all sides.
+    """
+    pad = font_size
+    return (text_pos[0] - pad < code_pos[0] + code_size[0] and code_pos[0] < text_pos[0] + textsize[0] + pad
+            and text_pos[1] - pad < code_pos[1] + code_size[1] and code_pos[1] < text_pos[1] + textsize[1] + pad)
+
+
+def measure_text(text: str, font_path: str, font_size: int, font_index: int = 0) -> Tuple[int, int]:
+    """Get the size of text in a font, measuring it only on a cache miss."""
+    def measure() -> Tuple[int, int]:
+        font = get_font_object(font_path, font_size, font_index)
+        draw = ImageDraw.Draw(Image.new('L', (20, 20), 'white'))
+        return get_text_size(draw, text, font)
+
+    return TEXT_SIZE_CACHE.get_or_create((font_path, int(font_index), int(font_size), text), measure)
+
+
+def get_text_width_limit(code_size: Tuple[int, int], kwargs: Dict[str, Any]) -> Optional[int]:
+    """
+    Get the width available to the text, or None if the label grows with the text.
+
+    The available width is the label width minus the margins at
+    kwargs['font_size'] and the QR code or barcode of size code_size.
+    """
+    if kwargs['kind'] == ENDLESS_LABEL and kwargs['orientation'] == 'rotated':
+        return None
+    code_width = code_size[0] + CODE_SPACING if code_size[0] else 0
+    return kwargs['width'] - kwargs['margin_left'] - kwargs['margin_right'] - code_width
+
+
+def layout_text(text: str, code_size: Tuple[int, int], kwargs: Dict[str, Any], break_words: bool = True) -> str:
+    """Wrap the text as requested by kwargs['wrap'] and prepare it for measuring and drawing."""
+    if kwargs.get('wrap', 'none') != 'none':
+        max_width = get_text_width_limit(code_size, kwargs)
+        if max_width is not None:
+            advances = get_glyph_advances(kwargs['font_path'], kwargs['font_size'], kwargs.get('font_index', 0))
+            text = wrap_text(text, advances, max(max_width, 1), kwargs['wrap'], break_words)
+
+    # Workaround for multiline_textsize() bug with empty lines
+    return '\n'.join(line if line else ' ' for line in text.split('\n'))
+
+
+def fit_font_size(text: str, code_size: Tuple[int, int], kwargs: Dict[str, Any]) -> int:
+    """
+    Find the largest font size at which the text fits the printable area of the label.
+
+    The text box, the margins (which scale with the font size) and the QR
+    code or barcode must fit the label width, and, unless the label is endless in that
+    direction, its height. With a wrap mode, the text is wrapped at every
+    size tried, and sizes at which a word is wider than the label do not fit.
+    Text measurements are cached, so repeating the binary search for the
+    same text costs a few cache lookups.
+
+    Args:
+        text: Text of the label
+        code_size: Size of the QR code or barcode in pixels, (0, 0) without one
+        kwargs: Label context
+
+    Returns:
+        The fitted font size, at least MIN_FIT_FONT_SIZE
+
+    Raises:
+        ValueError: If the text does not fit even at MIN_FIT_FONT_SIZE
+    """
+    width, height = kwargs['width'], kwargs['height']
+    limit_height = not (kwargs['kind'] == ENDLESS_LABEL and kwargs['orientation'] == 'standard')
+
+    def fits(font_size: int) -> bool:
+        sized = dict(kwargs, font_size=font_size, **get_margins(font_size, kwargs['margin_ratios']))
+        sized_text = layout_text(text, code_size, sized, break_words=False)
+        text_width, text_height = measure_text(sized_text, kwargs['font_path'], font_size, kwargs.get('font_index', 0))
+        max_width = get_text_width_limit(code_size, sized)
+        if max_width is not None and text_width > max_width:
+            return False
+        if limit_height and max(text_height, code_size[1]) + sized['margin_top'] + sized['margin_bottom'] > height:
+            return False
+        return True
+
+    # Text never fits at a font size larger than the label
+    low, high = MIN_FIT_FONT_SIZE, max(width, height, MIN_FIT_FONT_SIZE)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle - 1
+    if low == MIN_FIT_FONT_SIZE and not fits(low):
+        raise ValueError(f'The text does not fit the label even at the minimum font size of {MIN_FIT_FONT_SIZE}')
+    return low
+
+
 def get_text_size(draw: Any, text: str, font: Any) -> Tuple[int, int]:
     """Get text size with PIL version compatibility."""
     try:
@@ -321,11 +629,18 @@ def estimate_text_size(draw: Any, text: str, font: Any) -> Tuple[int, int]:
 
 
 def calculate_positions(width: int, height: int, textsize: Tuple[int, int],
-                       qr_size_px: int, kwargs: Dict[str, Any],
-                       label_type) -> Tuple[Tuple[int, int], Optional[Tuple[int, int]]]:
-    """Calculate text and QR code positions."""
-    qr_spacing = 10 if qr_size_px > 0 else 0
-    qr_pos = None
+                       code_size: Tuple[int, int], kwargs: Dict[str, Any],
+                       label_type, code_position: str = 'right') -> Tuple[Tuple[int, int], Optional[Tuple[int, int]]]:
+    """
+    Calculate text and code positions.
+
+    The code is the QR code or barcode of size code_size, (0, 0) without one.
+    In standard orientation, code_position places it 'left' or 'right' of the
+    text or 'center' them together; rotated labels put it after the text.
+    """
+    code_width, code_height = code_size
+    code_spacing = CODE_SPACING if code_width > 0 else 0
+    code_pos = None
 
     horizontal_offset = 0
     vertical_offset = 0
@@ -338,23 +653,22 @@ def calculate_positions(width: int, height: int, textsize: Tuple[int, int],
         else:
             vertical_offset = kwargs['margin_top']
 
-        # Horizontal positioning with QR code
-        if qr_size_px > 0:
-            qr_position = kwargs.get('qr_position', 'right')
-            if qr_position == 'left':
-                horizontal_offset = kwargs['margin_left'] + qr_size_px + qr_spacing
-                qr_x = kwargs['margin_left']
-            elif qr_position == 'right':
+        # Horizontal positioning with QR code or barcode
+        if code_width > 0:
+            if code_position == 'left':
+                horizontal_offset = kwargs['margin_left'] + code_width + code_spacing
+                code_x = kwargs['margin_left']
+            elif code_position == 'right':
                 horizontal_offset = kwargs['margin_left']
-                qr_x = width - qr_size_px - kwargs['margin_right']
+                code_x = width - code_width - kwargs['margin_right']
             else:  # center
-                total_content_width = textsize[0] + qr_size_px + qr_spacing
+                total_content_width = textsize[0] + code_width + code_spacing
                 start_x = (width - total_content_width) // 2
                 horizontal_offset = start_x
-                qr_x = start_x + textsize[0] + qr_spacing
+                code_x = start_x + textsize[0] + code_spacing
 
-            qr_y = (height - qr_size_px) // 2
-            qr_pos = (int(qr_x), int(qr_y))
+            code_y = (height - code_height) // 2
+            code_pos = (int(code_x), int(code_y))
         else:
             horizontal_offset = max((width - textsize[0]) // 2, 0)
 
@@ -363,59 +677,436 @@ def calculate_positions(width: int, height: int, textsize: Tuple[int, int],
         vertical_offset += (kwargs['margin_top'] - kwargs['margin_bottom']) // 2
 
         if label_type in (DIE_CUT_LABEL, ROUND_DIE_CUT_LABEL):
-            effective_width = textsize[0] + (qr_size_px + qr_spacing if qr_size_px > 0 else 0)
+            effective_width = textsize[0] + (code_width + code_spacing if code_width > 0 else 0)
             horizontal_offset = max((width - effective_width) // 2, 0)
         else:
             horizontal_offset = kwargs['margin_left']
 
-        # Position QR code for rotated orientation
-        if qr_size_px > 0:
-            qr_x = horizontal_offset + textsize[0] + qr_spacing
-            qr_y = (height - qr_size_px) // 2
-            qr_pos = (int(qr_x), int(qr_y))
+        # Position QR code or barcode for rotated orientation
+        if code_width > 0:
+            code_x = horizontal_offset + textsize[0] + code_spacing
+            code_y = (height - code_height) // 2
+            code_pos = (int(code_x), int(code_y))
+
+    return (int(horizontal_offset), int(vertical_offset)), code_pos
+
+
+def get_context_hash(context: Dict[str, Any]) -> str:
+    """
+    Get a canonical hash of a label context.
+
+    The identity (size and modification time) of the font file is included,
+    so a changed font file does not match images rendered with the old one.
+    """
+    try:
+        stat = os.stat(context['font_path'])
+        font_identity = [stat.st_size, stat.st_mtime_ns]
+    except (KeyError, OSError):
+        font_identity = None
+
+    canonical = json.dumps([context, font_identity], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def etag_matches(etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches the given ETag."""
+    if_none_match = request.headers.get('If-None-Match', '')
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def get_preview_options(request) -> Dict[str, Any]:
+    """
+    Get the preview encoding options of a request.
 
-    return (int(horizontal_offset), int(vertical_offset)), qr_pos
+    Options:
+        colors: 'full' (default), 'palette' or 'mono'
+        compress_level: PNG compression from 0 (fastest) to 9 (smallest)
+        scale: Factor between 0 and 1 to shrink the preview by
+        max_width: Maximum width of the preview in pixels
+    """
+    params = request.params
+    options: Dict[str, Any] = {
+        'colors': params.get('colors', 'full'),
+        'compress_level': int(params.get('compress_level', CONFIG['SERVER'].get(
+            'PREVIEW_COMPRESS_LEVEL', DEFAULT_PREVIEW_COMPRESS_LEVEL))),
+        'scale': float(params.get('scale', 1)),
+        'max_width': int(params.get('max_width', 0)) or None,
+    }
+
+    if options['colors'] not in PREVIEW_COLORS:
+        raise ValueError(f"Invalid preview colors: {options['colors']}")
+    if not 0 <= options['compress_level'] <= 9:
+        raise ValueError('compress_level must be between 0 and 9')
+    if not 0 < options['scale'] <= 1:
+        raise ValueError('scale must be between 0 and 1')
+    if options['max_width'] is not None and options['max_width'] < 1:
+        raise ValueError('max_width must be positive')
+    return options
+
+
+@METRICS.timed(STAGE_SECONDS, 'encode')
+def encode_preview(im: Image.Image, context: Dict[str, Any], options: Dict[str, Any]) -> bytes:
+    """Shrink and color-reduce a rendered label as requested and encode it as PNG."""
+    width = im.size[0] * options['scale']
+    if options['max_width']:
+        width = min(width, options['max_width'])
+    width = max(1, int(round(width)))
+    if width < im.size[0]:
+        if im.mode in ('1', 'P'):
+            # Bitmaps can only be shrunk by dropping pixels, shades keep thin lines visible
+            im = im.convert('L' if im.mode == '1' else 'RGB')
+        height = max(1, int(round(im.size[1] * width / im.size[0])))
+        im = im.resize((width, height), Image.BOX)
+
+    if options['colors'] == 'palette':
+        if im.mode == 'L':
+            # 16 gray levels; mapping them with a lookup table is much faster than quantize()
+            levels = im.point([(value * 15 + 127) // 255 for value in range(256)])
+            im = Image.frombytes('P', im.size, levels.tobytes())
+            im.putpalette([level * 17 for level in range(16) for _ in range(3)])
+        else:
+            im = im.quantize(16, method=Image.Quantize.FASTOCTREE)
+    elif options['colors'] == 'mono':
+        if im.mode == 'L':
+            # The dots brother_ql prints at the label's threshold
+            dark_limit = 255 - threshold_value(context['threshold'])
+            im = im.point(lambda value: 0 if value <= dark_limit else 255, '1')
+        else:
+            palette = Image.new('P', (1, 1))
+            palette.putpalette([255, 255, 255, 0, 0, 0, 255, 0, 0])
+            im = im.quantize(palette=palette, dither=Image.Dither.NONE)
+
+    return image_to_png_bytes(im, options['compress_level'])
 
 
 @get('/api/preview/text')
 @post('/api/preview/text')
 def get_preview_image():
     """Get preview image of the label."""
+    start = METRICS.start_timer()
+    try:
+        options = get_preview_options(request)
+    except ValueError as e:
+        response.status = 400
+        return {'error': str(e)}
+
     try:
         context = get_label_context(request)
-        im = create_label_im(**context)
         return_format = getattr(request.query, 'get', lambda x, y: y)('return_format', 'png')
 
+        # Identical contexts and options encode identical images, so they share a cache entry
+        context_hash = get_context_hash(context)
+        options_key = '-'.join(str(options[key]) for key in sorted(options))
+        cache_key = f'{context_hash}-{options_key}'
+        etag = f'"{cache_key}-{return_format}"'
+        response.set_header('ETag', etag)
+        response.set_header('Cache-Control', 'no-cache')
+        if etag_matches(etag):
+            response.status = 304
+            METRICS.observe_since(PREVIEW_SECONDS, start, context['label_size'])
+            return b''
+
+        entry = PREVIEW_CACHE.get(cache_key)
+        if entry is None:
+            entry = RENDER_POOL.run(render_label_png, context, options)
+            PREVIEW_CACHE.put(cache_key, entry)
+        png_bytes, label_size_px = entry
+        METRICS.observe_since(PREVIEW_SECONDS, start, context['label_size'])
+
+        # Size of the label at print resolution, also when the preview is shrunk
+        response.set_header('X-Label-Size', f'{label_size_px[0]}x{label_size_px[1]}')
+
         if return_format == 'base64':
-            import base64
             response.set_header('Content-type', 'text/plain')
-            return base64.b64encode(image_to_png_bytes(im))
+            return base64.b64encode(png_bytes)
         else:
             response.set_header('Content-type', 'image/png')
-            return image_to_png_bytes(im)
+            return png_bytes
+    except (LookupError, ValueError) as e:
+        # Invalid label parameters, or data the QR code or barcode cannot hold
+        response.status = 400
+        return {'error': str(e)}
     except Exception as e:
         logger.error(f"Preview generation failed: {e}")
         response.status = 500
         return {'error': str(e)}
 
 
-def image_to_png_bytes(im: Image.Image) -> bytes:
+@get('/api/preview/raster')
+@post('/api/preview/raster')
+def get_raster_preview():
+    """
+    Get the label as the printer will print it: thresholded, black/red separated,
+    across the full print head width.
+
+    Accepts the preview options except colors. The raster data is cached, so
+    printing the label right afterwards does not render it again.
+    """
+    try:
+        options = get_preview_options(request)
+    except ValueError as e:
+        response.status = 400
+        return {'error': str(e)}
+    options['colors'] = 'full'
+
+    try:
+        context = get_label_context(request)
+        return_format = getattr(request.query, 'get', lambda x, y: y)('return_format', 'png')
+
+        model = get_printer_pool().model_for(context['label_size'])
+        options_key = '-'.join(str(options[key]) for key in sorted(options))
+        cache_key = f'raster-{get_context_hash(context)}-{model}-{options_key}'
+        etag = f'"{cache_key}-{return_format}"'
+        response.set_header('ETag', etag)
+        response.set_header('Cache-Control', 'no-cache')
+        if etag_matches(etag):
+            response.status = 304
+            return b''
+
+        entry = PREVIEW_CACHE.get(cache_key)
+        if entry is None:
+            im = raster_to_image(get_label_raster(context, model=model))
+            # Show the label the way it was designed, not in feed direction
+            rotation = get_label_rotation(context)
+            if rotation == 'auto':
+                rotation = 90 if (context['width'] < context['height']) != (im.size[0] < im.size[1]) else 0
+            if rotation:
+                im = im.rotate(-rotation, expand=True)
+            entry = (encode_preview(im, context, options), im.size)
+            PREVIEW_CACHE.put(cache_key, entry)
+        png_bytes, label_size_px = entry
+
+        response.set_header('X-Label-Size', f'{label_size_px[0]}x{label_size_px[1]}')
+        if return_format == 'base64':
+            response.set_header('Content-type', 'text/plain')
+            return base64.b64encode(png_bytes)
+        else:
+            response.set_header('Content-type', 'image/png')
+            return png_bytes
+    except (LookupError, ValueError, BrotherQLUnsupportedCmd) as e:
+        # Also red labels for a printer model without two-color support
+        response.status = 400
+        return {'error': str(e)}
+    except Exception as e:
+        logger.error(f"Raster preview generation failed: {e}")
+        response.status = 500
+        return {'error': str(e)}
+
+
+def image_to_png_bytes(im: Image.Image, compress_level: Optional[int] = None) -> bytes:
     """Convert PIL image to PNG bytes."""
     image_buffer = BytesIO()
-    im.save(image_buffer, format="PNG")
-    image_buffer.seek(0)
-    return image_buffer.read()
+    if compress_level is None:
+        im.save(image_buffer, format="PNG")
+    else:
+        im.save(image_buffer, format="PNG", compress_level=compress_level)
+    return image_buffer.getvalue()
+
+
+def get_label_rotation(context: Dict[str, Any]) -> Union[int, str]:
+    """Get the rotation to apply when rasterizing the label image."""
+    if context['kind'] == ENDLESS_LABEL:
+        return 0 if context['orientation'] == 'standard' else 90
+    elif context['kind'] in (ROUND_DIE_CUT_LABEL, DIE_CUT_LABEL):
+        return 'auto'
+    return 0
+
+
+@METRICS.timed(STAGE_SECONDS, 'rasterize')
+def rasterize_label(qlr: BrotherQLRaster, im: Image.Image, context: Dict[str, Any], cut: bool = True) -> None:
+    """Append the raster instructions for a label image to qlr."""
+    red = is_red_label(context['label_size'])
+    rasterize_label_image(qlr, im, context['label_size'], CONFIG['PRINTER'].get('RASTERIZER', 'auto'),
+                          red=red, threshold=context['threshold'], cut=cut,
+                          rotate=get_label_rotation(context))
+
+
+def render_label_png(context: Dict[str, Any], options: Dict[str, Any]) -> Tuple[bytes, Tuple[int, int]]:
+    """
+    Render a label and encode it as a preview PNG. Runs in the render pool.
+
+    Returns:
+        Tuple of (PNG bytes, size of the rendered label in pixels)
+    """
+    im = create_label_im(**context)
+    return encode_preview(im, context, options), im.size
+
+
+def render_label_raster(context: Dict[str, Any], model: str, cut: bool = True) -> bytes:
+    """
+    Render a label and create its raster instructions. Runs in the render pool.
+
+    The raster data of several labels can be concatenated into one print job,
+    as every label starts by initializing the printer.
+    """
+    im = create_label_im(**context)
+    qlr = BrotherQLRaster(model)
+    rasterize_label(qlr, im, context, cut=cut)
+    return qlr.data
+
+
+def submit_label_raster(context: Dict[str, Any], cut: bool = True, model: Optional[str] = None) -> 'Future[bytes]':
+    """
+    Get the raster data of a label from the raster cache, or render it in the render pool.
+
+    Args:
+        model: Printer model to create the raster data for, by default the
+               model of the printer the label size would be printed on
+
+    Returns:
+        A future of the raster data, already completed on a cache hit
+    """
+    if model is None:
+        model = get_printer_pool().model_for(context['label_size'])
+    cache_key = f'{get_context_hash(context)}-{model}-{cut}'
+    data = RASTER_CACHE.get(cache_key)
+    if data is not None:
+        future: 'Future[bytes]' = Future()
+        future.set_result(data)
+        return future
+
+    future = RENDER_POOL.submit(render_label_raster, context, model, cut)
+
+    def store(done: 'Future[bytes]') -> None:
+        if not done.cancelled() and done.exception() is None:
+            RASTER_CACHE.put(cache_key, done.result())
+
+    future.add_done_callback(store)
+    return future
+
+
+def get_label_raster(context: Dict[str, Any], cut: bool = True, model: Optional[str] = None) -> bytes:
+    """Get the raster data of a label, rendering it only if it is not cached."""
+    return submit_label_raster(context, cut, model).result()
+
+
+def get_printer_configs() -> List[Dict[str, Any]]:
+    """
+    Get the configured printers.
+
+    Without a PRINTERS list, the printer of the PRINTER section is the only
+    one and prints any label size.
+
+    Returns:
+        Dicts with NAME, MODEL, PRINTER and LABEL_SIZES (None for any size)
+    """
+    printers = CONFIG.get('PRINTERS')
+    if not printers:
+        return [{
+            'NAME': DEFAULT_PRINTER_NAME,
+            'MODEL': CONFIG['PRINTER']['MODEL'],
+            'PRINTER': CONFIG['PRINTER']['PRINTER'],
+            'LABEL_SIZES': None,
+        }]
+
+    configs = []
+    for index, printer in enumerate(printers):
+        # LABEL_SIZE is the size of the loaded roll, or a list of sizes
+        label_sizes = printer.get('LABEL_SIZE')
+        if isinstance(label_sizes, str):
+            label_sizes = [label_sizes]
+        configs.append({
+            'NAME': str(printer.get('NAME') or f'printer{index + 1}'),
+            'MODEL': printer.get('MODEL', CONFIG['PRINTER']['MODEL']),
+            'PRINTER': printer.get('PRINTER'),
+            'LABEL_SIZES': label_sizes or None,
+        })
+    return configs
+
+
+def get_printer_pool() -> PrinterPool:
+    """Get the printer pool, starting the print queues and status monitors on first use."""
+    global PRINTER_POOL
+
+    with PRINTER_POOL_LOCK:
+        if PRINTER_POOL is None:
+            pool = PrinterPool(on_finished=job_finished,
+                               max_waiters=CONFIG['SERVER'].get('STATUS_MAX_WAITERS', DEFAULT_MAX_WAITERS))
+            for printer in get_printer_configs():
+                # In debug mode, jobs are processed without sending them to the printer
+                pool.add(printer['NAME'], printer['MODEL'], printer['PRINTER'], BACKEND_CLASSES.get(printer['NAME']),
+                         label_sizes=printer['LABEL_SIZES'], dry_run=DEBUG,
+                         idle_timeout=CONFIG['PRINTER'].get('IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT),
+                         status_interval=CONFIG['PRINTER'].get('STATUS_INTERVAL', DEFAULT_STATUS_INTERVAL),
+                         max_status_interval=CONFIG['PRINTER'].get('STATUS_MAX_INTERVAL',
+                                                                   DEFAULT_MAX_STATUS_INTERVAL))
+            pool.start()
+            PRINTER_POOL = pool
+        return PRINTER_POOL
+
+
+def get_history() -> Optional[HistoryStore]:
+    """Get the print history, opening the database on first use. None if the history is disabled."""
+    global HISTORY
+
+    # The history is disabled by setting HISTORY_DB to false
+    path = CONFIG['SERVER'].get('HISTORY_DB', DEFAULT_HISTORY_DB)
+    if not path:
+        return None
+    with HISTORY_LOCK:
+        if HISTORY is None:
+            HISTORY = HistoryStore(path,
+                                   max_entries=CONFIG['SERVER'].get('HISTORY_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+                                   max_age_days=CONFIG['SERVER'].get('HISTORY_MAX_AGE_DAYS', DEFAULT_MAX_AGE_DAYS))
+        return HISTORY
+
+
+def record_history(job: PrintJob, labels: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+    """
+    Add the labels of a print job to the print history.
+
+    Args:
+        job: Print job printing the labels
+        labels: Tuples of (label parameters, label context)
+    """
+    try:
+        history = get_history()
+        if history is None:
+            return
+        for params, context in labels:
+            history.add(params, context['label_size'], context['text'],
+                        font_family=f"{context['font_family']} ({context['font_style']})",
+                        font_size=context['font_size'], job_id=job.id, status=job.status, error=job.error)
+        # The job may have finished before its labels were recorded
+        if job.is_finished:
+            history.update_job(job.id, job.status, job.error)
+    except Exception as e:
+        logger.error(f'Could not record job {job.id} in the print history: {e}')
+
+
+def update_history(job: PrintJob) -> None:
+    """Store the final status of a print job in the print history."""
+    if HISTORY is not None:
+        HISTORY.update_job(job.id, job.status, job.error)
+
+
+def job_finished(job: PrintJob) -> None:
+    """Called by the print workers with every finished job."""
+    update_history(job)
+    if METRICS.enabled and job.started_at is not None and job.finished_at is not None:
+        STAGE_SECONDS.observe(job.started_at - job.queued_at, 'queue')
+        STAGE_SECONDS.observe(job.finished_at - job.started_at, 'print')
 
 
 @post('/api/print/text')
 @get('/api/print/text')
 def print_text():
-    """Print a text label."""
+    """
+    Print a text label.
+
+    The label is rendered and rasterized right away and then queued on the
+    least busy printer with the label size loaded. The response contains the
+    id of the print job, which can be followed at /api/jobs/<job_id>. Pass
+    wait=true to wait for the printer.
+    """
     return_dict: Dict[str, Any] = {'success': False}
 
     try:
         context = get_label_context(request)
-    except LookupError as e:
+    except (LookupError, ValueError) as e:
         return_dict['error'] = str(e)
         return return_dict
 
@@ -424,39 +1115,32 @@ def print_text():
         return return_dict
 
     try:
-        im = create_label_im(**context)
         if DEBUG:
-            im.save('sample-out.png')
-
-        # Determine rotation
-        rotate = 0
-        if context['kind'] == ENDLESS_LABEL:
-            rotate = 0 if context['orientation'] == 'standard' else 90
-        elif context['kind'] in (ROUND_DIE_CUT_LABEL, DIE_CUT_LABEL):
-            rotate = 'auto'
-
-        # Create raster data
-        qlr = BrotherQLRaster(CONFIG['PRINTER']['MODEL'])
-        red = 'red' in context['label_size']
-        create_label(qlr, im, context['label_size'], red=red,
-                    threshold=context['threshold'], cut=True, rotate=rotate)
-
-        # Send to printer
-        if not DEBUG and BACKEND_CLASS:
-            try:
-                be = BACKEND_CLASS(CONFIG['PRINTER']['PRINTER'])
-                be.write(qlr.data)
-                be.dispose()
-                del be
-            except Exception as e:
+            create_label_im(**context).save('sample-out.png')
+
+        # Render and create raster data for the model of the printer the label goes to
+        printer_pool = get_printer_pool()
+        model = printer_pool.model_for(context['label_size'])
+        data = get_label_raster(context, model=model)
+
+        # Hand the job over to the print worker
+        job = printer_pool.submit(data, context['label_size'], model)
+        params = {key: value for key, value in get_label_params(request).items() if key != 'wait'}
+        record_history(job, [(params, context)])
+
+        if request.params.get('wait', 'false').lower() == 'true':
+            job.finished.wait(CONFIG['PRINTER'].get('WAIT_TIMEOUT', 60))
+            if job.error:
                 return_dict['success'] = False
-                return_dict['message'] = str(e)
-                logger.warning(f'Printer communication failed: {e}')
+                return_dict['message'] = job.error
+                return_dict['job'] = job.to_dict()
                 return return_dict
 
         return_dict['success'] = True
+        return_dict['job_id'] = job.id
+        return_dict['job'] = job.to_dict()
         if DEBUG:
-            return_dict['data'] = str(qlr.data)
+            return_dict['data'] = str(data)
 
     except Exception as e:
         return_dict['success'] = False
@@ -466,21 +1150,414 @@ def print_text():
     return return_dict
 
 
+@post('/api/print/batch')
+def print_batch():
+    """
+    Print many labels as a single raster job.
+
+    Expects a JSON body like {"labels": [{...}, ...], "cut_at_end_only": false},
+    where each label takes the same parameters as /api/print/text. Labels that
+    cannot be rendered are reported per item and left out of the job.
+    """
+    return_dict: Dict[str, Any] = {'success': False}
+
+    content_type = request.environ.get('CONTENT_TYPE', '')
+    if 'application/json' not in content_type:
+        return_dict['error'] = 'Content-Type must be application/json'
+        return return_dict
+
+    try:
+        body_data = getattr(request.body, 'read', lambda: b'')()
+        batch = json.loads(body_data.decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return_dict['error'] = 'Invalid JSON data'
+        return return_dict
+
+    labels = batch.get('labels') if isinstance(batch, dict) else None
+    if not isinstance(labels, list) or not labels:
+        return_dict['error'] = 'Please provide a non-empty list of labels'
+        return return_dict
+    cut_at_end_only = str(batch.get('cut_at_end_only', False)).lower() == 'true'
+
+    # Validate all labels first, so the cut setting of the last one is known
+    items: List[Dict[str, Any]] = []
+    contexts: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    label_size = None
+    for index, label in enumerate(labels):
+        item: Dict[str, Any] = {'index': index, 'success': False}
+        items.append(item)
+        try:
+            if not isinstance(label, dict):
+                raise ValueError('Label must be an object')
+            context = build_label_context(label)
+            if context['text'] is None:
+                raise ValueError('Please provide the text for the label')
+            if label_size is None:
+                label_size = context['label_size']
+            elif context['label_size'] != label_size:
+                raise ValueError(f'Label size {context["label_size"]} differs from the batch ({label_size})')
+            contexts.append((item, context))
+        except Exception as e:
+            item['error'] = str(e)
+
+    # Render the labels, in parallel if the render pool is enabled
+    printer_pool = get_printer_pool()
+    model = printer_pool.model_for(label_size) if label_size else None
+    futures = []
+    for i, (item, context) in enumerate(contexts):
+        is_last = i == len(contexts) - 1
+        futures.append((item, submit_label_raster(context, is_last or not cut_at_end_only, model)))
+
+    rasters: List[bytes] = []
+    rendered: List[Dict[str, Any]] = []
+    for (item, future), (_, context) in zip(futures, contexts):
+        try:
+            rasters.append(future.result())
+            rendered.append(context)
+            item['success'] = True
+        except Exception as e:
+            item['error'] = str(e)
+
+    # If the last labels failed, the cut goes to the last one that was rendered
+    if cut_at_end_only and rendered and rendered[-1] is not contexts[-1][1]:
+        try:
+            rasters[-1] = get_label_raster(rendered[-1], True, model)
+        except Exception as e:
+            logger.error(f'Could not render the last label of the batch with a cut: {e}')
+
+    return_dict['items'] = items
+    if not rasters:
+        return_dict['error'] = 'None of the labels could be rendered'
+        return return_dict
+
+    try:
+        data = b''.join(rasters)
+        job = printer_pool.submit(data, label_size, model, labels=len(rasters))
+    except Exception as e:
+        return_dict['error'] = str(e)
+        logger.error(f'Batch creation failed: {e}')
+        return return_dict
+    record_history(job, [(labels[item['index']], context) for item, context in contexts if item['success']])
+
+    return_dict['success'] = True
+    return_dict['job_id'] = job.id
+    return_dict['job'] = job.to_dict()
+    return_dict['printed'] = len(rasters)
+    return_dict['failed'] = len(labels) - len(rasters)
+    if DEBUG:
+        return_dict['data'] = str(data)
+
+    return return_dict
+
+
+def start_merge(merge: MergeJob, cut_at_end_only: bool = False, resume: bool = False) -> None:
+    """Start (or resume) a mail merge, wiring it to the renderer and the printer pool."""
+
+    printer_pool = get_printer_pool()
+    label_size = str(merge.template.get('label_size', '62'))
+    model = printer_pool.model_for(label_size)
+
+    def render(label: Dict[str, Any], is_last: bool):
+        context = build_label_context(label)
+        if context['text'] is None:
+            raise ValueError('Please provide the text for the label')
+        return RENDER_POOL.submit(render_label_raster, context, model, is_last or not cut_at_end_only)
+
+    def rasterize(rasters: List[bytes]) -> bytes:
+        return b''.join(rasters)
+
+    def submit(data: bytes, labels: int):
+        return printer_pool.submit(data, label_size, model, labels=labels, merge_id=merge.id)
+
+    if resume:
+        merge.resume(render, rasterize, submit)
+    else:
+        merge.start(render, rasterize, submit)
+
+
+@post('/api/print/merge')
+def print_merge():
+    """
+    Print one label per row of an uploaded CSV or JSONL file.
+
+    Form fields:
+        file: The CSV (with header line) or JSONL file
+        template: Label template as JSON, or template_name of a saved template.
+                  {column} placeholders in text and qr_data are filled per row.
+        format: 'csv' or 'jsonl', guessed from the file name if missing
+        start_row: Row to start at, e.g. to resume after a failure
+        chunk_size: Number of labels per print job
+        cut_at_end_only: Only cut after the last label
+
+    The rows are printed in the background; follow the progress at
+    /api/print/merge/<merge_id>.
+    """
+    return_dict: Dict[str, Any] = {'success': False}
+
+    upload = request.files.get('file')
+    if upload is None:
+        return_dict['error'] = 'Please upload a CSV or JSONL file'
+        return return_dict
+
+    try:
+        if request.forms.get('template'):
+            template = json.loads(request.forms.getunicode('template'))
+        elif request.forms.get('template_name'):
+            template = TEMPLATES.get(request.forms.getunicode('template_name'))
+            if template is None:
+                return_dict['error'] = 'Template not found'
+                return return_dict
+        else:
+            return_dict['error'] = 'Please provide a template or template_name'
+            return return_dict
+        if not isinstance(template, dict):
+            raise ValueError('Template must be an object')
+
+        file_format = request.forms.get('format') or guess_format(upload.raw_filename)
+        if file_format not in ('csv', 'jsonl'):
+            raise ValueError(f'Unsupported file format: {file_format}')
+        start_row = int(request.forms.get('start_row', 0))
+        chunk_size = int(request.forms.get('chunk_size', DEFAULT_CHUNK_SIZE))
+        cut_at_end_only = request.forms.get('cut_at_end_only', 'false').lower() == 'true'
+    except (ValueError, json.JSONDecodeError) as e:
+        return_dict['error'] = str(e)
+        return return_dict
+
+    # Keep the rows on disk, so they can be streamed and the merge resumed
+    fd, source_path = tempfile.mkstemp(prefix='merge-', suffix=f'.{file_format}')
+    os.close(fd)
+    upload.save(source_path, overwrite=True)
+
+    merge = MergeJob(source_path, file_format, template, start_row=start_row, chunk_size=chunk_size)
+    with MERGE_JOBS_LOCK:
+        MERGE_JOBS[merge.id] = merge
+        finished = [merge_id for merge_id, job in MERGE_JOBS.items() if job.is_finished]
+        for merge_id in finished[:max(0, len(MERGE_JOBS) - MAX_MERGE_JOBS)]:
+            MERGE_JOBS.pop(merge_id).remove_source()
+
+    start_merge(merge, cut_at_end_only)
+
+    return_dict['success'] = True
+    return_dict['merge_id'] = merge.id
+    return_dict['merge'] = merge.to_dict()
+    return return_dict
+
+
+@get('/api/print/merge/<merge_id>')
+def get_merge(merge_id: str):
+    """Get progress and throughput of a mail merge."""
+    merge = MERGE_JOBS.get(merge_id)
+    if merge is None:
+        response.status = 404
+        return {'error': 'Unknown merge'}
+    return merge.to_dict()
+
+
+@post('/api/print/merge/<merge_id>/resume')
+def resume_merge(merge_id: str):
+    """Resume a failed mail merge at the first row that was not printed."""
+    merge = MERGE_JOBS.get(merge_id)
+    if merge is None:
+        response.status = 404
+        return {'error': 'Unknown merge'}
+
+    try:
+        cut_at_end_only = request.forms.get('cut_at_end_only', 'false').lower() == 'true'
+        start_merge(merge, cut_at_end_only, resume=True)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+
+    return {'success': True, 'merge': merge.to_dict()}
+
+
+@get('/api/jobs')
+def list_jobs():
+    """Get the most recent print jobs and the queue statistics of every printer."""
+    printer_pool = get_printer_pool()
+    return {
+        'queue_depth': printer_pool.depth,
+        'printers': [dict(name=printer.name, **printer.queue.stats()) for printer in printer_pool.printers],
+        'jobs': [job.to_dict() for job in printer_pool.list_jobs()],
+    }
+
+
+@get('/api/jobs/<job_id>')
+def get_job(job_id: str):
+    """Get the state and timings of a print job."""
+    job = get_printer_pool().get_job(job_id)
+    if job is None:
+        response.status = 404
+        return {'error': 'Unknown job'}
+    return job.to_dict()
+
+
+@get('/api/history')
+def list_history():
+    """
+    Get a page of the print history, newest first.
+
+    Query parameters: limit, cursor (next_cursor of the previous page), q
+    (words the label text must contain), label_size, status and since (Unix
+    time). The response contains next_cursor, which is null on the last page.
+    """
+    history = get_history()
+    if history is None:
+        response.status = 404
+        return {'success': False, 'error': 'Print history is disabled'}
+
+    params = request.params.decode()
+    try:
+        since = params.get('since')
+        items, next_cursor = history.list(
+            limit=int(params.get('limit', 50)),
+            cursor=params.get('cursor') or None,
+            search=params.get('q', ''),
+            label_size=params.get('label_size') or None,
+            status=params.get('status') or None,
+            since=float(since) if since else None,
+        )
+    except ValueError as e:
+        response.status = 400
+        return {'success': False, 'error': f'Invalid parameter: {e}'}
+
+    return {'success': True, 'items': items, 'next_cursor': next_cursor}
+
+
+@get('/api/history/stats')
+def get_history_stats():
+    """Count the labels in the print history per job status, optionally since a Unix time."""
+    history = get_history()
+    if history is None:
+        response.status = 404
+        return {'success': False, 'error': 'Print history is disabled'}
+
+    try:
+        since = request.params.get('since')
+        counts = history.stats(float(since) if since else None)
+    except ValueError as e:
+        response.status = 400
+        return {'success': False, 'error': f'Invalid parameter: {e}'}
+    return {'success': True, 'counts': counts}
+
+
+@get('/api/history/<entry_id:int>')
+def get_history_entry(entry_id: int):
+    """Get a print history entry with the parameters to print it again."""
+    history = get_history()
+    entry = history.get(entry_id) if history is not None else None
+    if entry is None:
+        response.status = 404
+        return {'success': False, 'error': 'Unknown history entry'}
+    return {'success': True, 'item': entry}
+
+
+@delete('/api/history')
+def clear_history():
+    """Delete the whole print history."""
+    history = get_history()
+    if history is None:
+        response.status = 404
+        return {'success': False, 'error': 'Print history is disabled'}
+    history.clear()
+    return {'success': True}
+
+
+def collect_metrics() -> List[MetricFamily]:
+    """Read the cache statistics and the state of the printers when /metrics is scraped."""
+    caches = {
+        'preview': PREVIEW_CACHE.stats(),
+        'raster': RASTER_CACHE.stats(),
+        'layer': LAYER_CACHE.stats(),
+        'text_size': TEXT_SIZE_CACHE.stats(),
+        'font': get_font_cache_stats(),
+        'qr_matrix': QR_MATRIX_CACHE.stats(),
+        'glyph_advance': ADVANCE_CACHE.stats(),
+    }
+    families: List[MetricFamily] = [
+        ('brother_ql_cache_hits_total', 'counter', 'Cache lookups that found an entry',
+         [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        ('brother_ql_cache_misses_total', 'counter', 'Cache lookups that found no entry',
+         [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        ('brother_ql_cache_evictions_total', 'counter', 'Entries removed to make room for new ones',
+         [({'cache': name}, stats['evictions']) for name, stats in caches.items()]),
+        ('brother_ql_cache_entries', 'gauge', 'Entries in the cache',
+         [({'cache': name}, stats['entries']) for name, stats in caches.items()]),
+        ('brother_ql_cache_bytes', 'gauge', 'Memory used by the cache entries',
+         [({'cache': name}, stats['bytes']) for name, stats in caches.items() if 'bytes' in stats]),
+    ]
+
+    # Only report the printers once they were set up, scraping does not start them
+    if PRINTER_POOL is not None:
+        printers = [({'printer': printer.name}, printer, printer.queue.stats())
+                    for printer in PRINTER_POOL.printers]
+        families += [
+            ('brother_ql_printer_up', 'gauge', 'Whether the printer was reachable when it was last checked',
+             [(labels, 1 if printer.monitor.online else 0) for labels, printer, stats in printers]),
+            ('brother_ql_print_queue_depth', 'gauge', 'Print jobs waiting for the printer',
+             [(labels, stats['queue_depth']) for labels, printer, stats in printers]),
+            ('brother_ql_print_queue_bytes', 'gauge', 'Raster bytes of the queued jobs and the job being printed',
+             [(labels, stats['pending_bytes']) for labels, printer, stats in printers]),
+            ('brother_ql_print_jobs_total', 'counter', 'Print jobs by result',
+             [(dict(labels, result=result), stats[f'jobs_{result}'])
+              for labels, printer, stats in printers for result in ('done', 'failed', 'handed_over')]),
+            ('brother_ql_print_bytes_total', 'counter', 'Raster bytes sent to the printer',
+             [(labels, stats['bytes_printed']) for labels, printer, stats in printers]),
+            ('brother_ql_print_busy_seconds_total', 'counter', 'Time spent sending jobs to the printer',
+             [(labels, stats['busy_time']) for labels, printer, stats in printers]),
+        ]
+    return families
+
+
+METRICS.add_collector(collect_metrics)
+
+
+@get('/metrics')
+def get_metrics():
+    """
+    Get stage timings, cache statistics and printer queues in the Prometheus text format.
+
+    Timings are recorded from the first request on, so they cost nothing
+    until the metrics are scraped.
+    """
+    if not CONFIG['SERVER'].get('METRICS', True):
+        response.status = 404
+        return {'error': 'Metrics are disabled'}
+    response.set_header('Content-Type', METRICS_CONTENT_TYPE)
+    response.set_header('Cache-Control', 'no-store')
+    return METRICS.render()
+
+
 @get('/api/printer/status')
 def get_printer_status():
-    """Get printer status information."""
-    return_dict: Dict[str, Any] = {'online': False, 'model': CONFIG['PRINTER']['MODEL']}
+    """
+    Get the printer status as last checked by the status monitors.
+
+    The response contains the age of the status in seconds, a version and
+    the status and queue statistics of every printer. Pass the version and
+    wait=<seconds> to wait until the status of any printer changes (at most
+    MAX_STATUS_WAIT seconds); long_poll is false in the response if the
+    request was answered without waiting because too many others are
+    waiting already.
+    """
+    printer_pool = get_printer_pool()
+    return_dict: Dict[str, Any] = {
+        'model': ', '.join(sorted({printer.model for printer in printer_pool.printers})),
+    }
 
     try:
-        if BACKEND_CLASS:
-            be = BACKEND_CLASS(CONFIG['PRINTER']['PRINTER'])
-            be.dispose()
-            return_dict['online'] = True
-            return_dict['message'] = 'Printer is online and ready'
-    except Exception as e:
-        return_dict['message'] = f'Printer offline: {str(e)}'
-        logger.warning(f'Printer status check failed: {e}')
+        wait = min(float(request.query.get('wait', 0)), MAX_STATUS_WAIT)
+        version = int(request.query.get('version', -1))
+    except ValueError as e:
+        response.status = 400
+        return {'error': f'Invalid parameter: {e}'}
+
+    status = None
+    if wait > 0 and version == printer_pool.version:
+        status = printer_pool.wait_for_change(version, wait)
+        return_dict['long_poll'] = status is not None
+    return_dict.update(status or printer_pool.get_status())
 
+    response.set_header('Cache-Control', 'no-store')
     return return_dict
 
 
@@ -502,17 +1579,12 @@ def save_template():
             return_dict['error'] = 'Invalid JSON data'
             return return_dict
 
-        # Create templates directory
-        templates_dir = Path('templates')
-        templates_dir.mkdir(exist_ok=True)
-
-        # Save template
-        template_name = template_data.get('name', 'untitled') if isinstance(template_data, dict) else 'untitled'
-        filename = templates_dir / f"{template_name.replace(' ', '_').lower()}.json"
-
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(template_data, f, indent=2, ensure_ascii=False)
+        if not isinstance(template_data, dict):
+            return_dict['error'] = 'Template must be an object'
+            return return_dict
 
+        template_name = template_data.get('name', 'untitled')
+        return_dict['id'] = TEMPLATES.save(template_data)
         return_dict['success'] = True
         return_dict['message'] = f'Template "{template_name}" saved successfully'
 
@@ -526,24 +1598,61 @@ def save_template():
 
 @get('/api/templates')
 def get_templates():
-    """Get available templates."""
-    return_dict: Dict[str, Any] = {'templates': []}
+    """
+    Get saved templates.
 
+    Query parameters: offset and limit (all templates if missing), q (text in
+    the name or description), category and sort (one of TEMPLATE_SORT_ORDERS,
+    default: recent). The response contains the number of matching templates
+    as total.
+    """
+    params = request.params.decode()
     try:
-        templates_dir = Path('templates')
-        if templates_dir.exists():
-            for filepath in templates_dir.glob('*.json'):
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        template_data = json.load(f)
-                        return_dict['templates'].append(template_data)
-                except Exception as e:
-                    logger.warning(f'Failed to load template {filepath.name}: {e}')
+        offset = max(0, int(params.get('offset', 0)))
+        limit = int(params['limit']) if params.get('limit') else None
+        search = params.get('q', '')
+        category = params.get('category', '')
+        order = params.get('sort', 'recent')
+        if order not in TEMPLATE_SORT_ORDERS:
+            raise ValueError(f'unknown sort order {order}')
+    except ValueError as e:
+        response.status = 400
+        return {'error': f'Invalid parameter: {e}'}
 
-    except Exception as e:
+    try:
+        templates, total, index_etag = TEMPLATES.list(offset, limit, search, category, order)
+    except OSError as e:
         logger.warning(f'Failed to read templates directory: {e}')
+        return {'templates': [], 'total': 0, 'offset': offset, 'limit': limit}
 
-    return return_dict
+    # The index ETag changes with every added, changed or deleted template
+    query_hash = hashlib.sha1(f'{offset}:{limit}:{search}:{category}:{order}'.encode()).hexdigest()[:8]
+    etag = f'"templates-{index_etag}-{query_hash}"'
+    response.set_header('ETag', etag)
+    response.set_header('Cache-Control', 'no-cache')
+    if etag_matches(etag):
+        response.status = 304
+        return b''
+
+    return {'templates': templates, 'total': total, 'offset': offset, 'limit': limit}
+
+
+@delete('/api/templates/<name>')
+def delete_template(name: str):
+    """Delete a saved template by its id or name."""
+    try:
+        deleted = TEMPLATES.delete(name)
+    except ValueError as e:
+        response.status = 400
+        return {'success': False, 'error': str(e)}
+    except OSError as e:
+        logger.warning(f'Template delete failed: {e}')
+        return {'success': False, 'error': str(e)}
+
+    if not deleted:
+        response.status = 404
+        return {'success': False, 'error': 'Template not found'}
+    return {'success': True, 'message': f'Template "{name}" deleted'}
 
 
 @post('/api/preview/qr')
@@ -560,25 +1669,26 @@ def get_qr_preview():
             response.status = 400
             return {'error': 'QR data is required'}
 
-        qr = qrcode.QRCode(  # type: ignore
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,  # type: ignore
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
+        error_correction = request.params.get('error_correction', 'L')
+        if error_correction not in QR_ERROR_CORRECTIONS:
+            response.status = 400
+            return {'error': f'Unknown QR error correction: {error_correction}'}
+        try:
+            version = parse_qr_version(request.params.get('version'))
+        except ValueError as e:
+            response.status = 400
+            return {'error': str(e)}
 
-        qr_img = qr.make_image(fill_color="black", back_color="white")
+        qr_img = make_qr_image(qr_data, box_size=10, border=4,
+                               error_correction=error_correction, version=version)
 
         return_format = getattr(request.query, 'get', lambda x, y: y)('return_format', 'png')
         if return_format == 'base64':
-            import base64
             response.set_header('Content-type', 'text/plain')
-            return base64.b64encode(image_to_png_bytes(qr_img))  # type: ignore
+            return base64.b64encode(image_to_png_bytes(qr_img))
         else:
             response.set_header('Content-type', 'image/png')
-            return image_to_png_bytes(qr_img)  # type: ignore
+            return image_to_png_bytes(qr_img)
     except Exception as e:
         response.status = 500
         return {'error': f'QR code generation failed: {str(e)}'}
@@ -618,58 +1728,145 @@ def validate_config() -> None:
     if CONFIG['LABEL']['DEFAULT_SIZE'] not in label_sizes:
         raise ValueError(f"Invalid default label size: {CONFIG['LABEL']['DEFAULT_SIZE']}")
 
+    if CONFIG['PRINTER'].get('RASTERIZER', 'auto') not in RASTERIZERS:
+        raise ValueError(f"Invalid rasterizer: {CONFIG['PRINTER']['RASTERIZER']}")
+
+    # Validate printers
+    names = set()
+    for printer in get_printer_configs():
+        if printer['NAME'] in names:
+            raise ValueError(f"Duplicate printer name: {printer['NAME']}")
+        names.add(printer['NAME'])
+        if not printer['PRINTER']:
+            raise ValueError(f"Missing string descriptor of printer {printer['NAME']}")
+        if printer['MODEL'] not in models:
+            raise ValueError(f"Invalid model of printer {printer['NAME']}: {printer['MODEL']}")
+        for label_size in printer['LABEL_SIZES'] or []:
+            if label_size not in label_sizes:
+                raise ValueError(f"Invalid label size of printer {printer['NAME']}: {label_size}")
+
+
+def setup_render_pool(workers: int) -> None:
+    """Start the render worker processes, preloading the default font in each of them."""
+    global RENDER_POOL
+
+    if not workers:
+        return
+
+    warm_fonts = []
+    default_font = get_default_font_config()
+    try:
+        font_path, font_index = split_font_face_path(FONTS[default_font['family']][default_font['style']])
+        font_size = CONFIG['LABEL'].get('DEFAULT_FONT_SIZE', 100)
+        warm_fonts.append((font_path, font_size, font_index))
+    except KeyError:
+        pass
+
+    RENDER_POOL = RenderPool(workers, initializer=warm_font_cache, initargs=(warm_fonts,))
+
+
+def setup_preview_cache() -> None:
+    """Apply the configured memory limits to the preview, raster and layer caches."""
+    cache_mb = CONFIG['SERVER'].get('PREVIEW_CACHE_MB', DEFAULT_PREVIEW_CACHE_MB)
+    PREVIEW_CACHE.resize(PREVIEW_CACHE.max_entries, max_bytes=int(cache_mb * 1024 * 1024))
+    cache_mb = CONFIG['SERVER'].get('RASTER_CACHE_MB', DEFAULT_RASTER_CACHE_MB)
+    RASTER_CACHE.resize(RASTER_CACHE.max_entries, max_bytes=int(cache_mb * 1024 * 1024))
+    cache_mb = CONFIG['SERVER'].get('LAYER_CACHE_MB', DEFAULT_LAYER_CACHE_MB)
+    LAYER_CACHE.resize(LAYER_CACHE.max_entries, max_bytes=int(cache_mb * 1024 * 1024))
 
-def setup_fonts(additional_font_folder: Optional[str] = None) -> None:
+
+def setup_fonts(additional_font_folder: Optional[str] = None, rebuild_font_index: bool = False,
+                scan_workers: Optional[int] = None) -> None:
     """Set up font system with whitelist support."""
+    with SETUP_LOCK:
+        _setup_fonts(additional_font_folder, rebuild_font_index, scan_workers)
+
+
+def _setup_fonts(additional_font_folder: Optional[str], rebuild_font_index: bool,
+                 scan_workers: Optional[int]) -> None:
     global FONTS, CONFIG
 
-    FONTS = get_whitelisted_fonts(additional_font_folder)
+    configure_font_cache(CONFIG['SERVER'].get('FONT_CACHE_SIZE', DEFAULT_FONT_CACHE_SIZE))
+
+    # Persistent font index, disabled by setting FONT_INDEX to false
+    font_index = None
+    font_index_path = CONFIG['SERVER'].get('FONT_INDEX', 'font_index.json')
+    if font_index_path:
+        font_index = FontIndex(font_index_path, rebuild=rebuild_font_index)
+
+    # Number of threads parsing font files, null/0 means one per CPU
+    if scan_workers is None:
+        scan_workers = CONFIG['SERVER'].get('FONT_SCAN_WORKERS') or None
 
-    if not FONTS:
+    fonts = get_whitelisted_fonts(additional_font_folder, font_index, scan_workers)
+
+    if not fonts:
         sys.stderr.write("Not a single font was found on your system. Please install some or use the \"--font-folder\" argument.\n")
         sys.exit(2)
 
     # Handle default font selection
     default_fonts = CONFIG['LABEL']['DEFAULT_FONTS']
+    selected_font = None
     if isinstance(default_fonts, list):
         # Try each font in the list
         for font in default_fonts:
             try:
-                FONTS[font['family']][font['style']]
-                CONFIG['LABEL']['DEFAULT_FONTS'] = font
+                fonts[font['family']][font['style']]
+                selected_font = font
                 logger.debug(f"Selected default font: {font}")
                 break
             except KeyError:
                 continue
         else:
             # No default font found, select random
-            family = random.choice(list(FONTS.keys()))
-            style = random.choice(list(FONTS[family].keys()))
-            CONFIG['LABEL']['DEFAULT_FONTS'] = {'family': family, 'style': style}
+            family = random.choice(list(fonts.keys()))
+            style = random.choice(list(fonts[family].keys()))
+            selected_font = {'family': family, 'style': style}
             sys.stderr.write(f'Could not find any of the default fonts. Using: {family} ({style})\n')
     elif isinstance(default_fonts, dict):
         # Single font configuration
         try:
-            FONTS[default_fonts['family']][default_fonts['style']]
+            fonts[default_fonts['family']][default_fonts['style']]
         except KeyError:
             # Default font not found, select random
-            family = random.choice(list(FONTS.keys()))
-            style = random.choice(list(FONTS[family].keys()))
-            CONFIG['LABEL']['DEFAULT_FONTS'] = {'family': family, 'style': style}
+            family = random.choice(list(fonts.keys()))
+            style = random.choice(list(fonts[family].keys()))
+            selected_font = {'family': family, 'style': style}
             sys.stderr.write(f'Default font not found. Using: {family} ({style})\n')
 
+    # Publish the fonts and the default font together
+    if selected_font is not None:
+        CONFIG['LABEL'] = dict(CONFIG['LABEL'], DEFAULT_FONTS=selected_font)
+    FONTS = fonts
+
+    # Font files may have changed since their text was measured
+    TEXT_SIZE_CACHE.clear()
+    clear_layout_cache()
+
 
 def main():
     """Main application entry point."""
-    global DEBUG, BACKEND_CLASS, CONFIG
+    global DEBUG, BACKEND_CLASSES, CONFIG
 
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument('--host', default='0.0.0.0', help='Host to run server on')
     parser.add_argument('--port', default=False, help='Port to run server on')
+    parser.add_argument('--server', default=None, choices=SERVER_CHOICES,
+                       help=f'WSGI server handling the requests (default: {DEFAULT_SERVER})')
+    parser.add_argument('--threads', type=int, default=None,
+                       help=f'Number of request handler threads (default: {DEFAULT_THREADS})')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Number of server processes, only with --server gunicorn (default: 1)')
     parser.add_argument('--loglevel', type=lambda x: getattr(logging, x.upper()),
                        default=False, help='Log level')
     parser.add_argument('--font-folder', default=False,
                        help='Folder for additional .ttf/.otf fonts')
+    parser.add_argument('--rebuild-font-index', action='store_true',
+                       help='Ignore the persistent font index and parse all font files again')
+    parser.add_argument('--font-scan-workers', type=int, default=None,
+                       help='Number of threads parsing font files (default: one per CPU)')
+    parser.add_argument('--render-workers', type=int, default=None,
+                       help='Number of processes rendering labels (default: 0, render in the server process)')
     parser.add_argument('--default-label-size', default=False,
                        help='Label size inserted in your printer. Defaults to 62.')
     parser.add_argument('--default-orientation', default=False,
@@ -705,24 +1902,41 @@ def main():
     except ValueError as e:
         parser.error(str(e))
 
-    # Set up printer backend
-    try:
-        selected_backend = guess_backend(CONFIG['PRINTER']['PRINTER'])
-    except ValueError:
-        parser.error("Couldn't guess the backend to use from the printer string descriptor")
-
-    BACKEND_CLASS = backend_factory(selected_backend)['backend_class']
+    # Set up printer backends
+    backend_classes = {}
+    for printer in get_printer_configs():
+        try:
+            selected_backend = guess_backend(printer['PRINTER'])
+        except ValueError:
+            parser.error(f"Couldn't guess the backend to use from the string descriptor of printer {printer['NAME']}")
+        backend_classes[printer['NAME']] = backend_factory(selected_backend)['backend_class']
+    BACKEND_CLASSES = backend_classes
 
     # Set up fonts
     additional_font_folder = args.font_folder or CONFIG['SERVER']['ADDITIONAL_FONT_FOLDER']
-    setup_fonts(additional_font_folder)
+    setup_fonts(additional_font_folder, rebuild_font_index=args.rebuild_font_index,
+                scan_workers=args.font_scan_workers)
+    setup_preview_cache()
+    render_workers = args.render_workers
+    if render_workers is None:
+        render_workers = CONFIG['SERVER'].get('RENDER_WORKERS', 0)
+    setup_render_pool(render_workers)
+    get_printer_pool()
 
     # Start server
     port = args.port or CONFIG['SERVER']['PORT']
     host = args.host or CONFIG['SERVER']['HOST']
 
-    logger.info(f"Starting Brother QL Web server on {host}:{port}")
-    run(host=host, port=port, debug=DEBUG)
+    server = args.server or CONFIG['SERVER'].get('SERVER', DEFAULT_SERVER)
+    threads = args.threads or CONFIG['SERVER'].get('THREADS', DEFAULT_THREADS)
+    workers = args.workers or CONFIG['SERVER'].get('WORKERS', 1)
+    try:
+        adapter, server_options = get_server_adapter(server, threads, workers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    logger.info(f"Starting Brother QL Web server on {host}:{port} using {describe_server(server, threads, workers)}")
+    run(server=adapter, host=host, port=int(port), debug=DEBUG, **server_options)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Small in-process caches shared by the Brother QL Web components.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with hit/miss counters.
+
+    The cache is bounded by the number of entries (max_entries) and,
+    optionally, by the summed size of the stored values (max_bytes).
+    A value's size is determined by the sizeof callable, which defaults
+    to len() and is only consulted when max_bytes is set.
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = len):
+        self.max_entries = max(0, int(max_entries))
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key and mark it as recently used."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting least recently used entries if needed."""
+        if self.max_entries == 0:
+            return
+
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            # A single value larger than the whole cache is never stored
+            return
+
+        with self._lock:
+            if key in self._data:
+                self.current_bytes -= self._sizes.pop(key, 0)
+                del self._data[key]
+
+            self._data[key] = value
+            self._sizes[key] = size
+            self.current_bytes += size
+
+            while len(self._data) > self.max_entries or (
+                    self.max_bytes is not None and self.current_bytes > self.max_bytes):
+                old_key, _ = self._data.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(old_key, 0)
+                self.evictions += 1
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, creating it with factory() on a miss.
+
+        The factory runs outside the lock, so two threads missing on the same
+        key at the same time may both create the value; the last one wins.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop all entries. Counters are kept."""
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def resize(self, max_entries: int, max_bytes: Optional[int] = None) -> None:
+        """Change the cache limits, evicting entries that no longer fit."""
+        with self._lock:
+            self.max_entries = max(0, int(max_entries))
+            self.max_bytes = max_bytes
+            if self.max_bytes is None:
+                self._sizes = {key: 0 for key in self._data}
+            else:
+                self._sizes = {key: self._sizeof(value) for key, value in self._data.items()}
+            self.current_bytes = sum(self._sizes.values())
+            while self._data and (len(self._data) > self.max_entries or (
+                    self.max_bytes is not None and self.current_bytes > self.max_bytes)):
+                old_key, _ = self._data.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(old_key, 0)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache statistics."""
+        with self._lock:
+            stats: Dict[str, Any] = {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+            if self.max_bytes is not None:
+                stats['bytes'] = self.current_bytes
+                stats['max_bytes'] = self.max_bytes
+            return stats
@@ -6,16 +6,146 @@ Cross-platform font discovery and management for Brother QL Web.
 Uses native system APIs and Python libraries instead of fontconfig.
 """
 
+import json
 import logging
+import mmap
 import os
 import platform
+import struct
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional, List, Set
+from typing import Any, Dict, Optional, List, Set, Tuple
 import sys
 
+from PIL import ImageFont
+
+from cache_helpers import LRUCache
+
 logger = logging.getLogger(__name__)
 
+# Default number of ImageFont objects kept in memory
+DEFAULT_FONT_CACHE_SIZE = 64
+
+# Process-wide cache of loaded font objects, keyed by (path, size, index)
+FONT_CACHE = LRUCache(max_entries=DEFAULT_FONT_CACHE_SIZE)
+
+# Bump whenever the structure of the stored font info changes
+FONT_INDEX_VERSION = 2
+
+# Separator between the file path and the face index of fonts inside a collection
+FONT_FACE_SEPARATOR = '#'
+
+# Name table IDs
+NAME_ID_FAMILY = 1
+NAME_ID_SUBFAMILY = 2
+NAME_ID_TYPOGRAPHIC_FAMILY = 16
+NAME_ID_TYPOGRAPHIC_SUBFAMILY = 17
+
+
+class FontIndex:
+    """
+    Persistent index of parsed font metadata stored as a JSON file.
+
+    Entries are keyed by font file path and remember the file size and
+    modification time they were parsed from, so a file only has to be
+    parsed again when it was added or changed since the last scan.
+    """
+
+    def __init__(self, index_path: str, rebuild: bool = False):
+        self.index_path = Path(index_path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.seen: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+        if rebuild:
+            logger.info(f"Rebuilding font index {self.index_path}")
+            self.dirty = True
+        else:
+            self.load()
+
+    def load(self) -> None:
+        """Load the index from disk, starting empty if it is missing or outdated."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read font index {self.index_path}: {e}")
+            return
+
+        if not isinstance(data, dict) or data.get('version') != FONT_INDEX_VERSION:
+            logger.info(f"Font index {self.index_path} has an old format, rebuilding it")
+            self.dirty = True
+            return
+
+        self.entries = data.get('fonts', {})
+
+    def lookup(self, font_path: Path, stat: os.stat_result) -> Tuple[bool, List[Dict[str, str]]]:
+        """
+        Look up the parsed faces of a font file.
+
+        Returns:
+            Tuple of (found, faces). faces may be empty for files that were
+            parsed before but did not yield any font information.
+        """
+        key = str(font_path)
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        if entry and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime_ns:
+            self.hits += 1
+            return True, entry.get('faces', [])
+        self.misses += 1
+        return False, []
+
+    def store(self, font_path: Path, stat: os.stat_result, faces: List[Dict[str, str]]) -> None:
+        """Remember the parsed faces of a font file."""
+        key = str(font_path)
+        self.seen.add(key)
+        self.entries[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'faces': faces}
+        self.dirty = True
+
+    def prune(self, scanned_roots: List[Path]) -> int:
+        """
+        Drop stale entries: files below one of the scanned directories that
+        were not seen during the scan, and files that no longer exist.
+
+        Returns:
+            Number of removed entries
+        """
+        roots = [str(root).rstrip(os.sep) + os.sep for root in scanned_roots]
+        stale = []
+        for key in self.entries:
+            if key in self.seen:
+                continue
+            if any(key.startswith(root) for root in roots) or not os.path.exists(key):
+                stale.append(key)
+
+        for key in stale:
+            del self.entries[key]
+        if stale:
+            self.dirty = True
+            logger.debug(f"Pruned {len(stale)} stale entries from the font index")
+        return len(stale)
+
+    def save(self) -> None:
+        """Write the index to disk if it changed, replacing the old file atomically."""
+        if not self.dirty:
+            return
+
+        tmp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump({'version': FONT_INDEX_VERSION, 'fonts': self.entries}, fh, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+        except OSError as e:
+            logger.warning(f"Could not write font index {self.index_path}: {e}")
+
 
 def normalize_font_style(style: str) -> str:
     """
@@ -221,12 +351,32 @@ def get_system_font_paths() -> List[Path]:
     return [path for path in font_paths if path.exists() and path.is_dir()]
 
 
-def parse_font_file(font_path: Path) -> Optional[Dict[str, str]]:
+def parse_font_faces(font_path: Path) -> List[Dict[str, str]]:
+    """
+    Parse a font file to extract family and style information of every face.
+
+    The name table of TrueType/OpenType files is read in-process. Other
+    files (or broken name tables) fall back to the platform-specific methods.
+    """
+    faces = parse_font_nametable(font_path)
+    if faces:
+        return faces
+
+    font_info = parse_font_file(font_path, use_nametable=False)
+    return [font_info] if font_info else []
+
+
+def parse_font_file(font_path: Path, use_nametable: bool = True) -> Optional[Dict[str, str]]:
     """
     Parse a font file to extract family and style information.
     Uses platform-specific methods for better accuracy.
     """
     try:
+        if use_nametable:
+            faces = parse_font_nametable(font_path)
+            if faces:
+                return faces[0]
+
         system = platform.system()
 
         if system == "Darwin":  # macOS
@@ -288,6 +438,126 @@ def parse_font_fontconfig(font_path: Path) -> Optional[Dict[str, str]]:
         return None
 
 
+def _decode_name_record(platform_id: int, encoding_id: int, raw: bytes) -> Optional[str]:
+    """Decode a name table string according to its platform and encoding."""
+    if platform_id in (0, 3):
+        # Unicode and Windows platforms store UTF-16BE (symbol fonts included)
+        codec = 'utf-16-be'
+    elif platform_id == 1 and encoding_id == 0:
+        codec = 'mac_roman'
+    else:
+        return None
+    try:
+        return raw.decode(codec).strip('\x00 ')
+    except UnicodeDecodeError:
+        return None
+
+
+def _name_record_priority(platform_id: int, language_id: int) -> int:
+    """Rank name records, preferring English Windows names (lower is better)."""
+    if platform_id == 3 and language_id == 0x0409:
+        return 0
+    if platform_id == 3 and language_id & 0xFF == 0x09:
+        return 1
+    if platform_id == 1 and language_id == 0:
+        return 2
+    if platform_id == 0:
+        return 3
+    return 4
+
+
+def _read_sfnt_names(data: Any, offset: int) -> Dict[int, str]:
+    """Read the family/style related name records of the sfnt font starting at offset."""
+    num_tables = struct.unpack_from('>H', data, offset + 4)[0]
+
+    name_offset = None
+    for i in range(num_tables):
+        tag, _, table_offset, _ = struct.unpack_from('>4sIII', data, offset + 12 + 16 * i)
+        if tag == b'name':
+            name_offset = table_offset
+            break
+    if name_offset is None:
+        return {}
+
+    _, count, string_offset = struct.unpack_from('>HHH', data, name_offset)
+    storage = name_offset + string_offset
+
+    wanted = (NAME_ID_FAMILY, NAME_ID_SUBFAMILY, NAME_ID_TYPOGRAPHIC_FAMILY, NAME_ID_TYPOGRAPHIC_SUBFAMILY)
+    best: Dict[int, Tuple[int, str]] = {}
+    for i in range(count):
+        platform_id, encoding_id, language_id, name_id, length, str_offset = struct.unpack_from(
+            '>HHHHHH', data, name_offset + 6 + 12 * i)
+        if name_id not in wanted:
+            continue
+        priority = _name_record_priority(platform_id, language_id)
+        if name_id in best and best[name_id][0] <= priority:
+            continue
+        value = _decode_name_record(platform_id, encoding_id,
+                                    bytes(data[storage + str_offset:storage + str_offset + length]))
+        if value:
+            best[name_id] = (priority, value)
+
+    return {name_id: value for name_id, (_, value) in best.items()}
+
+
+def parse_font_nametable(font_path: Path) -> List[Dict[str, str]]:
+    """
+    Parse family and style of every face in a TrueType/OpenType font or collection
+    by reading the font's name table directly, without starting any process.
+
+    The file is memory-mapped, so only the header and name table pages are read.
+    Typographic family/subfamily names (IDs 16/17) are preferred over the
+    legacy ones (IDs 1/2), which group weights like "Semibold" into the family.
+
+    Returns:
+        List of font info dicts, one per face. Faces after the first one of a
+        collection get their index appended to the path (see font_face_path).
+    """
+    if font_path.suffix.lower() not in ('.ttf', '.otf', '.ttc'):
+        return []
+
+    faces = []
+    try:
+        with open(font_path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            tag = data[:4]
+            if tag == b'ttcf':
+                num_fonts = struct.unpack_from('>I', data, 8)[0]
+                offsets = struct.unpack_from(f'>{num_fonts}I', data, 12)
+            elif tag in (b'\x00\x01\x00\x00', b'OTTO', b'true'):
+                offsets = (0,)
+            else:
+                return []
+
+            for index, offset in enumerate(offsets):
+                names = _read_sfnt_names(data, offset)
+                family = names.get(NAME_ID_TYPOGRAPHIC_FAMILY) or names.get(NAME_ID_FAMILY)
+                style = names.get(NAME_ID_TYPOGRAPHIC_SUBFAMILY) or names.get(NAME_ID_SUBFAMILY)
+                if family and style:
+                    faces.append({"family": family, "style": style,
+                                  "path": font_face_path(str(font_path), index)})
+
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"Name table parsing failed for {font_path}: {e}")
+        return []
+
+    return faces
+
+
+def font_face_path(font_path: str, index: int = 0) -> str:
+    """Build the path used to refer to a face inside a font collection."""
+    if index:
+        return f"{font_path}{FONT_FACE_SEPARATOR}{index}"
+    return font_path
+
+
+def split_font_face_path(font_face: str) -> Tuple[str, int]:
+    """Split a path built by font_face_path() into the file path and the face index."""
+    path, separator, index = font_face.rpartition(FONT_FACE_SEPARATOR)
+    if separator and path and index.isdigit():
+        return path, int(index)
+    return font_face, 0
+
+
 def parse_font_filename(font_path: Path) -> Optional[Dict[str, str]]:
     """Parse font information from filename as fallback."""
     try:
@@ -389,73 +659,153 @@ def split_font_name(font_name: str) -> tuple[str, str]:
     return clean_name, 'Regular'
 
 
-def scan_font_directory(directory: Path) -> Dict[str, Dict[str, str]]:
-    """Scan a directory for font files and extract font information."""
-    fonts = {}
+def parse_font_files(font_files: List[Path], font_index: Optional[FontIndex] = None,
+                     workers: Optional[int] = None) -> List[List[Dict[str, str]]]:
+    """
+    Parse the faces of many font files, spreading the work across a thread pool.
+
+    Files found unchanged in font_index are not parsed again. The font index
+    is only touched from the calling thread.
+
+    Args:
+        font_files: Font files to parse
+        font_index: Optional persistent index of already parsed files
+        workers: Number of worker threads. None uses one per CPU, 1 parses serially.
 
+    Returns:
+        List of parsed faces for each file, in the order of font_files
+    """
+    results: List[List[Dict[str, str]]] = [[] for _ in font_files]
+    pending = []
+    stats = {}
+
+    for i, font_file in enumerate(font_files):
+        if font_index is None:
+            pending.append(i)
+            continue
+        try:
+            stat = font_file.stat()
+        except OSError as e:
+            logger.debug(f"Could not stat font {font_file}: {e}")
+            continue
+        found, faces = font_index.lookup(font_file, stat)
+        if found:
+            results[i] = faces
+        else:
+            stats[i] = stat
+            pending.append(i)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(pending)))
+
+    pending_files = [font_files[i] for i in pending]
+    if workers == 1:
+        parsed = [parse_font_faces(font_file) for font_file in pending_files]
+    else:
+        logger.debug(f"Parsing {len(pending_files)} font files with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_font_faces, pending_files))
+
+    for i, faces in zip(pending, parsed):
+        results[i] = faces
+        if font_index is not None:
+            font_index.store(font_files[i], stats[i], faces)
+
+    return results
+
+
+def find_font_files(directory: Path) -> List[Path]:
+    """Find all supported font files below a directory."""
     if not directory.exists() or not directory.is_dir():
-        return fonts
+        return []
 
     # Supported font extensions
     font_extensions = {'.ttf', '.otf', '.ttc', '.dfont'}
 
     try:
-        font_count = 0
         # Walk through directory recursively
-        for font_file in directory.rglob('*'):
-            if font_file.is_file() and font_file.suffix.lower() in font_extensions:
-                font_info = parse_font_file(font_file)
+        return [font_file for font_file in directory.rglob('*')
+                if font_file.is_file() and font_file.suffix.lower() in font_extensions]
+    except Exception as e:
+        logger.warning(f"Error scanning directory {directory}: {e}")
+        return []
 
-                if font_info and font_info.get('family') and font_info.get('style'):
-                    family = font_info['family'].strip()
-                    style = normalize_font_style(font_info['style'])
-                    path = font_info['path']
 
-                    # Skip empty or invalid family names
-                    if not family or len(family) < 2:
-                        continue
+def collect_fonts(font_files: List[Path], parsed_faces: List[List[Dict[str, str]]]) -> Dict[str, Dict[str, str]]:
+    """
+    Build the font dictionary from parsed faces.
+    The first file providing a family/style combination wins.
+    """
+    fonts: Dict[str, Dict[str, str]] = {}
 
-                    # Skip system/hidden fonts that start with dots
-                    if family.startswith('.'):
-                        continue
+    for font_file, faces in zip(font_files, parsed_faces):
+        for font_info in faces:
+            if not (font_info.get('family') and font_info.get('style')):
+                continue
 
-                    if family not in fonts:
-                        fonts[family] = {}
+            family = font_info['family'].strip()
+            style = normalize_font_style(font_info['style'])
+            path = font_info['path']
 
-                    # Only add if we don't already have this style
-                    if style not in fonts[family]:
-                        fonts[family][style] = path
-                        logger.debug(f"Added font: {family} ({style}) -> {font_file.name}")
-                        font_count += 1
-                    else:
-                        logger.debug(f"Skipped duplicate: {family} ({style})")
+            # Skip empty or invalid family names
+            if not family or len(family) < 2:
+                continue
 
-        logger.debug(f"Scanned {directory}: found {font_count} fonts in {len(fonts)} families")
+            # Skip system/hidden fonts that start with dots
+            if family.startswith('.'):
+                continue
 
-    except Exception as e:
-        logger.warning(f"Error scanning directory {directory}: {e}")
+            if family not in fonts:
+                fonts[family] = {}
+
+            # Only add if we don't already have this style
+            if style not in fonts[family]:
+                fonts[family][style] = path
+                logger.debug(f"Added font: {family} ({style}) -> {font_file.name}")
+            else:
+                logger.debug(f"Skipped duplicate: {family} ({style})")
+
+    return fonts
+
+
+def scan_font_directory(directory: Path, font_index: Optional[FontIndex] = None,
+                        workers: Optional[int] = None) -> Dict[str, Dict[str, str]]:
+    """
+    Scan a directory for font files and extract font information.
+    Files already present in font_index are not parsed again.
+    """
+    font_files = find_font_files(directory)
+    fonts = collect_fonts(font_files, parse_font_files(font_files, font_index, workers))
 
+    font_count = sum(len(styles) for styles in fonts.values())
+    logger.debug(f"Scanned {directory}: found {font_count} fonts in {len(fonts)} families")
     return fonts
 
 
-def get_fonts(folder: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+def get_fonts(folder: Optional[str] = None, font_index: Optional[FontIndex] = None,
+              workers: Optional[int] = None) -> Dict[str, Dict[str, str]]:
     """
     Scan for fonts using cross-platform methods.
 
     Args:
         folder: Optional path to scan for fonts. If None, scans system fonts.
+        font_index: Optional persistent index used to skip unchanged font files.
+        workers: Number of threads parsing font files. None uses one per CPU.
 
     Returns:
         Dictionary mapping font family names to style dictionaries,
         which map style names to font file paths.
     """
     fonts = {}
+    scanned_roots: List[Path] = []
 
     if folder:
         # Scan specific folder
         folder_path = Path(folder)
         if folder_path.exists():
-            fonts.update(scan_font_directory(folder_path))
+            scanned_roots.append(folder_path)
+            fonts.update(scan_font_directory(folder_path, font_index, workers))
         else:
             logger.warning(f"Font folder does not exist: {folder}")
     else:
@@ -463,10 +813,23 @@ def get_fonts(folder: Optional[str] = None) -> Dict[str, Dict[str, str]]:
         system_paths = get_system_font_paths()
         logger.info(f"Scanning system font directories: {[str(p) for p in system_paths]}")
 
+        # Parse the files of all directories in one pool, then merge them
+        # directory by directory so earlier directories keep precedence
+        files_per_path = []
         for path in system_paths:
+            logger.debug(f"Scanning {path}")
+            scanned_roots.append(path)
+            files_per_path.append(find_font_files(path))
+
+        all_files = [font_file for font_files in files_per_path for font_file in font_files]
+        all_faces = parse_font_files(all_files, font_index, workers)
+
+        offset = 0
+        for path, font_files in zip(system_paths, files_per_path):
+            path_faces = all_faces[offset:offset + len(font_files)]
+            offset += len(font_files)
             try:
-                logger.debug(f"Scanning {path}")
-                path_fonts = scan_font_directory(path)
+                path_fonts = collect_fonts(font_files, path_faces)
 
                 # Merge fonts, avoiding duplicates
                 for family, styles in path_fonts.items():
@@ -479,22 +842,78 @@ def get_fonts(folder: Optional[str] = None) -> Dict[str, Dict[str, str]]:
             except Exception as e:
                 logger.warning(f"Error scanning {path}: {e}")
 
+    if font_index is not None:
+        font_index.prune(scanned_roots)
+        font_index.save()
+        logger.info(f"Font index: {font_index.hits} unchanged, {font_index.misses} parsed")
+
+    # Font files may have changed since the cached objects were loaded
+    clear_font_cache()
+
     logger.info(f"Loaded {len(fonts)} font families with {sum(len(styles) for styles in fonts.values())} total styles")
     return fonts
 
 
+def get_font_object(font_path: str, font_size: int, index: int = 0) -> Any:
+    """
+    Get a loaded ImageFont object, parsing the font file only on a cache miss.
+
+    Args:
+        font_path: Path to the font file
+        font_size: Font size in pixels
+        index: Face index inside a font collection (.ttc)
+
+    Returns:
+        A PIL FreeTypeFont instance
+    """
+    key = (font_path, int(font_size), int(index))
+    return FONT_CACHE.get_or_create(
+        key, lambda: ImageFont.truetype(font_path, int(font_size), index=int(index))
+    )
+
+
+def warm_font_cache(font_specs: List[Tuple[str, int, int]]) -> None:
+    """
+    Load font objects into the cache ahead of their first use.
+
+    Args:
+        font_specs: List of (path, size, index) tuples
+    """
+    for font_path, font_size, index in font_specs:
+        try:
+            get_font_object(font_path, font_size, index)
+        except OSError as e:
+            logger.debug(f"Could not preload font {font_path}: {e}")
+
+
+def configure_font_cache(max_entries: int) -> None:
+    """Set the maximum number of font objects kept in the cache."""
+    FONT_CACHE.resize(max_entries)
+    logger.debug(f"Font cache size set to {max_entries}")
+
+
+def clear_font_cache() -> None:
+    """Invalidate all cached font objects, e.g. after the font index was rebuilt."""
+    FONT_CACHE.clear()
+
+
+def get_font_cache_stats() -> Dict[str, Any]:
+    """Get hit/miss statistics of the font object cache."""
+    return FONT_CACHE.stats()
+
+
 def validate_font_path(font_path: str) -> bool:
     """
     Validate that a font file exists and is readable.
 
     Args:
-        font_path: Path to the font file
+        font_path: Path to the font file, optionally with a face index
 
     Returns:
         True if the font file is valid, False otherwise
     """
     try:
-        path = Path(font_path)
+        path = Path(split_font_face_path(font_path)[0])
         if not path.exists() or not path.is_file():
             return False
 
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Server-side print history for Brother QL Web.
+
+Printed labels are recorded in an embedded SQLite database. Listing uses
+keyset (cursor) pagination over indexes, so a page costs the same whether
+the history holds a hundred or a million labels; texts are searched through
+a full-text index when SQLite provides FTS5. Old entries are removed by a
+retention policy (maximum age and number of entries) and the freed pages
+are returned to the file system.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Retention defaults: entries beyond either limit are deleted
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_AGE_DAYS = 365
+
+# Largest page returned by list()
+MAX_PAGE_SIZE = 200
+
+# Retention is applied after this many inserts, not after every one
+PRUNE_INTERVAL = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    job_id TEXT,
+    status TEXT NOT NULL,
+    label_size TEXT NOT NULL,
+    text TEXT NOT NULL,
+    font_family TEXT,
+    font_size INTEGER,
+    error TEXT,
+    params TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_created ON history (created_at, id);
+CREATE INDEX IF NOT EXISTS history_label_size ON history (label_size, created_at, id);
+CREATE INDEX IF NOT EXISTS history_status ON history (status, created_at, id);
+CREATE INDEX IF NOT EXISTS history_job ON history (job_id);
+CREATE INDEX IF NOT EXISTS history_text ON history (text COLLATE NOCASE);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_search USING fts5(text, content='history', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS history_search_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_search (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS history_search_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_search (history_search, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+COLUMNS = ('id', 'created_at', 'job_id', 'status', 'label_size', 'text', 'font_family',
+           'font_size', 'error', 'params')
+
+
+def encode_cursor(created_at: float, entry_id: int) -> str:
+    """Encode the position after an entry as an opaque cursor."""
+    return f'{created_at!r}:{entry_id}'
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a cursor from encode_cursor(), raising ValueError if it is malformed."""
+    created_at, _, entry_id = cursor.partition(':')
+    return float(created_at), int(entry_id)
+
+
+class HistoryStore:
+    """
+    Print history in an SQLite database.
+
+    A single connection is shared by all threads and serialized by a lock;
+    the database runs in WAL mode, so several server processes can use the
+    same file.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10,
+                                     isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            # Only takes effect on a new database, before the first table is created
+            self._conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.execute('PRAGMA synchronous = NORMAL')
+            self._conn.executescript(SCHEMA)
+            try:
+                self._conn.executescript(FTS_SCHEMA)
+                self.full_text_search = True
+            except sqlite3.OperationalError as e:
+                logger.info(f'SQLite without FTS5 ({e}), searching the history without full-text index')
+                self.full_text_search = False
+        self.prune()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def add(self, params: Dict[str, Any], label_size: str, text: str, font_family: Optional[str] = None,
+            font_size: Optional[int] = None, job_id: Optional[str] = None, status: str = 'queued',
+            error: Optional[str] = None) -> int:
+        """
+        Record a printed label.
+
+        Args:
+            params: Label parameters, used to print the label again
+            label_size: Label size of the label
+            text: Text of the label
+            font_family: Font family and style as shown to the user
+            font_size: Font size
+            job_id: Id of the print job that prints the label
+            status: Status of the print job
+            error: Error message of a failed job
+
+        Returns:
+            The id of the new entry
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO history (created_at, job_id, status, label_size, text, font_family, font_size, '
+                'error, params) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (time.time(), job_id, status, label_size, text, font_family, font_size, error,
+                 json.dumps(params, ensure_ascii=False, default=str)))
+            entry_id = cursor.lastrowid
+            self._inserts += 1
+            prune = self._inserts % PRUNE_INTERVAL == 0
+        if prune:
+            self.prune()
+        return entry_id
+
+    def update_job(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        """Update the status of all labels printed by a job."""
+        with self._lock:
+            self._conn.execute('UPDATE history SET status = ?, error = ? WHERE job_id = ?',
+                               (status, error, job_id))
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        """Get an entry by its id."""
+        with self._lock:
+            row = self._conn.execute(f'SELECT {", ".join(COLUMNS)} FROM history WHERE id = ?',
+                                     (entry_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list(self, limit: int = 50, cursor: Optional[str] = None, search: str = '',
+             label_size: Optional[str] = None, status: Optional[str] = None,
+             since: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of entries, newest first.
+
+        Args:
+            limit: Maximum number of entries (at most MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page, None for the first page
+            search: Only entries whose text contains all words (word prefixes
+                with the full-text index, substrings without it)
+            label_size: Only entries of this label size
+            status: Only entries with this job status
+            since: Only entries created at or after this Unix time
+
+        Returns:
+            Tuple of (entries, cursor of the next page or None on the last page)
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        conditions: List[str] = []
+        args: List[Any] = []
+
+        if cursor:
+            conditions.append('(created_at, id) < (?, ?)')
+            args.extend(decode_cursor(cursor))
+        if label_size:
+            conditions.append('label_size = ?')
+            args.append(label_size)
+        if status:
+            conditions.append('status = ?')
+            args.append(status)
+        if since is not None:
+            conditions.append('created_at >= ?')
+            args.append(float(since))
+
+        words = search.split()
+        if words and self.full_text_search:
+            # Every word as a quoted prefix query, so user input is never parsed as FTS syntax
+            query = ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+            conditions.append('id IN (SELECT rowid FROM history_search WHERE history_search MATCH ?)')
+            args.append(query)
+        else:
+            for word in words:
+                conditions.append("text LIKE ? ESCAPE '\\'")
+                args.append('%' + word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {", ".join(COLUMNS)} FROM history {where} '
+                f'ORDER BY created_at DESC, id DESC LIMIT ?', args + [limit + 1]).fetchall()
+
+        entries = [self._row_to_dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(entries[-1]['created_at'], entries[-1]['id'])
+        return entries, next_cursor
+
+    def stats(self, since: Optional[float] = None) -> Dict[str, int]:
+        """Count all entries and those per status, optionally only since a Unix time."""
+        where, args = ('WHERE created_at >= ?', [float(since)]) if since is not None else ('', [])
+        with self._lock:
+            rows = self._conn.execute(f'SELECT status, COUNT(*) FROM history {where} GROUP BY status',
+                                      args).fetchall()
+        counts = {status: count for status, count in rows}
+        counts['total'] = sum(count for _, count in rows)
+        return counts
+
+    def clear(self) -> None:
+        """Delete all entries."""
+        with self._lock:
+            self._conn.execute('DELETE FROM history')
+            self._conn.execute('PRAGMA incremental_vacuum')
+
+    def prune(self) -> int:
+        """
+        Apply the retention policy and return the freed pages to the file system.
+
+        Returns:
+            The number of deleted entries
+        """
+        deleted = 0
+        with self._lock:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                deleted += self._conn.execute('DELETE FROM history WHERE created_at < ?', (cutoff,)).rowcount
+            if self.max_entries:
+                deleted += self._conn.execute(
+                    'DELETE FROM history WHERE id IN (SELECT id FROM history '
+                    'ORDER BY created_at DESC, id DESC LIMIT -1 OFFSET ?)', (self.max_entries,)).rowcount
+            if deleted:
+                self._conn.execute('PRAGMA incremental_vacuum')
+        if deleted:
+            logger.debug(f'Removed {deleted} entries from the print history')
+        return deleted
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        entry = dict(zip(COLUMNS, row))
+        entry['params'] = json.loads(entry['params'])
+        return entry
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Streaming mail-merge printing for Brother QL Web.
+
+Rows of a CSV or JSONL file are filled into a label template one at a time,
+rendered, and sent to the print queue in chunks while later rows are still
+being rendered, so large files never have to be held in memory.
+"""
+
+import csv
+import json
+import logging
+import os
+import string
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Merge states
+MERGE_RUNNING = 'running'
+MERGE_DONE = 'done'
+MERGE_FAILED = 'failed'
+
+# Template fields in which {placeholders} are replaced by row values
+MERGE_FIELDS = ('text', 'qr_data')
+
+# Number of labels per print job
+DEFAULT_CHUNK_SIZE = 50
+
+# Number of print jobs that may wait in the print queue at the same time
+MAX_CHUNKS_IN_FLIGHT = 2
+
+# Number of row errors kept in the merge report
+MAX_REPORTED_ERRORS = 100
+
+
+class PrintFailed(RuntimeError):
+    """Raised when a print job of a merge failed."""
+
+
+def guess_format(filename: str) -> str:
+    """Guess the row file format from its file name."""
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def iter_rows(path: str, file_format: str, start_row: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Read rows from a CSV (with header line) or JSONL file one at a time.
+
+    Args:
+        path: Path of the row file
+        file_format: 'csv' or 'jsonl'
+        start_row: Number of rows to skip, e.g. when resuming a merge
+
+    Yields:
+        Tuples of (row number, row), counting rows from 0
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as fh:
+        if file_format == 'csv':
+            rows: Iterator[Any] = csv.DictReader(fh)
+        elif file_format == 'jsonl':
+            rows = (json.loads(line) for line in fh if line.strip())
+        else:
+            raise ValueError(f'Unsupported file format: {file_format}')
+
+        for row_number, row in enumerate(rows):
+            if row_number < start_row:
+                continue
+            if not isinstance(row, dict):
+                raise ValueError(f'Row {row_number} is not an object')
+            yield row_number, row
+
+
+def fill_template(template: Dict[str, Any], row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace {placeholders} in the text and QR data of a template with row values.
+
+    Raises:
+        ValueError: If a placeholder has no matching column in the row
+    """
+    formatter = string.Formatter()
+    label = dict(template)
+    # Short CSV lines yield None for the missing columns
+    values = {key: value for key, value in row.items() if value is not None}
+
+    def fill(value: str) -> str:
+        try:
+            return formatter.vformat(value, (), values)
+        except KeyError as e:
+            raise ValueError(f'Missing column {e} for placeholder')
+        except (IndexError, ValueError) as e:
+            raise ValueError(f'Invalid placeholder in "{value}": {e}')
+
+    for field in MERGE_FIELDS:
+        value = label.get(field)
+        if isinstance(value, list):
+            label[field] = [fill(str(line)) for line in value]
+        elif isinstance(value, str):
+            label[field] = fill(value)
+
+    return label
+
+
+class MergeJob:
+    """
+    A mail-merge run printing one label per row of a file.
+
+    The caller provides three functions:
+        render(label, is_last) -> rendered label, or a future of it; raising
+                                  (or failing the future) for invalid rows. If
+                                  the last rows fail, the last label rendered
+                                  is rendered again with is_last=True.
+        rasterize(rendered_labels) -> raster bytes for one print job
+        submit(data, labels) -> print job with a `finished` event and an `error`
+    """
+
+    def __init__(self, source_path: str, file_format: str, template: Dict[str, Any],
+                 start_row: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.id = uuid.uuid4().hex
+        self.source_path = source_path
+        self.file_format = file_format
+        self.template = template
+        self.first_row = start_row
+        self.start_row = start_row
+        self.chunk_size = max(1, chunk_size)
+
+        self.status = MERGE_RUNNING
+        self.error: Optional[str] = None
+        self.errors: List[Dict[str, Any]] = []
+        self.rows_read = 0
+        self.rows_failed = 0
+        self.labels_rendered = 0
+        self.labels_printed = 0
+        self.next_row = start_row
+        # Rows after next_row that were printed by jobs queued behind a failed one
+        self.printed_ahead: Set[int] = set()
+        self.print_jobs: List[str] = []
+        self.run_rows = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (MERGE_DONE, MERGE_FAILED)
+
+    def start(self, render: Callable, rasterize: Callable, submit: Callable) -> None:
+        """Run the merge in a background thread."""
+        self.status = MERGE_RUNNING
+        self._thread = threading.Thread(target=self.run, args=(render, rasterize, submit),
+                                        name=f'merge-{self.id[:8]}', daemon=True)
+        self._thread.start()
+
+    def run(self, render: Callable, rasterize: Callable, submit: Callable) -> None:
+        """Render, rasterize and queue all rows, stopping at the first failed print job."""
+        self.started_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self.run_rows = 0
+
+        # Print jobs waiting in the queue: (job, row numbers of its labels)
+        in_flight: List[Tuple[Any, List[int]]] = []
+        # Rows of the next print job: (row number, label, rendered label or future)
+        chunk: List[Tuple[int, Dict[str, Any], Any]] = []
+        # The last rendered label, held back for the next print job: (row number, label, rendered label)
+        held: Optional[Tuple[int, Dict[str, Any], Any]] = None
+        last_row = self.start_row - 1
+
+        def flush(final: bool = False) -> None:
+            nonlocal chunk, held
+            rendered = [held] if held else []
+            for row_number, label, item in chunk:
+                try:
+                    rendered.append((row_number, label, item.result() if isinstance(item, Future) else item))
+                    self.labels_rendered += 1
+                except Exception as e:
+                    self.report_error(row_number, e)
+            chunk = []
+            held = None
+
+            if not final:
+                # The last rendered label waits for the next print job, so the
+                # final job always has a label that can take the last cut
+                if rendered:
+                    held = rendered.pop()
+            elif rendered and rendered[-1][0] != last_row:
+                # The rows after it failed, so it was rendered as if it was not the last one
+                row_number, label, _ = rendered[-1]
+                try:
+                    item = render(label, True)
+                    rendered[-1] = (row_number, label, item.result() if isinstance(item, Future) else item)
+                except Exception as e:
+                    logger.warning(f'Mail merge {self.id} could not render row {row_number} as the last label: {e}')
+
+            if rendered:
+                job = submit(rasterize([item for _, _, item in rendered]), len(rendered))
+                self.print_jobs.append(job.id)
+                in_flight.append((job, [row_number for row_number, _, _ in rendered]))
+
+        def wait_for_jobs(max_in_flight: int) -> None:
+            # Limits memory use and notices printer failures early
+            while len(in_flight) > max_in_flight:
+                job, job_rows = in_flight.pop(0)
+                job.finished.wait()
+                if job.error:
+                    self.next_row = job_rows[0]
+                    raise PrintFailed(f'Printing rows {job_rows[0]}-{job_rows[-1]} failed: {job.error}')
+                self.labels_printed += len(job_rows)
+                self.next_row = job_rows[-1] + 1
+
+        def drain() -> None:
+            # Jobs queued behind a failed one cannot be taken back from the print
+            # queue, so wait for them and skip the rows they printed on resume
+            for job, job_rows in in_flight:
+                job.finished.wait()
+                if not job.error:
+                    self.labels_printed += len(job_rows)
+                    self.printed_ahead.update(job_rows)
+            in_flight.clear()
+
+        try:
+            # Look one row ahead, so the renderer knows which label is the last one
+            rows = iter_rows(self.source_path, self.file_format, self.start_row)
+            next_item = next(rows, None)
+            while next_item is not None:
+                row_number, row = next_item
+                next_item = next(rows, None)
+                last_row = row_number
+                if row_number in self.printed_ahead:
+                    continue
+                self.rows_read += 1
+                self.run_rows += 1
+
+                try:
+                    label = fill_template(self.template, row)
+                    chunk.append((row_number, label, render(label, next_item is None)))
+                except Exception as e:
+                    self.report_error(row_number, e)
+
+                if len(chunk) + (held is not None) > self.chunk_size:
+                    flush()
+                    wait_for_jobs(MAX_CHUNKS_IN_FLIGHT)
+
+            if chunk or held:
+                flush(final=True)
+            wait_for_jobs(0)
+            self.next_row = last_row + 1
+            self.printed_ahead.clear()
+            self.status = MERGE_DONE
+        except PrintFailed as e:
+            drain()
+            self.status = MERGE_FAILED
+            self.error = str(e)
+            logger.warning(f'Mail merge {self.id} failed: {e}')
+        except Exception as e:
+            # Rows that were already queued still print, account for them
+            try:
+                wait_for_jobs(0)
+            except PrintFailed:
+                drain()
+            self.status = MERGE_FAILED
+            self.error = str(e)
+            logger.warning(f'Mail merge {self.id} failed: {e}')
+        finally:
+            self.finished_at = time.time()
+
+        if self.status == MERGE_DONE:
+            self.remove_source()
+
+    def report_error(self, row_number: int, error: Exception) -> None:
+        """Record a row that could not be rendered."""
+        self.rows_failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': str(error)})
+
+    def resume(self, render: Callable, rasterize: Callable, submit: Callable) -> None:
+        """Restart a failed merge at the first row that was not printed."""
+        with self._lock:
+            if self.status != MERGE_FAILED:
+                raise ValueError('Only failed merges can be resumed')
+            if self._thread is not None and self._thread.is_alive():
+                # A failed merge still waits for its queued print jobs
+                raise ValueError('The merge has not stopped yet')
+            self.start_row = self.next_row
+            # Rows from the resume point on are read and rendered again, except
+            # those printed ahead, and every row before it was either printed or failed
+            self.printed_ahead = {row for row in self.printed_ahead if row >= self.start_row}
+            self.errors = [error for error in self.errors if error['row'] < self.start_row]
+            self.rows_read = self.start_row - self.first_row + len(self.printed_ahead)
+            self.labels_rendered = self.labels_printed
+            self.rows_failed = self.rows_read - self.labels_printed
+            self.start(render, rasterize, submit)
+
+    def remove_source(self) -> None:
+        """Delete the uploaded row file."""
+        try:
+            os.remove(self.source_path)
+        except OSError:
+            pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get progress and throughput as a JSON serializable dictionary."""
+        elapsed = None
+        rows_per_second = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            if elapsed > 0:
+                rows_per_second = self.run_rows / elapsed
+
+        merge_dict: Dict[str, Any] = {
+            'id': self.id,
+            'status': self.status,
+            'start_row': self.start_row,
+            'next_row': self.next_row,
+            'rows_read': self.rows_read,
+            'rows_failed': self.rows_failed,
+            'labels_rendered': self.labels_rendered,
+            'labels_printed': self.labels_printed,
+            'print_jobs': self.print_jobs,
+            'elapsed': elapsed,
+            'rows_per_second': rows_per_second,
+            'errors': self.errors,
+        }
+        if self.error:
+            merge_dict['error'] = self.error
+        return merge_dict
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Metrics for Brother QL Web in the Prometheus text format.
+
+Timings are only recorded once the metrics were requested: until the first
+scrape, a timed function costs a single attribute check. Values that are
+counted anyway, like cache statistics and queue lengths, are not recorded
+at all but read by collectors when the metrics are scraped.
+"""
+
+import bisect
+import functools
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds of the histogram buckets in seconds, from fast cache hits to slow prints
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Content type of the text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# A metric read by a collector: (name, type, help, [(labels, value), ...])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """Format labels as {name="value",...}, escaping the values."""
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value: float) -> str:
+    """Format a sample value, using the spellings of infinity Prometheus expects."""
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Counts of observed values in buckets, with their sum, per combination of label values."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [count per bucket..., count above the last bucket, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            values = sorted((labelvalues, list(entry)) for labelvalues, entry in self._values.items())
+        for labelvalues, entry in values:
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                bucket_labels = format_labels(dict(labels, le=format_value(bound)))
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(labels)} {format_value(entry[-1])}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    The metrics of the service and the collectors reading values at scrape time.
+
+    Recording is enabled by the first call of render(), so the metrics cost
+    next to nothing as long as nobody scrapes them.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics: List[Histogram] = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(histogram)
+        return histogram
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """Add a function returning metric families, called on every scrape."""
+        self._collectors.append(collector)
+
+    def timed(self, histogram: Histogram, *labelvalues: str) -> Callable:
+        """Decorator observing the duration of every call in histogram, while recording is enabled."""
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start, *labelvalues)
+            return wrapper
+        return decorator
+
+    def observe_since(self, histogram: Histogram, start: Optional[float], *labelvalues: str) -> None:
+        """Observe the time since start (from time.perf_counter()), unless recording was disabled at the start."""
+        if start is not None:
+            histogram.observe(time.perf_counter() - start, *labelvalues)
+
+    def start_timer(self) -> Optional[float]:
+        """Get the start time for observe_since(), None while recording is disabled."""
+        return time.perf_counter() if self.enabled else None
+
+    def render(self) -> str:
+        """Get all metrics in the text exposition format, enabling recording from now on."""
+        self.enabled = True
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
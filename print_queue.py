@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Background print queue for Brother QL Web.
+
+A single worker thread owns the printer connection and sends queued raster
+jobs to the device one after another, so HTTP requests never wait for the
+printer and concurrent requests cannot interleave their data.
+"""
+
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_PRINTING = 'printing'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Seconds a connection may stay unused before it is closed
+DEFAULT_IDLE_TIMEOUT = 30.0
+
+# Number of finished jobs kept for status queries
+DEFAULT_MAX_FINISHED_JOBS = 1000
+
+
+class PrintFailed(RuntimeError):
+    """Raised when sending a job failed after some of it may have reached the printer."""
+
+
+class PrintJob:
+    """A raster job waiting for or being sent to the printer."""
+
+    def __init__(self, data: bytes, info: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.data = data
+        self.size = len(data)
+        self.info = info or {}
+        self.status = JOB_QUEUED
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.finished = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the job state as a JSON serializable dictionary."""
+        job_dict: Dict[str, Any] = {
+            'id': self.id,
+            'status': self.status,
+            'bytes': self.size,
+            'attempts': self.attempts,
+            'queued_at': self.queued_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'wait_time': None,
+            'print_time': None,
+        }
+        job_dict.update(self.info)
+        if self.started_at is not None:
+            job_dict['wait_time'] = self.started_at - self.queued_at
+            if self.finished_at is not None:
+                job_dict['print_time'] = self.finished_at - self.started_at
+        if self.error:
+            job_dict['error'] = self.error
+        return job_dict
+
+
+class PrintQueue:
+    """
+    FIFO queue of print jobs processed by a dedicated worker thread.
+
+    The worker keeps the backend connection open between jobs and closes it
+    after idle_timeout seconds without work. A failed write is retried once
+    on a fresh connection before the job is marked as failed. Without a
+    backend_class, jobs are completed without sending anything (dry run).
+    on_finished is called in the worker thread with every finished job.
+    failover is called with a job that could not be printed and the error;
+    if it returns True, the job was handed over to another queue and is not
+    marked as failed.
+    """
+
+    def __init__(self, backend_class: Any, printer: str,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 max_finished_jobs: int = DEFAULT_MAX_FINISHED_JOBS,
+                 on_finished: Optional[Callable[[PrintJob], None]] = None,
+                 failover: Optional[Callable[[PrintJob, Exception], bool]] = None,
+                 name: str = 'print-worker'):
+        self.backend_class = backend_class
+        self.printer = printer
+        self.idle_timeout = idle_timeout
+        self.max_finished_jobs = max_finished_jobs
+        self.on_finished = on_finished
+        self.failover = failover
+        self.name = name
+
+        # Raster bytes of the queued jobs and the job being printed
+        self.pending_bytes = 0
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.jobs_handed_over = 0
+        self.bytes_printed = 0
+        # Seconds spent sending finished jobs to the printer
+        self.busy_time = 0.0
+
+        self._queue: 'queue.Queue[Optional[PrintJob]]' = queue.Queue()
+        self._jobs: 'OrderedDict[str, PrintJob]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Held while the worker uses the printer connection
+        self._backend_lock = threading.Lock()
+        self._backend: Any = None
+        self._thread: Optional[threading.Thread] = None
+        self.current_job: Optional[PrintJob] = None
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker after the queued jobs were processed."""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._disconnect()
+
+    def submit(self, data: bytes, **info: Any) -> PrintJob:
+        """
+        Queue raster data for printing.
+
+        Args:
+            data: Raster instruction bytes as created by BrotherQLRaster
+            info: Additional fields reported with the job status
+
+        Returns:
+            The queued job
+        """
+        job = PrintJob(data, info)
+        self.accept(job)
+        return job
+
+    def accept(self, job: PrintJob) -> None:
+        """Queue a job, e.g. one handed over by the queue of another printer."""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_jobs()
+            self.pending_bytes += job.size
+        self._queue.put(job)
+        self.start()
+
+    def get_job(self, job_id: str) -> Optional[PrintJob]:
+        """Get a queued, running or recently finished job by its id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, limit: int = 50) -> List[PrintJob]:
+        """Get the most recent jobs, newest first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))[:limit]
+
+    def probe(self) -> None:
+        """
+        Check that the printer can be reached, raising the backend error if not.
+
+        While a job is being sent or the worker holds an open connection, the
+        printer is known to be reachable and no second connection is opened.
+        """
+        if self.backend_class is None:
+            return
+        if not self._backend_lock.acquire(blocking=False):
+            return
+        try:
+            if self._backend is None:
+                self.backend_class(self.printer).dispose()
+        finally:
+            self._backend_lock.release()
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting to be printed."""
+        return self._queue.qsize()
+
+    @property
+    def busy(self) -> bool:
+        """Whether a job is being printed or waiting in the queue."""
+        return self.current_job is not None or not self._queue.empty()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the queue length and counters of the processed jobs."""
+        with self._lock:
+            return {
+                'queue_depth': self.depth,
+                'pending_bytes': self.pending_bytes,
+                'jobs_done': self.jobs_done,
+                'jobs_failed': self.jobs_failed,
+                'jobs_handed_over': self.jobs_handed_over,
+                'bytes_printed': self.bytes_printed,
+                'busy_time': self.busy_time,
+            }
+
+    def _prune_jobs(self) -> None:
+        """Forget the oldest finished jobs beyond max_finished_jobs."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def _run(self) -> None:
+        while True:
+            try:
+                job = self._queue.get(timeout=self.idle_timeout if self._backend else None)
+            except queue.Empty:
+                logger.debug('Print queue idle, closing printer connection')
+                with self._backend_lock:
+                    self._disconnect()
+                continue
+
+            if job is None:
+                break
+
+            self.current_job = job
+            try:
+                with self._backend_lock:
+                    self._process(job)
+            finally:
+                self.current_job = None
+                self._queue.task_done()
+
+    def _process(self, job: PrintJob) -> None:
+        job.status = JOB_PRINTING
+        job.started_at = time.time()
+
+        error: Optional[Exception] = None
+        try:
+            self._write(job)
+        except Exception as e:
+            error = e
+            logger.warning(f'Printer communication failed for job {job.id}: {e}')
+        finished_at = time.time()
+        with self._lock:
+            self.pending_bytes -= job.size
+            self.busy_time += finished_at - job.started_at
+
+        # Part of a job that failed while being sent may have printed, so it is not sent again
+        if error is not None and not isinstance(error, PrintFailed) and self._hand_over(job, error):
+            return
+
+        job.finished_at = finished_at
+        with self._lock:
+            if error is None:
+                job.status = JOB_DONE
+                self.jobs_done += 1
+                self.bytes_printed += job.size
+            else:
+                job.status = JOB_FAILED
+                job.error = str(error)
+                self.jobs_failed += 1
+        # The raster data is not needed anymore once the job finished
+        job.data = b''
+        if self.on_finished is not None:
+            try:
+                self.on_finished(job)
+            except Exception as e:
+                logger.error(f'Finish callback failed for job {job.id}: {e}')
+        job.finished.set()
+
+    def _hand_over(self, job: PrintJob, error: Exception) -> bool:
+        """Offer a failed job to the failover callback, returning whether another queue took it."""
+        if self.failover is None:
+            return False
+        try:
+            handed_over = self.failover(job, error)
+        except Exception as e:
+            logger.error(f'Failover failed for job {job.id}: {e}')
+            return False
+        if handed_over:
+            with self._lock:
+                self.jobs_handed_over += 1
+        return handed_over
+
+    def _write(self, job: PrintJob) -> None:
+        """
+        Send the job to the printer, retrying once if the connection cannot be opened.
+
+        Raises:
+            PrintFailed: If writing failed, so part of the job may have been printed
+        """
+        if self.backend_class is None:
+            job.attempts += 1
+            return
+
+        for attempt in range(2):
+            job.attempts += 1
+            if self._backend is None:
+                try:
+                    self._connect()
+                except Exception as e:
+                    if attempt:
+                        raise
+                    logger.info(f'Opening the printer connection failed ({e}), retrying')
+                    continue
+            try:
+                self._backend.write(job.data)
+                return
+            except Exception as e:
+                self._disconnect()
+                # Sending the job again could print part of it twice
+                raise PrintFailed(f'Sending the job to the printer failed: {e}') from e
+
+    def _connect(self) -> None:
+        logger.debug(f'Opening printer connection to {self.printer}')
+        self._backend = self.backend_class(self.printer)
+
+    def _disconnect(self) -> None:
+        """Close the printer connection. Errors are logged, the connection is dropped anyway."""
+        if self._backend is None:
+            return
+        try:
+            self._backend.dispose()
+        except Exception as e:
+            logger.warning(f'Closing the printer connection failed: {e}')
+        finally:
+            self._backend = None
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Background printer status monitor for Brother QL Web.
+
+A single thread probes the printer on an interval and keeps the result, so
+status requests from any number of browser tabs are answered from memory
+instead of opening a connection to the device each. While a job is being
+printed the monitor does not probe: the result of the job tells whether the
+printer is reachable. When the printer is offline, the probes back off up
+to a maximum interval. Clients can wait for the next status change (long
+polling) instead of asking repeatedly.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds between probes while the printer is online
+DEFAULT_STATUS_INTERVAL = 30.0
+
+# Longest time between probes while the printer is offline
+DEFAULT_MAX_STATUS_INTERVAL = 300.0
+
+# Number of requests that may wait for a status change at the same time
+DEFAULT_MAX_WAITERS = 4
+
+
+class PrinterMonitor:
+    """
+    Printer reachability, probed by a background thread.
+
+    probe is called to check the printer and raises if it cannot be reached.
+    While is_busy returns True, probes are skipped. Results of print jobs are
+    reported with record_result(), so a print counts as a successful probe.
+    Monitors of several printers can share a condition, which is notified
+    when the status of any of them changes.
+    """
+
+    def __init__(self, probe: Callable[[], None], is_busy: Callable[[], bool] = lambda: False,
+                 interval: float = DEFAULT_STATUS_INTERVAL,
+                 max_interval: float = DEFAULT_MAX_STATUS_INTERVAL,
+                 max_waiters: int = DEFAULT_MAX_WAITERS,
+                 condition: Optional[threading.Condition] = None,
+                 name: str = 'printer-monitor'):
+        self.probe = probe
+        self.is_busy = is_busy
+        self.interval = interval
+        self.max_interval = max(interval, max_interval)
+
+        self.online: Optional[bool] = None
+        self.message = 'Printer status not checked yet'
+        self.checked_at: Optional[float] = None
+        self.changed_at = time.time()
+        # Incremented on every change of online or message
+        self.version = 0
+        self.failures = 0
+        self.probes = 0
+
+        self.name = name
+        self._condition = condition or threading.Condition()
+        self._waiters = threading.BoundedSemaphore(max(1, max_waiters))
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the monitor thread, e.g. again after the server process forked."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the monitor thread and release waiting requests."""
+        self._stopped = True
+        self._wakeup.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def check_now(self) -> None:
+        """Probe the printer as soon as possible instead of at the next interval."""
+        self._wakeup.set()
+
+    def record_result(self, online: bool, message: str) -> None:
+        """Store the result of a probe or print job, waking up waiting requests if it changed."""
+        with self._condition:
+            self.checked_at = time.time()
+            self.failures = 0 if online else self.failures + 1
+            if online != self.online or message != self.message:
+                self.online = online
+                self.message = message
+                self.changed_at = self.checked_at
+                self.version += 1
+                self._condition.notify_all()
+                logger.info(f'Printer status changed: {message}')
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the last known status and its age in seconds."""
+        self.start()
+        with self._condition:
+            now = time.time()
+            return {
+                'online': bool(self.online),
+                'message': self.message,
+                'checked_at': self.checked_at,
+                'age': now - self.checked_at if self.checked_at is not None else None,
+                'changed_at': self.changed_at,
+                'version': self.version,
+            }
+
+    def wait_for_change(self, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait until the status differs from version, at most timeout seconds.
+
+        Returns:
+            The status, or None if too many requests are waiting already; the
+            caller should then answer right away so request threads stay free
+        """
+        if not self._waiters.acquire(blocking=False):
+            return None
+        try:
+            self.start()
+            with self._condition:
+                self._condition.wait_for(lambda: self.version != version or self._stopped, timeout)
+        finally:
+            self._waiters.release()
+        return self.get_status()
+
+    def next_delay(self) -> float:
+        """Seconds until the next probe: the interval, doubled per failed probe up to max_interval."""
+        if not self.failures:
+            return self.interval
+        return min(self.interval * 2 ** min(self.failures, 16), self.max_interval)
+
+    def _run(self) -> None:
+        while not self._stopped:
+            if self.is_busy():
+                # The running job reports whether the printer is reachable
+                logger.debug('Printer busy, skipping status probe')
+            else:
+                self.probes += 1
+                try:
+                    self.probe()
+                    self.record_result(True, 'Printer is online and ready')
+                except Exception as e:
+                    self.record_result(False, f'Printer offline: {e}')
+                    logger.debug(f'Printer status check failed: {e}')
+
+            self._wakeup.wait(self.next_delay())
+            self._wakeup.clear()
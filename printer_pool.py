@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Printer pool for Brother QL Web.
+
+Every printer has its own print queue and status monitor, so several
+printers print at the same time. A print job is routed to the least busy
+printer that has its label size loaded and is of the model the raster data
+was created for; printers known to be offline are only used if no other
+printer matches. A job that a printer fails to print is handed over to
+another matching printer instead of failing.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from print_queue import PrintQueue, PrintJob, JOB_DONE, JOB_QUEUED, DEFAULT_IDLE_TIMEOUT
+from printer_monitor import (PrinterMonitor, DEFAULT_STATUS_INTERVAL, DEFAULT_MAX_STATUS_INTERVAL,
+                             DEFAULT_MAX_WAITERS)
+
+logger = logging.getLogger(__name__)
+
+
+class Printer:
+    """A printer of the pool with its print queue and status monitor."""
+
+    def __init__(self, name: str, model: str, backend: str, backend_class: Any,
+                 label_sizes: Optional[Sequence[str]] = None, dry_run: bool = False,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 status_interval: float = DEFAULT_STATUS_INTERVAL,
+                 max_status_interval: float = DEFAULT_MAX_STATUS_INTERVAL,
+                 condition: Optional[threading.Condition] = None,
+                 on_finished: Optional[Callable[[PrintJob], None]] = None,
+                 failover: Optional[Callable[[PrintJob, Exception], bool]] = None):
+        """
+        Args:
+            name: Name of the printer, reported with its jobs
+            model: Printer model the raster data must be created for
+            backend: brother_ql string descriptor of the printer
+            backend_class: brother_ql backend class, None if no backend is configured
+            label_sizes: Label sizes loaded in the printer, None for any
+            dry_run: Complete jobs without sending them to the printer
+        """
+        self.name = name
+        self.model = model
+        self.backend = backend
+        self.backend_class = backend_class
+        self.label_sizes = list(label_sizes) if label_sizes else None
+        self.dry_run = dry_run
+        # Order of the last job routed to this printer, to alternate between idle printers
+        self.last_assigned = 0
+
+        self.queue = PrintQueue(None if dry_run else backend_class, backend, idle_timeout=idle_timeout,
+                                on_finished=on_finished, failover=failover, name=f'print-worker-{name}')
+        self.monitor = PrinterMonitor(self.probe, is_busy=lambda: self.queue.busy,
+                                      interval=status_interval, max_interval=max_status_interval,
+                                      condition=condition, name=f'printer-monitor-{name}')
+
+    @property
+    def available(self) -> bool:
+        """Whether the printer is not known to be offline."""
+        return self.monitor.online is not False
+
+    @property
+    def reports_status(self) -> bool:
+        """Whether the results of print jobs tell if the printer is reachable."""
+        return self.backend_class is not None and not self.dry_run
+
+    def accepts(self, label_size: Optional[str], model: Optional[str] = None) -> bool:
+        """Whether the printer can print labels of label_size created for model."""
+        if model is not None and model != self.model:
+            return False
+        return self.label_sizes is None or label_size in self.label_sizes
+
+    def probe(self) -> None:
+        """Check that the printer can be reached, raising an exception if not."""
+        if self.backend_class is None:
+            raise RuntimeError('No printer backend configured')
+        # Goes through the print queue, so no second connection is opened while printing
+        self.queue.probe()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the configuration, status and queue statistics of the printer."""
+        printer_dict: Dict[str, Any] = {
+            'name': self.name,
+            'model': self.model,
+            'label_sizes': self.label_sizes,
+        }
+        printer_dict.update(self.monitor.get_status())
+        printer_dict.update(self.queue.stats())
+        return printer_dict
+
+
+class PrinterPool:
+    """
+    Printers sharing the print jobs.
+
+    on_finished is called in the worker thread of a printer with every
+    finished job. The status monitors of all printers share a condition,
+    so requests can wait for a status change of any printer.
+    """
+
+    def __init__(self, on_finished: Optional[Callable[[PrintJob], None]] = None,
+                 max_waiters: int = DEFAULT_MAX_WAITERS):
+        self.on_finished = on_finished
+        self.printers: List[Printer] = []
+        self._lock = threading.Lock()
+        self._assignments = 0
+        self._condition = threading.Condition()
+        self._waiters = threading.BoundedSemaphore(max(1, max_waiters))
+        self._stopped = False
+
+    def add(self, name: str, model: str, backend: str, backend_class: Any,
+            label_sizes: Optional[Sequence[str]] = None, **options: Any) -> Printer:
+        """
+        Add a printer to the pool.
+
+        Args:
+            options: Further arguments of Printer, e.g. dry_run or idle_timeout
+
+        Returns:
+            The new printer
+        """
+        if any(printer.name == name for printer in self.printers):
+            raise ValueError(f'Duplicate printer name: {name}')
+        printer = Printer(name, model, backend, backend_class, label_sizes, condition=self._condition,
+                          on_finished=lambda job: self._job_finished(printer, job),
+                          failover=lambda job, error: self._failover(printer, job, error), **options)
+        self.printers.append(printer)
+        return printer
+
+    def start(self) -> None:
+        """Start the print workers and status monitors of all printers."""
+        self._stopped = False
+        for printer in self.printers:
+            printer.queue.start()
+            printer.monitor.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop all printers after their queued jobs were processed."""
+        self._stopped = True
+        for printer in self.printers:
+            printer.monitor.stop(timeout)
+            printer.queue.stop(timeout)
+
+    def select(self, label_size: Optional[str], model: Optional[str] = None,
+               exclude: Sequence[str] = ()) -> Printer:
+        """
+        Get the printer a job should be sent to.
+
+        Among the printers accepting label_size and model, the one with the
+        fewest raster bytes waiting is chosen, preferring printers that are
+        not known to be offline. Idle printers take turns.
+
+        Raises:
+            LookupError: If no printer accepts the label size
+        """
+        printers = [printer for printer in self.printers
+                    if printer.name not in exclude and printer.accepts(label_size, model)]
+        if not printers:
+            if model is not None and any(printer.accepts(label_size) for printer in self.printers):
+                raise LookupError(f'No {model} printer has {label_size} labels loaded')
+            raise LookupError(f'No printer has {label_size} labels loaded')
+        printers = [printer for printer in printers if printer.available] or printers
+        return min(printers, key=lambda printer: (printer.queue.pending_bytes, printer.queue.depth,
+                                                  printer.last_assigned))
+
+    def model_for(self, label_size: str) -> str:
+        """Get the model to create the raster data of a label for, the first printer's if none accepts it."""
+        try:
+            return self.select(label_size).model
+        except LookupError:
+            return self.printers[0].model
+
+    def submit(self, data: bytes, label_size: Optional[str], model: Optional[str] = None,
+               **info: Any) -> PrintJob:
+        """
+        Queue raster data on the printer chosen by select().
+
+        Args:
+            data: Raster instruction bytes, created for model
+            label_size: Label size of the job
+            model: Model the raster data was created for, None if it suits any printer
+            info: Additional fields reported with the job status
+
+        Returns:
+            The queued job, whose printer field names the printer
+        """
+        with self._lock:
+            printer = self.select(label_size, model)
+            job = PrintJob(data, dict(info, label_size=label_size, printer=printer.name))
+            self._assign(printer, job)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[PrintJob]:
+        """Get a queued, running or recently finished job of any printer."""
+        for printer in self.printers:
+            job = printer.queue.get_job(job_id)
+            if job is not None:
+                return job
+        return None
+
+    def list_jobs(self, limit: int = 50) -> List[PrintJob]:
+        """Get the most recent jobs of all printers, newest first."""
+        jobs: Dict[str, PrintJob] = {}
+        for printer in self.printers:
+            for job in printer.queue.list_jobs(limit):
+                # A job handed over is known to both queues
+                jobs[job.id] = job
+        return sorted(jobs.values(), key=lambda job: job.queued_at, reverse=True)[:limit]
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting to be printed on all printers."""
+        return sum(printer.queue.depth for printer in self.printers)
+
+    @property
+    def version(self) -> int:
+        """Sum of the status versions of all printers, changes with the status of any printer."""
+        return sum(printer.monitor.version for printer in self.printers)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the combined status of the printers.
+
+        The pool is online if any printer is. With a single printer, the
+        message is that printer's; checked_at and age are those of the least
+        recently checked printer.
+        """
+        printers = [printer.to_dict() for printer in self.printers]
+        online = [printer for printer in printers if printer['online']]
+        checked = [printer['checked_at'] for printer in printers if printer['checked_at'] is not None]
+        checked_at = min(checked) if checked and len(checked) == len(printers) else None
+        if len(printers) == 1:
+            message = printers[0]['message']
+        else:
+            message = f'{len(online)} of {len(printers)} printers online'
+        return {
+            'online': bool(online),
+            'message': message,
+            'checked_at': checked_at,
+            'age': time.time() - checked_at if checked_at is not None else None,
+            'changed_at': max(printer['changed_at'] for printer in printers),
+            'version': sum(printer['version'] for printer in printers),
+            'printers': printers,
+        }
+
+    def wait_for_change(self, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait until the status version differs from version, at most timeout seconds.
+
+        Returns:
+            The status, or None if too many requests are waiting already; the
+            caller should then answer right away so request threads stay free
+        """
+        if not self._waiters.acquire(blocking=False):
+            return None
+        try:
+            with self._condition:
+                self._condition.wait_for(lambda: self.version != version or self._stopped, timeout)
+        finally:
+            self._waiters.release()
+        return self.get_status()
+
+    def _assign(self, printer: Printer, job: PrintJob) -> None:
+        """Queue a job on a printer. Needs the lock."""
+        self._assignments += 1
+        printer.last_assigned = self._assignments
+        printer.queue.accept(job)
+
+    def _job_finished(self, printer: Printer, job: PrintJob) -> None:
+        # A job that reached the printer is as good as a status probe
+        if printer.reports_status:
+            if job.status == JOB_DONE:
+                printer.monitor.record_result(True, 'Printer is online and ready')
+            else:
+                printer.monitor.record_result(False, f'Printer offline: {job.error}')
+        if self.on_finished is not None:
+            self.on_finished(job)
+
+    def _failover(self, printer: Printer, job: PrintJob, error: Exception) -> bool:
+        """Hand a job the printer failed to print over to another printer, if one matches."""
+        if printer.reports_status:
+            printer.monitor.record_result(False, f'Printer offline: {error}')
+
+        failed_printers = job.info.setdefault('failed_printers', [])
+        failed_printers.append(printer.name)
+        with self._lock:
+            try:
+                # The raster data was created for the model of the failed printer
+                target = self.select(job.info.get('label_size'), printer.model, exclude=failed_printers)
+            except LookupError:
+                return False
+            if not target.available:
+                return False
+            job.status = JOB_QUEUED
+            job.started_at = None
+            job.info['printer'] = target.name
+            self._assign(target, job)
+
+        logger.warning(f'Printer {printer.name} failed to print job {job.id}, handed it over to {target.name}')
+        return True
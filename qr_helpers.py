@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+QR code generation for Brother QL Web.
+
+Encoding data into a QR code (choosing the version, placing the modules and
+picking the best mask) is the expensive part, so the module matrix is
+cached by data, error correction and version. Labels then scale the cached
+matrix straight to printer dots with a nearest-neighbour resize instead of
+going through qrcode's PIL image factory for every preview.
+"""
+
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from cache_helpers import LRUCache
+
+try:
+    import qrcode
+    import qrcode.constants
+    import qrcode.exceptions
+    QR_AVAILABLE = True
+except ImportError:
+    qrcode = None  # type: ignore
+    QR_AVAILABLE = False
+
+# Error correction levels, from the densest code (L, 7% of the code may be
+# damaged) to the most robust one (H, 30%)
+QR_ERROR_CORRECTIONS = ('L', 'M', 'Q', 'H')
+
+# Largest QR code version (177x177 modules)
+MAX_QR_VERSION = 40
+
+# Encoded QR codes, keyed by (data, error correction, version)
+QR_MATRIX_CACHE = LRUCache(max_entries=256)
+
+# Matrix values of dark and light modules, as gray levels
+DARK_MODULE = 0
+LIGHT_MODULE = 255
+
+
+def parse_qr_version(version: Optional[str]) -> Optional[int]:
+    """
+    Parse a QR code version parameter.
+
+    Args:
+        version: Version from 1 to MAX_QR_VERSION, or '', None or 'auto' for
+            the smallest version holding the data
+
+    Returns:
+        The version, or None for automatic
+
+    Raises:
+        ValueError: If the version is not a number or out of range
+    """
+    if version in (None, '', 'auto'):
+        return None
+    try:
+        value = int(version)  # type: ignore
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid QR code version: {version}')
+    if not 1 <= value <= MAX_QR_VERSION:
+        raise ValueError(f'QR code version must be between 1 and {MAX_QR_VERSION}')
+    return value
+
+
+def get_qr_matrix(data: str, error_correction: str = 'L', version: Optional[int] = None) -> Tuple[int, bytes]:
+    """
+    Get the module matrix of a QR code, encoding the data only on a cache miss.
+
+    Args:
+        data: Data to encode
+        error_correction: One of QR_ERROR_CORRECTIONS
+        version: Minimum QR code version; a larger one is used if the data
+            does not fit. None picks the smallest version holding the data.
+
+    Returns:
+        Tuple of (number of modules per side, matrix as one byte per module,
+        row by row, DARK_MODULE or LIGHT_MODULE), without quiet zone
+
+    Raises:
+        ValueError: If the error correction is unknown, or the data does not
+            fit the largest QR code
+    """
+    if not QR_AVAILABLE:
+        raise RuntimeError('QR code generation not available. Install qrcode package.')
+    if error_correction not in QR_ERROR_CORRECTIONS:
+        raise ValueError(f'Unknown QR error correction: {error_correction}')
+
+    def encode() -> Tuple[int, bytes]:
+        qr = qrcode.QRCode(  # type: ignore
+            version=version,
+            error_correction=getattr(qrcode.constants, f'ERROR_CORRECT_{error_correction}'),  # type: ignore
+            border=0,
+        )
+        qr.add_data(data)
+        try:
+            qr.make(fit=True)
+        except (qrcode.exceptions.DataOverflowError, ValueError):  # type: ignore
+            # Depending on the qrcode version, fitting beyond version 40 raises either
+            raise ValueError(f'Data is too long for a QR code with error correction {error_correction}')
+        modules = qr.get_matrix()
+        matrix = bytes(DARK_MODULE if module else LIGHT_MODULE for row in modules for module in row)
+        return len(modules), matrix
+
+    return QR_MATRIX_CACHE.get_or_create((data, error_correction, version), encode)
+
+
+def render_qr_image(size: int, matrix: bytes, box_size: int, border: int, mode: str = 'L') -> Image.Image:
+    """
+    Scale a QR code matrix to an image with box_size pixels per module.
+
+    Args:
+        size: Number of modules per side
+        matrix: Matrix as returned by get_qr_matrix()
+        box_size: Pixels per module
+        border: Width of the quiet zone in modules
+        mode: Image mode of the result, e.g. 'L' or 'RGB'
+
+    Returns:
+        Black on white image of (size + 2 * border) * box_size pixels per side
+    """
+    im = Image.frombytes('L', (size, size), matrix)
+    im = ImageOps.expand(im, border, fill=LIGHT_MODULE)
+    # Scaling by a whole number, so every module becomes box_size x box_size dots
+    im = im.resize((im.size[0] * box_size, im.size[1] * box_size), Image.NEAREST)
+    return im if mode == 'L' else im.convert(mode)
+
+
+def make_qr_image(data: str, box_size: int, border: int, error_correction: str = 'L',
+                  version: Optional[int] = None, mode: str = 'L') -> Image.Image:
+    """Render data as a QR code image, see get_qr_matrix() and render_qr_image()."""
+    size, matrix = get_qr_matrix(data, error_correction, version)
+    return render_qr_image(size, matrix, box_size, border, mode)
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+NumPy rasterizer for Brother QL Web.
+
+Produces the same raster instructions as brother_ql.create_label, but does
+the thresholding, black/red separation, rotation and bit packing as array
+operations instead of per-pixel and per-row Python loops. Options the array
+path does not cover (dithering, 600 dpi, images that need resizing, unusual
+image modes) are passed on to brother_ql unchanged.
+
+raster_to_image() reads raster instructions back into the bitmap the printer
+prints, for previews that show exactly what will be printed.
+"""
+
+import logging
+from typing import Any, Union
+
+import packbits
+from PIL import Image
+
+from brother_ql import BrotherQLRaster, BrotherQLUnsupportedCmd, create_label
+from brother_ql.devicedependent import (label_type_specs, right_margin_addition,
+                                        ENDLESS_LABEL, DIE_CUT_LABEL, ROUND_DIE_CUT_LABEL)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None  # type: ignore
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Rasterizer names accepted by PRINTER.RASTERIZER
+RASTERIZERS = ('auto', 'numpy', 'brother_ql')
+
+
+def can_rasterize(im: Image.Image, label_size: str, **kwargs: Any) -> bool:
+    """Whether the NumPy path supports an image and the create_label options."""
+    if not NUMPY_AVAILABLE:
+        return False
+    if kwargs.get('dither') or kwargs.get('dpi_600'):
+        return False
+    if im.mode not in ('L', 'RGB'):
+        return False
+
+    rotate = kwargs.get('rotate', 'auto')
+    if rotate != 'auto' and int(rotate) % 90:
+        return False
+
+    # Endless labels of the wrong width are resized by brother_ql
+    label_specs = label_type_specs[label_size]
+    if label_specs['kind'] == ENDLESS_LABEL:
+        width = im.size[0]
+        if rotate != 'auto' and int(rotate) % 180:
+            width = im.size[1]
+        if width != label_specs['dots_printable'][0]:
+            return False
+    return True
+
+
+def rasterize_label_image(qlr: BrotherQLRaster, im: Image.Image, label_size: str,
+                          rasterizer: str = 'auto', **kwargs: Any) -> bytes:
+    """
+    Append the raster instructions for a label image to qlr.
+
+    Takes the same keyword arguments as brother_ql.create_label (cut, red,
+    rotate, threshold, dither, compress, dpi_600, hq).
+
+    Args:
+        qlr: Raster to append the instructions to
+        im: Label image as created by create_label_im
+        label_size: Label size identifier, e.g. '62' or '62x29'
+        rasterizer: 'numpy', 'brother_ql', or 'auto' to use NumPy when available
+
+    Returns:
+        The raster data of qlr
+    """
+    if rasterizer != 'brother_ql' and can_rasterize(im, label_size, **kwargs):
+        return _rasterize(qlr, im, label_size, **kwargs)
+    if rasterizer == 'numpy' and not NUMPY_AVAILABLE:
+        logger.warning('NumPy rasterizer requested but numpy is not installed')
+    create_label(qlr, im, label_size, **kwargs)
+    return qlr.data
+
+
+def threshold_value(threshold: float) -> int:
+    """Convert the threshold percentage the same way brother_ql does."""
+    threshold = 100.0 - threshold
+    return min(255, max(0, int(threshold / 100.0 * 255)))
+
+
+def _dot_planes(im: Image.Image, red: bool, threshold: int) -> list:
+    """
+    Get boolean arrays of the dots to print, the black plane first.
+
+    A dot is printed where the inverted gray value reaches the threshold.
+    On black/red tapes, saturated red hues go to the red plane and dark
+    pixels that are not red to the black plane.
+    """
+    if red and im.mode == 'L':
+        im = im.convert('RGB')
+
+    gray = np.asarray(im if im.mode == 'L' else im.convert('L'))
+    # Same as thresholding the inverted image: 255 - gray >= threshold
+    dark = gray <= 255 - threshold
+    if not red:
+        return [dark]
+
+    hsv = np.asarray(im.convert('HSV'))
+    hue, saturation, value = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    red_dots = dark & ((hue < 40) | (hue > 210)) & (saturation > 100) & (value > 80)
+    black_dots = dark & (value < 80) & ~red_dots
+    return [black_dots, red_dots]
+
+
+def _device_plane(plane: 'np.ndarray', width: int, x: int) -> 'np.ndarray':
+    """
+    Paste a plane at column x of an empty plane of the print head width,
+    clipping like Image.paste, and mirror it: the print head runs right to
+    left. Both happen in a single copy.
+    """
+    height = plane.shape[0]
+    placed = np.zeros((height, width), dtype=bool)
+    src_x0 = max(0, -x)
+    dst_x0 = max(0, x)
+    columns = min(plane.shape[1] - src_x0, width - dst_x0)
+    if columns > 0:
+        mirrored = plane[:, src_x0:src_x0 + columns][:, ::-1]
+        placed[:, width - dst_x0 - columns:width - dst_x0] = mirrored
+    return placed
+
+
+def _raster_lines(planes: list, compress: bool) -> bytes:
+    """Pack mirrored dot planes into raster line commands, like BrotherQLRaster.add_raster_data."""
+    packed = [np.packbits(plane, axis=1) for plane in planes]
+    rows, row_len = packed[0].shape
+
+    if len(planes) == 1:
+        prefixes = [b'\x67\x00']
+    else:
+        prefixes = [b'\x77\x01', b'\x77\x02']
+
+    if compress:
+        lines = []
+        for row in range(rows):
+            for prefix, frame in zip(prefixes, packed):
+                line = packbits.encode(frame[row].tobytes())
+                lines.append(prefix + bytes([len(line)]) + line)
+        return b''.join(lines)
+
+    # Without compression every line has the same length, so all lines are
+    # built as one (rows, planes, 3 + row_len) array
+    lines = np.empty((rows, len(planes), 3 + row_len), dtype=np.uint8)
+    for i, (prefix, frame) in enumerate(zip(prefixes, packed)):
+        lines[:, i, 0:2] = np.frombuffer(prefix, dtype=np.uint8)
+        lines[:, i, 2] = row_len & 0xFF
+        lines[:, i, 3:] = frame
+    return lines.tobytes()
+
+
+def _rasterize(qlr: BrotherQLRaster, im: Image.Image, label_size: str, **kwargs: Any) -> bytes:
+    label_specs = label_type_specs[label_size]
+    dots_printable = label_specs['dots_printable']
+    right_margin_dots = label_specs['right_margin_dots'] + right_margin_addition.get(qlr.model, 0)
+    device_pixel_width = qlr.get_pixel_width()
+
+    cut = kwargs.get('cut', True)
+    compress = kwargs.get('compress', False)
+    red = kwargs.get('red', False)
+    rotate: Union[int, str] = kwargs.get('rotate', 'auto')
+    if rotate != 'auto':
+        rotate = int(rotate)
+    hq = kwargs.get('hq', True)
+    threshold = threshold_value(kwargs.get('threshold', 70))
+
+    if red and not qlr.two_color_support:
+        raise BrotherQLUnsupportedCmd('Printing in red is not supported with the selected model.')
+
+    planes = _dot_planes(im, red, threshold)
+
+    # Rotation by multiples of 90 degrees, counter-clockwise like Image.rotate
+    height, width = planes[0].shape
+    if label_specs['kind'] == ENDLESS_LABEL:
+        turns = 0 if rotate == 'auto' else rotate // 90
+    elif label_specs['kind'] in (DIE_CUT_LABEL, ROUND_DIE_CUT_LABEL):
+        if rotate == 'auto':
+            turns = 1 if (width, height) == (dots_printable[1], dots_printable[0]) else 0
+        else:
+            turns = rotate // 90
+    else:
+        turns = 0
+    if turns % 4:
+        planes = [np.rot90(plane, turns) for plane in planes]
+        height, width = planes[0].shape
+
+    if label_specs['kind'] == ENDLESS_LABEL and width < device_pixel_width:
+        x = device_pixel_width - width - right_margin_dots
+    elif label_specs['kind'] in (DIE_CUT_LABEL, ROUND_DIE_CUT_LABEL):
+        if (width, height) != (dots_printable[0], dots_printable[1]):
+            raise ValueError('Bad image dimensions: %s. Expecting: %s.' % ((width, height), dots_printable))
+        x = device_pixel_width - width - right_margin_dots
+    elif width == device_pixel_width:
+        x = 0
+    else:
+        # Let brother_ql handle (or report) images it would fit differently
+        create_label(qlr, im, label_size, **kwargs)
+        return qlr.data
+    planes = [_device_plane(plane, device_pixel_width, x) for plane in planes]
+
+    # Same command sequence as brother_ql.create_label
+    try:
+        qlr.add_switch_mode()
+    except BrotherQLUnsupportedCmd:
+        pass
+    qlr.add_invalidate()
+    qlr.add_initialize()
+    try:
+        qlr.add_switch_mode()
+    except BrotherQLUnsupportedCmd:
+        pass
+
+    qlr.add_status_information()
+    tape_size = label_specs['tape_size']
+    if label_specs['kind'] in (DIE_CUT_LABEL, ROUND_DIE_CUT_LABEL):
+        qlr.mtype = 0x0B
+        qlr.mwidth = tape_size[0]
+        qlr.mlength = tape_size[1]
+    else:
+        qlr.mtype = 0x0A
+        qlr.mwidth = tape_size[0]
+        qlr.mlength = 0
+    qlr.pquality = int(hq)
+    qlr.add_media_and_quality(height)
+    try:
+        if cut:
+            qlr.add_autocut(True)
+            qlr.add_cut_every(1)
+    except BrotherQLUnsupportedCmd:
+        pass
+    try:
+        qlr.dpi_600 = False
+        qlr.cut_at_end = cut
+        qlr.two_color_printing = True if red else False
+        qlr.add_expanded_mode()
+    except BrotherQLUnsupportedCmd:
+        pass
+    qlr.add_margins(label_specs['feed_margin'])
+    try:
+        if compress:
+            qlr.add_compression(True)
+    except BrotherQLUnsupportedCmd:
+        pass
+    qlr.data += _raster_lines(planes, qlr._compression)
+    qlr.add_print()
+
+    return qlr.data
+
+
+# Lengths of the raster file commands before the raster lines, by opcode
+RASTER_COMMAND_LENGTHS = {
+    b'\x1b\x40': 2,              # initialize
+    b'\x1b\x69\x61': 4,          # switch mode
+    b'\x1b\x69\x53': 3,          # status information request
+    b'\x1b\x69\x7a': 13,         # media and quality
+    b'\x1b\x69\x4d': 4,          # autocut
+    b'\x1b\x69\x41': 4,          # cut every
+    b'\x1b\x69\x4b': 4,          # expanded mode
+    b'\x1b\x69\x64': 5,          # margins
+}
+
+# Swaps dots and blank bits, so dots become black pixels of a '1' image
+_INVERT_BITS = bytes(255 - value for value in range(256))
+
+
+def read_raster_lines(data: bytes) -> tuple:
+    """
+    Read the raster lines of the first page of raster instructions.
+
+    Returns:
+        Tuple of (black lines, red lines); red lines is empty for black-only data.
+        Lines are unpacked bytes with the first dot in the most significant bit.
+
+    Raises:
+        ValueError: On unknown commands
+    """
+    black_lines = []
+    red_lines = []
+    compression = False
+    row_len = 0
+    position = 0
+    while position < len(data):
+        byte = data[position]
+        if byte == 0x00:
+            position += 1
+        elif byte in (0x67, 0x77):
+            length = data[position + 2]
+            line = data[position + 3:position + 3 + length]
+            if compression:
+                line = packbits.decode(line)
+            row_len = len(line)
+            if byte == 0x67 or data[position + 1] == 0x01:
+                black_lines.append(line)
+            else:
+                red_lines.append(line)
+            position += 3 + length
+        elif byte == 0x5a:
+            # Empty raster line
+            black_lines.append(bytes(row_len))
+            position += 1
+        elif byte == 0x4d:
+            compression = bool(data[position + 1] & 0x02)
+            position += 2
+        elif byte in (0x0c, 0x1a):
+            break
+        else:
+            for opcode, length in RASTER_COMMAND_LENGTHS.items():
+                if data.startswith(opcode, position):
+                    position += length
+                    break
+            else:
+                raise ValueError(f'Unknown raster command at byte {position}: {data[position:position + 3].hex()}')
+    return black_lines, red_lines
+
+
+def raster_to_image(data: bytes) -> Image.Image:
+    """
+    Turn raster instructions back into the image the printer prints.
+
+    Black-only data gives a '1' image; black/red data a 'P' image with white,
+    black and red. The image spans the whole print head and is oriented like
+    the label image before rasterizing, except for the rotation.
+    """
+    black_lines, red_lines = read_raster_lines(data)
+    if not black_lines:
+        raise ValueError('No raster lines found')
+    size = (len(black_lines[0]) * 8, len(black_lines))
+
+    # Dots are sent mirrored, as the print head runs right to left
+    if not red_lines:
+        im = Image.frombytes('1', size, b''.join(black_lines).translate(_INVERT_BITS))
+        return im.transpose(Image.FLIP_LEFT_RIGHT)
+
+    im = Image.new('P', size, 0)
+    im.putpalette([255, 255, 255, 0, 0, 0, 255, 0, 0])
+    im.paste(1, mask=Image.frombytes('1', size, b''.join(black_lines)))
+    im.paste(2, mask=Image.frombytes('1', size, b''.join(red_lines)))
+    return im.transpose(Image.FLIP_LEFT_RIGHT)
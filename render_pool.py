@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Optional pool of worker processes for rendering and rasterizing labels.
+
+Rendering with PIL and rasterizing with brother_ql are CPU-bound, so running
+them in separate processes lets several labels be rendered in parallel
+instead of queueing behind the GIL.
+"""
+
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPool:
+    """
+    Runs render tasks in worker processes, or inline when workers is 0.
+
+    Tasks must be module-level functions taking picklable arguments. Both
+    modes return futures, so callers do not need to care which one is used.
+    """
+
+    def __init__(self, workers: int = 0, initializer: Optional[Callable] = None,
+                 initargs: Tuple[Any, ...] = ()):
+        self.workers = max(0, int(workers or 0))
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        if self.workers:
+            # Worker processes are started fresh instead of being forked from
+            # a process that already runs the print queue and server threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=initializer,
+                initargs=initargs,
+            )
+            logger.info(f"Started render pool with {self.workers} worker processes")
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None
+
+    def submit(self, fn: Callable, *args: Any) -> 'Future[Any]':
+        """Schedule fn(*args), returning a future with its result."""
+        if self._executor is not None:
+            return self._executor.submit(fn, *args)
+
+        future: 'Future[Any]' = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def run(self, fn: Callable, *args: Any) -> Any:
+        """Run fn(*args) and wait for its result."""
+        return self.submit(fn, *args).result()
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+WSGI server selection for Brother QL Web.
+
+Bottle's default wsgiref server handles one request at a time, so a slow
+printer write or a large preview blocks every other client. The servers
+offered here handle requests on several threads.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Tuple
+from wsgiref.simple_server import WSGIServer
+
+from bottle import WSGIRefServer
+
+logger = logging.getLogger(__name__)
+
+# Server used when none is configured
+DEFAULT_SERVER = 'threaded'
+
+# Request handler threads of the threaded servers
+DEFAULT_THREADS = 8
+
+# Servers selectable with --server; all but 'threaded' and 'wsgiref' need an extra package
+SERVER_CHOICES = ('threaded', 'wsgiref', 'waitress', 'cheroot', 'gunicorn')
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """wsgiref server handling each connection on a bounded pool of threads."""
+
+    threads = DEFAULT_THREADS
+
+    def server_activate(self) -> None:
+        super().server_activate()
+        self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='http')
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        pool = getattr(self, '_pool', None)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ThreadedWSGIRefServer(WSGIRefServer):
+    """Bottle adapter running the standard library server on a thread pool."""
+
+    def run(self, app: Any) -> None:  # pragma: no cover
+        threads = self.options.pop('threads', DEFAULT_THREADS)
+        self.options['server_class'] = type('ThreadPoolWSGIServer', (ThreadPoolWSGIServer,),
+                                            {'threads': threads})
+        super().run(app)
+
+
+def get_server_adapter(server: str, threads: int = DEFAULT_THREADS,
+                       workers: int = 1) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Get the bottle server adapter and its options for a server name.
+
+    Args:
+        server: One of SERVER_CHOICES
+        threads: Number of request handler threads, ignored by wsgiref
+        workers: Number of worker processes, only supported by gunicorn
+
+    Returns:
+        Tuple of (adapter passed to bottle's run(), keyword options for it)
+
+    Raises:
+        ValueError: If the server is unknown or does not support the settings
+    """
+    threads = max(1, threads)
+    workers = max(1, workers)
+
+    if server not in SERVER_CHOICES:
+        raise ValueError(f'Unknown server: {server}')
+    if workers > 1 and server != 'gunicorn':
+        raise ValueError('Multiple worker processes are only supported with --server gunicorn')
+
+    options: Dict[str, Any] = {}
+    adapter: Any = server
+    if server == 'threaded':
+        adapter = ThreadedWSGIRefServer
+        options['threads'] = threads
+    elif server == 'waitress':
+        options['threads'] = threads
+    elif server == 'cheroot':
+        options['numthreads'] = threads
+    elif server == 'gunicorn':
+        options['workers'] = workers
+        options['threads'] = threads
+        options['worker_class'] = 'gthread'
+        if workers > 1:
+            # Each process has its own print queue and caches
+            logger.warning('Running several worker processes: their print queues may write to '
+                           'the printer at the same time. Prefer one worker with several threads.')
+
+    return adapter, options
+
+
+def describe_server(server: str, threads: int, workers: int) -> str:
+    """Describe the server settings for the startup log."""
+    if server == 'wsgiref':
+        return 'wsgiref (single-threaded)'
+    if server == 'gunicorn':
+        return f'gunicorn ({workers} workers x {threads} threads)'
+    return f'{server} ({threads} threads)'
+
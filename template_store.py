@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Saved label templates for Brother QL Web.
+
+Templates are JSON files in a folder. The store keeps them in an in-memory
+index that is only refreshed when the folder's modification time changes,
+which happens whenever a template is added, replaced or deleted. A refresh
+stats the files and only parses those whose size or modification time
+changed, so listing templates does not read thousands of files per request.
+Templates are written to a temporary file that is then renamed, so readers
+never see a partially written template.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Orders accepted by TemplateStore.list()
+TEMPLATE_SORT_ORDERS = ('recent', 'name', 'created', 'size')
+
+# Folder modification times within this many seconds of a scan are not
+# trusted, as a change in the same timestamp tick would go unnoticed
+MTIME_RESOLUTION = 2.0
+
+
+def get_umask() -> int:
+    """Get the file mode creation mask of the process."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Mode of new template files, as open() creates files. Read once, as reading
+# the umask briefly changes it for all threads.
+NEW_FILE_MODE = 0o666 & ~get_umask()
+
+
+def template_id(name: str) -> str:
+    """
+    Get the id of a template, which is also its file name without .json.
+
+    Raises:
+        ValueError: If the name is empty or would leave the templates folder
+    """
+    template_name = name.replace(' ', '_').lower()
+    if not template_name or template_name.startswith('.') or '/' in template_name or '\\' in template_name:
+        raise ValueError(f'Invalid template name: {name!r}')
+    return template_name
+
+
+def _sort_key(order: str) -> Callable[[Dict[str, Any]], Any]:
+    if order == 'name':
+        return lambda template: str(template.get('name', '')).lower()
+    if order == 'size':
+        return lambda template: str(template.get('label_size', ''))
+    if order == 'created':
+        return lambda template: str(template.get('created') or '')
+    return lambda template: str(template.get('lastUsed') or template.get('created') or '')
+
+
+class TemplateStore:
+    """Label templates stored as JSON files in a folder, with an in-memory index."""
+
+    def __init__(self, folder: str):
+        self.folder = Path(folder)
+        self._lock = threading.Lock()
+        # Folder modification time the index was built from, None to rescan
+        self._folder_mtime: Optional[int] = None
+        # Template id -> (size, mtime_ns, template)
+        self._entries: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+        # Templates sorted by each order of TEMPLATE_SORT_ORDERS, built on first use
+        self._sorted: Dict[str, List[Dict[str, Any]]] = {}
+        self.etag = ''
+        self.scans = 0
+
+    def _refresh(self) -> None:
+        """Update the index if the folder changed since the last scan. Needs the lock."""
+        try:
+            folder_mtime = self.folder.stat().st_mtime_ns
+        except FileNotFoundError:
+            folder_mtime = -1
+        if folder_mtime == self._folder_mtime:
+            return
+
+        self.scans += 1
+        scan_time = time.time_ns()
+        entries: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+        if folder_mtime >= 0:
+            with os.scandir(self.folder) as it:
+                for dir_entry in it:
+                    if not dir_entry.name.endswith('.json') or dir_entry.name.startswith('.'):
+                        continue
+                    entry_id = dir_entry.name[:-len('.json')]
+                    try:
+                        stat = dir_entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    cached = self._entries.get(entry_id)
+                    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                        entries[entry_id] = cached
+                        continue
+                    try:
+                        with open(dir_entry.path, 'r', encoding='utf-8') as f:
+                            template = json.load(f)
+                        if not isinstance(template, dict):
+                            raise ValueError('not an object')
+                    except FileNotFoundError:
+                        continue
+                    except (OSError, ValueError) as e:
+                        logger.warning(f'Failed to load template {dir_entry.name}: {e}')
+                        continue
+                    template['id'] = entry_id
+                    entries[entry_id] = (stat.st_size, stat.st_mtime_ns, template)
+
+        self._entries = entries
+        self._sorted = {}
+        fingerprint = hashlib.sha1()
+        for entry_id in sorted(entries):
+            fingerprint.update(f'{entry_id}:{entries[entry_id][0]}:{entries[entry_id][1]};'.encode())
+        self.etag = fingerprint.hexdigest()[:16]
+        # A change right after a scan may not move the folder time, so check again next time
+        recent = scan_time - folder_mtime < MTIME_RESOLUTION * 1e9
+        self._folder_mtime = None if recent else folder_mtime
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Get a template by its name or id."""
+        entry_id = template_id(name)
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(entry_id)
+        return entry[2] if entry else None
+
+    def list(self, offset: int = 0, limit: Optional[int] = None, search: str = '',
+             category: str = '', order: str = 'recent') -> Tuple[List[Dict[str, Any]], int, str]:
+        """
+        Get a page of templates.
+
+        Args:
+            offset: Number of templates to skip
+            limit: Maximum number of templates, None for all
+            search: Only templates whose name or description contains this text
+            category: Only templates of this category
+            order: One of TEMPLATE_SORT_ORDERS
+
+        Returns:
+            Tuple of (templates, number of matching templates, ETag of the index)
+        """
+        if order not in TEMPLATE_SORT_ORDERS:
+            raise ValueError(f'Unknown sort order: {order}')
+        with self._lock:
+            self._refresh()
+            templates = self._sorted.get(order)
+            if templates is None:
+                # Newest first, except for the name and size orders
+                templates = sorted((entry[2] for entry in self._entries.values()), key=_sort_key(order),
+                                   reverse=order in ('recent', 'created'))
+                self._sorted[order] = templates
+            etag = self.etag
+
+        search = search.lower()
+        if search or category:
+            templates = [
+                template for template in templates
+                if (not category or template.get('category') == category)
+                and (not search or search in str(template.get('name', '')).lower()
+                     or search in str(template.get('description') or '').lower())
+            ]
+        end = None if limit is None else offset + limit
+        return templates[offset:end], len(templates), etag
+
+    def save(self, template: Dict[str, Any]) -> str:
+        """
+        Save a template, replacing a template with the same id.
+
+        Returns:
+            The id of the template
+        """
+        entry_id = template_id(str(template.get('name', 'untitled')))
+        template = {key: value for key, value in template.items() if key != 'id'}
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+        path = self.folder / f'{entry_id}.json'
+        try:
+            mode = stat.S_IMODE(path.stat().st_mode)
+        except FileNotFoundError:
+            mode = NEW_FILE_MODE
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=f'.{entry_id}-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(template, f, indent=2, ensure_ascii=False)
+            # mkstemp() creates the file readable by the owner only
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._folder_mtime = None
+        return entry_id
+
+    def delete(self, name: str) -> bool:
+        """Delete a template by its name or id, returning whether it existed."""
+        entry_id = template_id(name)
+        try:
+            os.unlink(self.folder / f'{entry_id}.json')
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self._folder_mtime = None
+        return True
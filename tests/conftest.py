@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fixtures for the Brother QL Web tests.
+
+The tests change to the repository root, where the server finds
+config.example.json. Labels use the font bundled with the benchmarks, and
+print jobs go to a recording printer pool instead of a printer.
+"""
+
+import io
+import json
+import os
+import sys
+from pathlib import Path
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+import bottle  # noqa: E402
+import brother_ql_web  # noqa: E402
+from print_queue import PrintJob  # noqa: E402
+
+FONT_FAMILY = 'DejaVu Sans (Book)'
+FONTS = {'DejaVu Sans': {'Book': str(ROOT / 'benchmarks' / 'fonts' / 'DejaVuSans.ttf')}}
+
+# Escape sequence brother_ql sends for every label that is cut ("cut every 1 label")
+CUT_COMMAND = b'\x1b\x69\x41'
+
+
+class RecordingPool:
+    """Printer pool keeping the submitted raster data instead of printing it."""
+
+    def __init__(self, model='QL-820NWB'):
+        self.model = model
+        self.jobs = []
+
+    def model_for(self, label_size):
+        return self.model
+
+    def submit(self, data, label_size, model=None, **info):
+        job = PrintJob(data, dict(info, label_size=label_size))
+        job.status = 'done'
+        job.finished.set()
+        self.jobs.append(job)
+        return job
+
+
+class Client:
+    """Calls the routes of the server through WSGI."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, path, params=None, json_body=None):
+        environ = {}
+        setup_testing_defaults(environ)
+        environ['REQUEST_METHOD'] = method
+        environ['PATH_INFO'] = path
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            environ['CONTENT_TYPE'] = 'application/json'
+        elif params is not None:
+            body = urlencode(params).encode('utf-8')
+            environ['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+        if body is not None:
+            environ['CONTENT_LENGTH'] = str(len(body))
+            environ['wsgi.input'] = io.BytesIO(body)
+
+        status = []
+        chunks = self.app(environ, lambda status_line, headers, exc_info=None: status.append(status_line))
+        body = b''.join(chunks)
+        return int(status[0].split()[0]), body
+
+    def post(self, path, params=None, json_body=None):
+        """Post to a route, returning the status code and the decoded JSON response."""
+        status, body = self.request('POST', path, params, json_body)
+        return status, json.loads(body)
+
+
+@pytest.fixture
+def label():
+    """Parameters of a short text label."""
+    return {'text': 'Shelf 12', 'font_family': FONT_FAMILY, 'font_size': '40', 'label_size': '62'}
+
+
+@pytest.fixture
+def printer_pool(monkeypatch):
+    pool = RecordingPool()
+    monkeypatch.setattr(brother_ql_web, 'get_printer_pool', lambda: pool)
+    return pool
+
+
+@pytest.fixture
+def fonts(monkeypatch):
+    monkeypatch.setattr(brother_ql_web, 'FONTS', FONTS)
+
+
+@pytest.fixture
+def client(monkeypatch, fonts, printer_pool):
+    monkeypatch.setattr(brother_ql_web, 'DEBUG', False)
+    monkeypatch.setitem(brother_ql_web.CONFIG['SERVER'], 'HISTORY_DB', False)
+    for cache in (brother_ql_web.PREVIEW_CACHE, brother_ql_web.RASTER_CACHE):
+        cache.clear()
+    return Client(bottle.default_app())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of printing labels in batches."""
+
+import brother_ql_web
+from conftest import CUT_COMMAND
+
+
+def raster(params, cut, model):
+    return brother_ql_web.get_label_raster(brother_ql_web.build_label_context(params), cut, model)
+
+
+def labels(label, count):
+    return [dict(label, text=f'Item {number}') for number in range(count)]
+
+
+def test_batch_is_cut_after_every_label(client, printer_pool, label):
+    status, result = client.post('/api/print/batch', json_body={'labels': labels(label, 3)})
+    assert result['success'] is True
+    assert result['printed'] == 3
+    assert printer_pool.jobs[0].data.count(CUT_COMMAND) == 3
+
+
+def test_batch_is_cut_at_end_only(client, printer_pool, label):
+    body = {'labels': labels(label, 3), 'cut_at_end_only': True}
+    status, result = client.post('/api/print/batch', json_body=body)
+    assert result['printed'] == 3
+    assert printer_pool.jobs[0].data.count(CUT_COMMAND) == 1
+
+
+def test_batch_is_cut_after_last_rendered_label(client, printer_pool, label):
+    failing = dict(label, enable_barcode='true', barcode_type='ean13', barcode_data='123')
+    body = {'labels': labels(label, 2) + [failing], 'cut_at_end_only': True}
+    status, result = client.post('/api/print/batch', json_body=body)
+    assert result['success'] is True
+    assert (result['printed'], result['failed']) == (2, 1)
+    assert result['items'][2] == {'index': 2, 'success': False, 'error': 'EAN-13 barcodes need 12 or 13 digits'}
+    first, second = body['labels'][:2]
+    model = printer_pool.model
+    assert printer_pool.jobs[0].data == raster(first, False, model) + raster(second, True, model)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of the label print and preview endpoints."""
+
+import pytest
+
+PREVIEW_PATHS = ('/api/preview/text', '/api/preview/raster')
+
+
+def test_print_text(client, printer_pool, label):
+    status, result = client.post('/api/print/text', label)
+    assert status == 200
+    assert result['success'] is True
+    assert len(printer_pool.jobs) == 1
+
+
+def test_print_text_rejects_unknown_wrap_mode(client, printer_pool, label):
+    status, result = client.post('/api/print/text', dict(label, wrap='foo'))
+    assert status == 200
+    assert result == {'success': False, 'error': 'Unknown wrap mode: foo'}
+    assert printer_pool.jobs == []
+
+
+@pytest.mark.parametrize('path', PREVIEW_PATHS)
+def test_preview_rejects_unknown_wrap_mode(client, label, path):
+    status, result = client.post(path, dict(label, wrap='foo'))
+    assert status == 400
+    assert result == {'error': 'Unknown wrap mode: foo'}
+
+
+@pytest.mark.parametrize('params, error', [
+    ({'qr_error_correction': 'Z'}, 'Unknown QR error correction: Z'),
+    ({'qr_version': '41'}, 'QR code version must be between 1 and 40'),
+    ({'qr_version': 'big'}, 'Invalid QR code version: big'),
+    ({'qr_data': 'x' * 3000, 'qr_error_correction': 'H'}, 'Data is too long for a QR code with error correction H'),
+])
+def test_print_text_rejects_invalid_qr_parameters(client, printer_pool, label, params, error):
+    status, result = client.post('/api/print/text', dict(label, enable_qr='true', qr_data='x') | params)
+    assert status == 200
+    assert result == {'success': False, 'error': error}
+    assert printer_pool.jobs == []
+
+
+@pytest.mark.parametrize('path', PREVIEW_PATHS)
+@pytest.mark.parametrize('params, error', [
+    ({'qr_error_correction': 'Z'}, 'Unknown QR error correction: Z'),
+    ({'qr_version': '0'}, 'QR code version must be between 1 and 40'),
+])
+def test_preview_rejects_invalid_qr_parameters(client, label, path, params, error):
+    status, result = client.post(path, dict(label, enable_qr='true', qr_data='x') | params)
+    assert status == 400
+    assert result == {'error': error}
+
+
+@pytest.mark.parametrize('params, error', [
+    ({'barcode_type': 'foo'}, 'Unknown barcode type: foo'),
+    ({'enable_qr': 'true', 'qr_data': 'x'}, 'A label can have a QR code or a barcode, not both'),
+    ({'barcode_type': 'ean13', 'barcode_data': '123'}, 'EAN-13 barcodes need 12 or 13 digits'),
+    ({'barcode_data': 'Größe'}, "Code 128 barcodes only support printable ASCII characters, not 'ö'"),
+    ({'label_size': '12', 'orientation': 'rotated', 'barcode_size': 'large'},
+     'The barcode is 160 dots high, but the label only has 106 dots; choose a smaller barcode size'),
+    ({'label_size': 'd12', 'barcode_size': 'medium'},
+     'The barcode is 120 dots high, but the label only has 94 dots; choose a smaller barcode size'),
+])
+def test_print_text_rejects_invalid_barcodes(client, printer_pool, label, params, error):
+    status, result = client.post('/api/print/text', dict(label, enable_barcode='true', barcode_data='1234') | params)
+    assert status == 200
+    assert result == {'success': False, 'error': error}
+    assert printer_pool.jobs == []
+
+
+@pytest.mark.parametrize('path', PREVIEW_PATHS)
+@pytest.mark.parametrize('params, error', [
+    ({'barcode_type': 'foo'}, 'Unknown barcode type: foo'),
+    ({'barcode_type': 'ean13', 'barcode_data': '123'}, 'EAN-13 barcodes need 12 or 13 digits'),
+    ({'label_size': 'd12'}, 'The barcode is 120 dots high, but the label only has 94 dots; choose a smaller barcode size'),
+])
+def test_preview_rejects_invalid_barcodes(client, label, path, params, error):
+    status, result = client.post(path, dict(label, enable_barcode='true', barcode_data='1234') | params)
+    assert status == 400
+    assert result == {'error': error}
+
+
+def test_barcode_fits_label_with_fitted_font_size(client, printer_pool, label):
+    # The margins of the requested font size leave too little room for the barcode,
+    # but fitting the font size shrinks them
+    params = dict(label, label_size='62x29', font_size='600', fit_to_label='true',
+                  enable_barcode='true', barcode_data='ABCDEFGHIJKLMNOPQRSTUVW')
+    status, result = client.post('/api/print/text', params)
+    assert result['success'] is True
+    assert len(printer_pool.jobs) == 1
+
+
+def test_raster_preview_rejects_red_label_for_black_only_model(client, printer_pool, label):
+    printer_pool.model = 'QL-500'
+    status, result = client.post('/api/preview/raster', dict(label, label_size='62red'))
+    assert status == 400
+    assert result == {'error': 'Printing in red is not supported with the selected model.'}
+
+
+def test_print_text_rejects_red_label_for_black_only_model(client, printer_pool, label):
+    printer_pool.model = 'QL-500'
+    status, result = client.post('/api/print/text', dict(label, label_size='62red'))
+    assert status == 200
+    assert result == {'success': False, 'error': 'Printing in red is not supported with the selected model.'}
+    assert printer_pool.jobs == []
+
+
+def test_fit_to_label_fits_font_size(client, printer_pool, label):
+    status, result = client.post('/api/print/text', dict(label, label_size='62x29', fit_to_label='true'))
+    assert result['success'] is True
+
+
+@pytest.mark.parametrize('path', ('/api/print/text',) + PREVIEW_PATHS)
+def test_fit_to_label_rejects_text_too_large_for_label(client, printer_pool, label, path):
+    params = dict(label, label_size='d12', fit_to_label='true', text=' '.join(['Warehouse'] * 40), wrap='greedy')
+    status, result = client.post(path, params)
+    error = 'The text does not fit the label even at the minimum font size of 8'
+    if path == '/api/print/text':
+        assert (status, result) == (200, {'success': False, 'error': error})
+    else:
+        assert (status, result) == (400, {'error': error})
+    assert printer_pool.jobs == []
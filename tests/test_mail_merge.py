@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of mail-merge printing."""
+
+import threading
+
+import pytest
+
+from mail_merge import MergeJob, MERGE_DONE, MERGE_FAILED, MAX_REPORTED_ERRORS
+
+
+class Printer:
+    """Records the labels of every print job, as (text, is_last) tuples."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def render(self, label, is_last):
+        if label['text'].startswith('bad'):
+            raise ValueError(f"Cannot render {label['text']}")
+        return label['text'], is_last
+
+    def rasterize(self, rendered):
+        return list(rendered)
+
+    def submit(self, labels, count):
+        self.jobs.append(labels)
+        job = type('Job', (), {'id': str(len(self.jobs)), 'error': None, 'finished': threading.Event()})()
+        job.finished.set()
+        return job
+
+    @property
+    def labels(self):
+        return [label for job in self.jobs for label in job]
+
+
+def write_rows(tmp_path, names):
+    path = tmp_path / 'rows.csv'
+    path.write_text('name\n' + ''.join(f'{name}\n' for name in names), encoding='utf-8')
+    return str(path)
+
+
+def run_merge(tmp_path, names, chunk_size=2):
+    printer = Printer()
+    merge = MergeJob(write_rows(tmp_path, names), 'csv', {'text': '{name}'}, chunk_size=chunk_size)
+    merge.run(printer.render, printer.rasterize, printer.submit)
+    return merge, printer
+
+
+def test_merge_marks_last_label(tmp_path):
+    merge, printer = run_merge(tmp_path, ['a', 'b', 'c', 'd', 'e'])
+    assert merge.status == MERGE_DONE
+    assert printer.labels == [('a', False), ('b', False), ('c', False), ('d', False), ('e', True)]
+    assert all(len(job) <= 2 for job in printer.jobs)
+
+
+@pytest.mark.parametrize('names', [
+    ['a', 'b', 'c', 'bad1'],
+    ['a', 'b', 'c', 'd', 'bad1', 'bad2', 'bad3'],
+    ['a', 'bad1', 'bad2', 'bad3', 'bad4', 'bad5'],
+])
+def test_merge_marks_last_rendered_label_if_last_rows_fail(tmp_path, names):
+    merge, printer = run_merge(tmp_path, names)
+    assert merge.status == MERGE_DONE
+    good = [name for name in names if not name.startswith('bad')]
+    assert printer.labels == [(name, name == good[-1]) for name in good]
+    assert merge.rows_failed == len(names) - len(good)
+    assert merge.labels_rendered == merge.labels_printed == len(good)
+
+
+class FailingPrinter(Printer):
+    """Fails the first print job."""
+
+    def submit(self, labels, count):
+        job = super().submit(labels, count)
+        if len(self.jobs) == 1:
+            job.error = 'Printer offline'
+        return job
+
+
+def test_resume_counts_rows_once(tmp_path):
+    names = [f'bad{number}' for number in range(150)] + ['a', 'b', 'c', 'd']
+    merge = MergeJob(write_rows(tmp_path, names), 'csv', {'text': '{name}'}, chunk_size=2)
+    printer = FailingPrinter()
+    merge.run(printer.render, printer.rasterize, printer.submit)
+    assert merge.status == MERGE_FAILED
+    assert merge.next_row == 150
+    assert merge.rows_failed == 150
+    assert len(merge.errors) == MAX_REPORTED_ERRORS
+
+    printer = Printer()
+    merge.resume(printer.render, printer.rasterize, printer.submit)
+    merge._thread.join()
+    assert merge.status == MERGE_DONE
+    # c and d were printed by the job queued behind the failed one
+    assert printer.labels == [('a', False), ('b', True)]
+    progress = merge.to_dict()
+    assert progress['rows_read'] == 154
+    assert progress['rows_failed'] == 150
+    assert progress['labels_rendered'] == progress['labels_printed'] == 4
+
+
+def test_resume_keeps_failures_before_resume_point(tmp_path):
+    names = ['a', 'bad1', 'b', 'c', 'bad2', 'd', 'e']
+    merge = MergeJob(write_rows(tmp_path, names), 'csv', {'text': '{name}'}, chunk_size=1)
+    printer = Printer()
+    failing = FailingPrinter()
+    # The first job prints, the second one fails
+    merge.run(printer.render, printer.rasterize,
+              lambda labels, count: (printer if not printer.jobs else failing).submit(labels, count))
+    assert merge.status == MERGE_FAILED
+    assert merge.next_row == 2
+
+    merge.resume(printer.render, printer.rasterize, printer.submit)
+    merge._thread.join()
+    assert merge.status == MERGE_DONE
+    assert (merge.rows_read, merge.rows_failed, merge.labels_rendered, merge.labels_printed) == (7, 2, 5, 5)
+    assert [error['row'] for error in merge.errors] == [1, 4]
+
+
+def test_resume_rejects_running_merge(tmp_path):
+    release = threading.Event()
+
+    class SlowPrinter(Printer):
+        def submit(self, labels, count):
+            job = super().submit(labels, count)
+            job.finished = release
+            return job
+
+    printer = SlowPrinter()
+    merge = MergeJob(write_rows(tmp_path, ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']), 'csv',
+                     {'text': '{name}'}, chunk_size=1)
+    merge.start(printer.render, printer.rasterize, printer.submit)
+    with pytest.raises(ValueError, match='Only failed merges can be resumed'):
+        merge.resume(printer.render, printer.rasterize, printer.submit)
+    release.set()
+    merge._thread.join()
+    assert merge.status == MERGE_DONE
+    with pytest.raises(ValueError, match='Only failed merges can be resumed'):
+        merge.resume(printer.render, printer.rasterize, printer.submit)
+
+
+def test_resume_rejects_failed_merge_that_has_not_stopped(tmp_path):
+    merge, printer = run_merge(tmp_path, ['a', 'b'])
+    merge.status = MERGE_FAILED
+    merge._thread = threading.Thread(target=threading.Event().wait, args=(5,), daemon=True)
+    merge._thread.start()
+    with pytest.raises(ValueError, match='The merge has not stopped yet'):
+        merge.resume(printer.render, printer.rasterize, printer.submit)
+
+
+def test_resume_skips_rows_printed_after_failed_job(tmp_path):
+    names = ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+    merge = MergeJob(write_rows(tmp_path, names), 'csv', {'text': '{name}'}, chunk_size=2)
+    printer = FailingPrinter()
+    # The jobs queued behind the failed first one still print
+    merge.run(printer.render, printer.rasterize, printer.submit)
+    assert merge.status == MERGE_FAILED
+    assert merge.next_row == 0
+    printed = [label for job in printer.jobs[1:] for label in job]
+    assert printed
+
+    resumed = Printer()
+    merge.resume(resumed.render, resumed.rasterize, resumed.submit)
+    merge._thread.join()
+    assert merge.status == MERGE_DONE
+    printed += resumed.labels
+    assert sorted(text for text, _ in printed) == names
+    assert printed[-1][1] is True
+    progress = merge.to_dict()
+    assert progress['rows_read'] == progress['labels_printed'] == len(names)
+    assert progress['rows_failed'] == 0
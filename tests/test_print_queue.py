@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of sending print jobs to the printer."""
+
+import pytest
+
+from print_queue import PrintQueue, JOB_DONE, JOB_FAILED
+
+
+class Backend:
+    """Printer backend failing the connections or writes listed in the class attributes."""
+
+    failing_connections = 0
+    failing_writes = 0
+    failing_disposals = 0
+    written = []
+
+    def __init__(self, device):
+        if Backend.failing_connections:
+            Backend.failing_connections -= 1
+            raise OSError('Connection refused')
+
+    def write(self, data):
+        if Backend.failing_writes:
+            Backend.failing_writes -= 1
+            raise OSError('Connection reset')
+        Backend.written.append(data)
+
+    def dispose(self):
+        if Backend.failing_disposals:
+            Backend.failing_disposals -= 1
+            raise OSError('Bad file descriptor')
+
+
+@pytest.fixture
+def print_queue():
+    Backend.failing_connections = Backend.failing_writes = Backend.failing_disposals = 0
+    Backend.written = []
+    offered = []
+    print_queue = PrintQueue(Backend, 'tcp://printer', failover=lambda job, error: offered.append(job))
+    print_queue.offered = offered
+    yield print_queue
+    print_queue.stop(5)
+
+
+def print_job(print_queue, data=b'label'):
+    job = print_queue.submit(data)
+    assert job.finished.wait(5)
+    return job
+
+
+def test_connection_is_retried(print_queue):
+    Backend.failing_connections = 1
+    job = print_job(print_queue)
+    assert job.status == JOB_DONE
+    assert job.attempts == 2
+    assert Backend.written == [b'label']
+
+
+def test_failed_write_is_not_sent_again(print_queue):
+    Backend.failing_writes = 1
+    job = print_job(print_queue)
+    assert job.status == JOB_FAILED
+    assert job.attempts == 1
+    assert job.error.startswith('Sending the job to the printer failed: Connection reset')
+    assert Backend.written == []
+    # Part of the job may have printed, so it is not offered to other printers
+    assert print_queue.offered == []
+
+    # The next job opens a new connection
+    assert print_job(print_queue).status == JOB_DONE
+    assert Backend.written == [b'label']
+
+
+def test_failed_close_keeps_write_error(print_queue):
+    Backend.failing_writes = 1
+    Backend.failing_disposals = 1
+    job = print_job(print_queue)
+    assert job.status == JOB_FAILED
+    assert 'Connection reset' in job.error
+    assert print_queue._backend is None
+
+
+def test_unreachable_printer_offers_job_to_other_printers(print_queue):
+    Backend.failing_connections = 2
+    job = print_queue.submit(b'label')
+    print_queue.stop(5)
+    assert print_queue.offered == [job]
+    assert Backend.written == []
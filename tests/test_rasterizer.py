@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests that the NumPy rasterizer creates the same raster data as brother_ql."""
+
+import pytest
+
+import brother_ql_web
+from brother_ql import BrotherQLRaster
+from conftest import FONT_FAMILY
+from rasterizer import can_rasterize, rasterize_label_image
+
+pytest.importorskip('numpy')
+
+# (name, label parameters, rasterizer options)
+SCENARIOS = [
+    ('62 endless', {'label_size': '62', 'text': 'Brother QL\nWeb'}, {}),
+    ('62 endless, rotated', {'label_size': '62', 'text': 'A long endless label ' * 3, 'orientation': 'rotated'}, {}),
+    ('62 endless, QR code', {'label_size': '62', 'text': 'Asset 0042', 'font_size': 80,
+                             'enable_qr': 'true', 'qr_data': 'https://example.com/asset/0042'}, {}),
+    ('62 endless, threshold 30', {'label_size': '62', 'text': 'Light', 'threshold': 30}, {}),
+    ('62 endless, no cut', {'label_size': '62', 'text': 'No cut'}, {'cut': False}),
+    ('29 endless, compressed', {'label_size': '29', 'text': 'Compressed', 'font_size': 60}, {'compress': True}),
+    ('62x29 die-cut', {'label_size': '62x29', 'text': 'Brother QL', 'font_size': 70}, {}),
+    ('62x29 die-cut, rotated', {'label_size': '62x29', 'text': 'Rotated', 'font_size': 70,
+                                'orientation': 'rotated'}, {}),
+    ('d24 round die-cut', {'label_size': 'd24', 'text': 'Round', 'font_size': 40}, {}),
+    ('102 endless', {'label_size': '102', 'text': 'Wide label'}, {}),
+    ('62red endless', {'label_size': '62red', 'text': 'Black/red\nlabel'}, {}),
+    ('62red endless, QR code', {'label_size': '62red', 'text': 'Red', 'enable_qr': 'true',
+                                'qr_data': 'red and black'}, {}),
+]
+
+# Models with a 62 mm print head, without and with black/red support, and a 102 mm one
+MODELS = ('QL-700', 'QL-820NWB', 'QL-1060N')
+
+
+def rasterize(context, im, model, engine, options):
+    qlr = BrotherQLRaster(model)
+    kwargs = {
+        'red': brother_ql_web.is_red_label(context['label_size']),
+        'threshold': context['threshold'],
+        'rotate': brother_ql_web.get_label_rotation(context),
+        'cut': True,
+    }
+    kwargs.update(options)
+    return rasterize_label_image(qlr, im, context['label_size'], engine, **kwargs)
+
+
+@pytest.mark.parametrize('model', MODELS)
+@pytest.mark.parametrize('name, params, options', SCENARIOS, ids=[scenario[0] for scenario in SCENARIOS])
+def test_numpy_matches_brother_ql(fonts, model, name, params, options):
+    red = brother_ql_web.is_red_label(params['label_size'])
+    if red and model != 'QL-820NWB':
+        pytest.skip(f'{model} cannot print red')
+    if params['label_size'] == '102' and model != 'QL-1060N':
+        pytest.skip(f'{model} cannot print 102 mm labels')
+
+    context = brother_ql_web.build_label_context(dict(params, font_family=FONT_FAMILY))
+    im = brother_ql_web.create_label_im(**context)
+    assert can_rasterize(im, context['label_size'], rotate=brother_ql_web.get_label_rotation(context), **options)
+    reference = rasterize(context, im, model, 'brother_ql', options)
+    assert rasterize(context, im, model, 'numpy', options) == reference
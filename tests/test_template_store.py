@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of the template store."""
+
+import os
+import stat
+
+from template_store import TemplateStore, NEW_FILE_MODE
+
+
+def file_mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_template_gets_default_file_mode(tmp_path):
+    store = TemplateStore(str(tmp_path))
+    entry_id = store.save({'name': 'Shelf', 'text': 'Shelf 12'})
+    umask = os.umask(0)
+    os.umask(umask)
+    # Not only readable by the owner, like files created by mkstemp()
+    assert file_mode(tmp_path / f'{entry_id}.json') == NEW_FILE_MODE == 0o666 & ~umask
+
+
+def test_replaced_template_keeps_file_mode(tmp_path):
+    store = TemplateStore(str(tmp_path))
+    entry_id = store.save({'name': 'Shelf', 'text': 'Shelf 12'})
+    path = tmp_path / f'{entry_id}.json'
+    os.chmod(path, 0o640)
+    store.save({'name': 'Shelf', 'text': 'Shelf 13'})
+    assert file_mode(path) == 0o640
+    assert store.get('Shelf')['text'] == 'Shelf 13'
+    assert [name for name in os.listdir(tmp_path)] == [f'{entry_id}.json']
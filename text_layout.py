@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Word wrapping for Brother QL Web labels.
+
+Lines are broken at spaces so that they fit a width in pixels. Line widths
+are summed from the advance widths of single characters, which are measured
+once per font and size and cached, so wrapping a long text takes time linear
+in its length instead of measuring every candidate line with textbbox.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from cache_helpers import LRUCache
+from font_helpers import get_font_object
+
+# Wrap modes: keep the lines as typed, fill each line before starting the
+# next (greedy), or break so that the lines have similar lengths (balanced)
+WRAP_MODES = ('none', 'greedy', 'balanced')
+
+# Glyph advance tables, keyed by (path, index, size) like the font objects
+ADVANCE_CACHE = LRUCache(max_entries=64)
+
+
+class GlyphAdvances:
+    """Advance widths of the characters of one font at one size, measured on first use."""
+
+    def __init__(self, font: Any):
+        self.font = font
+        self._advances: Dict[str, float] = {}
+
+    def __getitem__(self, char: str) -> float:
+        try:
+            return self._advances[char]
+        except KeyError:
+            advance = self._advances[char] = self.font.getlength(char)
+            return advance
+
+    def width(self, text: str) -> float:
+        """Width of text as the sum of its character advances (without kerning)."""
+        return sum(self[char] for char in text)
+
+
+def get_glyph_advances(font_path: str, font_size: int, font_index: int = 0) -> GlyphAdvances:
+    """Get the cached advance table of a font at a size."""
+    key = (font_path, int(font_index), int(font_size))
+    return ADVANCE_CACHE.get_or_create(
+        key, lambda: GlyphAdvances(get_font_object(font_path, font_size, font_index))
+    )
+
+
+def clear_layout_cache() -> None:
+    """Drop all advance tables, e.g. after the fonts were reloaded."""
+    ADVANCE_CACHE.clear()
+
+
+def _split_word(word: str, advances: GlyphAdvances, max_width: float) -> List[str]:
+    """Split a word that is wider than max_width into pieces that fit (at least one character each)."""
+    pieces = []
+    piece, piece_width = '', 0.0
+    for char in word:
+        advance = advances[char]
+        if piece and piece_width + advance > max_width:
+            pieces.append(piece)
+            piece, piece_width = '', 0.0
+        piece += char
+        piece_width += advance
+    pieces.append(piece)
+    return pieces
+
+
+def _break_greedy(widths: List[float], space: float, max_width: float) -> List[int]:
+    """Get the indices of the words starting a line, filling each line as far as possible."""
+    starts = [0]
+    line_width = widths[0]
+    for i in range(1, len(widths)):
+        if line_width + space + widths[i] > max_width:
+            starts.append(i)
+            line_width = widths[i]
+        else:
+            line_width += space + widths[i]
+    return starts
+
+
+def _break_balanced(widths: List[float], space: float, max_width: float) -> List[int]:
+    """
+    Get the indices of the words starting a line, minimizing the raggedness.
+
+    The cost of a line is its squared unused width, except for the last line.
+    Lines wider than max_width are only allowed for a single word.
+    """
+    count = len(widths)
+    # cost[i]: cost of laying out words[i:], following[i]: first word after the line starting at words[i]
+    cost: List[float] = [0.0] * (count + 1)
+    following: List[int] = [count] * (count + 1)
+    for i in range(count - 1, -1, -1):
+        best: Optional[float] = None
+        line_width = -space
+        for j in range(i, count):
+            line_width += space + widths[j]
+            if line_width > max_width and j > i:
+                break
+            slack = 0.0 if j == count - 1 else max(max_width - line_width, 0.0) ** 2
+            total = slack + cost[j + 1]
+            if best is None or total < best:
+                best = total
+                following[i] = j + 1
+        cost[i] = best or 0.0
+
+    starts = []
+    i = 0
+    while i < count:
+        starts.append(i)
+        i = following[i]
+    return starts
+
+
+def wrap_text(text: str, advances: GlyphAdvances, max_width: float, mode: str = 'greedy',
+              break_words: bool = True) -> str:
+    """
+    Break the lines of text at spaces so that they fit max_width.
+
+    Line breaks in the text are kept, runs of spaces inside a line collapse
+    to one.
+
+    Args:
+        text: Text to wrap
+        advances: Advance widths of the font the text will be drawn with
+        max_width: Available width in pixels
+        mode: One of WRAP_MODES
+        break_words: Split words wider than max_width; otherwise they are
+            kept on a line of their own, wider than max_width
+
+    Returns:
+        The wrapped text
+    """
+    if mode not in WRAP_MODES:
+        raise ValueError(f'Unknown wrap mode: {mode}')
+    if mode == 'none':
+        return text
+
+    space = advances[' ']
+    lines = []
+    for paragraph in text.split('\n'):
+        words = paragraph.split()
+        if break_words:
+            words = [piece for word in words for piece in _split_word(word, advances, max_width)]
+        if not words:
+            lines.append('')
+            continue
+
+        widths = [advances.width(word) for word in words]
+        if mode == 'greedy':
+            starts = _break_greedy(widths, space, max_width)
+        else:
+            starts = _break_balanced(widths, space, max_width)
+        for start, end in zip(starts, starts[1:] + [len(words)]):
+            lines.append(' '.join(words[start:end]))
+
+    return '\n'.join(lines)